@@ -0,0 +1,82 @@
+from contextlib import contextmanager
+import io
+import os
+import posixpath
+import zipfile
+
+ARCHIVE_SUFFIX = ".zip"
+# separates an archive from the member inside it, e.g. "export.zip!export/matches.json"
+MEMBER_SEPARATOR = "!"
+
+
+def split_archive_path(path):
+    """
+    :return: tuple of (archive path, member name) for a path into a zip archive, (path, None) otherwise
+    """
+    archive, separator, member = path.partition(MEMBER_SEPARATOR)
+    if separator and archive.lower().endswith(ARCHIVE_SUFFIX):
+        return archive, member
+    return path, None
+
+
+def archive_member_path(archive_path, member):
+    return f"{archive_path}{MEMBER_SEPARATOR}{member}"
+
+
+@contextmanager
+def open_export_file(path, mode="r"):
+    """
+    Opens an export file, either a plain file or a member of a zip archive. Members are decompressed as
+    they are read, so an export is parsed straight out of the archive without being extracted first.
+    :param mode: "r" for text or "rb" for bytes
+    """
+    archive_path, member = split_archive_path(path)
+    if member is None:
+        with open(path, mode) as file:
+            yield file
+        return
+
+    with zipfile.ZipFile(archive_path) as archive, archive.open(member) as raw:
+        yield io.TextIOWrapper(raw, encoding="utf-8") if mode == "r" else raw
+
+
+def export_file_size(path):
+    """Size of an export file in bytes, uncompressed for archive members."""
+    archive_path, member = split_archive_path(path)
+    if member is None:
+        return os.path.getsize(path)
+    with zipfile.ZipFile(archive_path) as archive:
+        return archive.getinfo(member).file_size
+
+
+def locate_members(archive_path):
+    """
+    Finds the files of an export in its archive, which Hinge may nest in a folder of its own.
+    :return: dict with the "matches" and "user" member names and the "media" folder prefix, None when missing
+    """
+    with zipfile.ZipFile(archive_path) as archive:
+        names = archive.namelist()
+
+    found = {"matches": None, "user": None, "media": None}
+    # the shallowest match wins, so a stray copy deeper in the archive isn't picked up
+    for name in sorted(names, key=lambda name: (name.count("/"), name)):
+        base_name = posixpath.basename(name)
+        if base_name == "matches.json" and found["matches"] is None:
+            found["matches"] = name
+        elif base_name == "user.json" and found["user"] is None:
+            found["user"] = name
+        parent = posixpath.dirname(name)
+        if posixpath.basename(parent) == "media" and found["media"] is None:
+            found["media"] = parent + "/"
+    return found
+
+
+def iter_media_members(archive, prefix):
+    """Files directly inside the media folder of an open archive, as ZipInfo objects."""
+    for info in archive.infolist():
+        if info.is_dir() or not info.filename.startswith(prefix):
+            continue
+        # nested folders and names that try to escape the folder are skipped
+        name = info.filename[len(prefix):]
+        if name and "/" not in name and name not in (".", ".."):
+            yield info
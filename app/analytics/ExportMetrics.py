@@ -0,0 +1,64 @@
+import numpy as np
+
+LATENCY_QUANTILES = (0.25, 0.5, 0.75, 0.9)
+
+
+def summarize_match_analytics(match_analytics):
+    """
+    Flattens the match analytics of one export into a single row of metrics.
+    :param match_analytics: MatchAnalytics of the export
+    :return: dict of metric name to value
+    """
+    index = match_analytics.index
+    matched = index.has("match_ts")
+    latency_days = match_analytics.get_response_latency(as_frame=True)["latency_days"].to_numpy()
+    duration_days = match_analytics.get_match_durations(as_frame=True)["duration_days"].to_numpy()
+    message_counts = index.chat_count[matched]
+
+    metrics = {
+        "interactions": len(index),
+        "matches": int(matched.sum()),
+        "likes": int(index.has("like_ts").sum()),
+        "blocks": int(index.has("block_ts").sum()),
+        "messages": int(index.chat_count.sum()),
+        "latency_count": len(latency_days),
+    }
+    for quantile in LATENCY_QUANTILES:
+        metrics[f"latency_days_p{int(quantile * 100)}"] = _quantile(latency_days, quantile)
+
+    metrics["duration_count"] = len(duration_days)
+    metrics["duration_days_mean"] = _mean(duration_days)
+    metrics["duration_days_p50"] = _quantile(duration_days, 0.5)
+    metrics["duration_days_p90"] = _quantile(duration_days, 0.9)
+
+    metrics["messages_per_match_mean"] = _mean(message_counts)
+    metrics["messages_per_match_p50"] = _quantile(message_counts, 0.5)
+    metrics["messages_per_match_max"] = int(message_counts.max()) if len(message_counts) else None
+    return metrics
+
+
+def summarize_user_analytics(user_analytics):
+    """
+    Flattens the user analytics of one export into a single row of metrics.
+    :param user_analytics: UserAnalytics of the export
+    :return: dict of metric name to value
+    """
+    metrics = {}
+    for category, counts in user_analytics.count_stringeny_attributes().items():
+        metrics[f"dealbreakers_{category}_true"] = counts["true"]
+        metrics[f"dealbreakers_{category}_false"] = counts["false"]
+    for category, counts in user_analytics.count_displayed_attributes().items():
+        metrics[f"displayed_{category}_true"] = counts["true"]
+        metrics[f"displayed_{category}_false"] = counts["false"]
+
+    user_summary = user_analytics.build_user_summary_dict()
+    metrics["on_app_duration_days"] = user_summary["on_app_duration"]
+    metrics["last_pause_duration_days"] = user_summary["last_pause_duration"]
+    return metrics
+
+
+def _quantile(values, quantile):
+    return float(np.quantile(values, quantile)) if len(values) else None
+
+def _mean(values):
+    return float(np.mean(values)) if len(values) else None
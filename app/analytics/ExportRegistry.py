@@ -0,0 +1,295 @@
+from collections import OrderedDict
+import logging
+import os
+import re
+import shutil
+import threading
+import zipfile
+
+from .ExportArchive import ARCHIVE_SUFFIX, archive_member_path, export_file_size, locate_members
+from .MatchAnalytics import MatchAnalytics
+from .Metrics import EXPORT_BYTES, EXPORT_INTERACTIONS, EXPORT_MESSAGES
+from .Snapshot import export_fingerprint
+from .UserAnalytics import UserAnalytics
+
+# id of the export configured through MATCH_FILE_PATH / USER_FILE_PATH / MEDIA_PATH
+DEFAULT_EXPORT = "default"
+DEFAULT_MAX_LOADED = 4
+# seconds between checks of the loaded exports for changes on disk
+DEFAULT_WATCH_INTERVAL = 5
+
+MATCH_FILE = "matches.json"
+USER_FILE = "user.json"
+MEDIA_DIR = "media"
+# uploaded exports are stored under their id, so ids are restricted to names that are safe as file names
+EXPORT_ID_PATTERN = re.compile(r"^[A-Za-z0-9][A-Za-z0-9_-]{0,63}$")
+
+
+class Export:
+    """
+    One Hinge export served by the app. The match and user analytics are loaded independently on
+    first use, so a visitor who only opens the match page never pays for the user export and vice versa.
+
+    Loaded analytics are never modified. When an export file changes, refresh builds new analytics in the
+    background while the current ones keep serving, then swaps them in with a single assignment, so a
+    request sees either the old or the new export and never a mix of both.
+    """
+    def __init__(self, export_id, match_file_path=None, user_file_path=None, media_path=None, assets_path=None, assets_url=None):
+        self.export_id = export_id
+        self.match_file_path = match_file_path
+        self.user_file_path = user_file_path
+        self.media_path = media_path
+        self.assets_path = assets_path
+        # url prefix the copied media is served from, relative to the page
+        self.assets_url = assets_url
+        self._match_analytics = None
+        self._user_analytics = None
+        self._lock = threading.Lock()
+        # serializes reloads, which run without holding _lock so requests keep being served meanwhile
+        self._reload_lock = threading.Lock()
+        # fingerprint of a changed file seen on the previous check, waiting for the writer to finish
+        self._pending = {}
+
+    def match_analytics(self):
+        with self._lock:
+            if self._match_analytics is None:
+                self._match_analytics = MatchAnalytics(match_file_path=self.match_file_path)
+                self._record_match_metrics(self._match_analytics)
+            return self._match_analytics
+
+    def user_analytics(self):
+        with self._lock:
+            if self._user_analytics is None:
+                self._user_analytics = UserAnalytics(user_file_path=self.user_file_path,
+                                                     media_path=self.media_path,
+                                                     assets_path=self.assets_path)
+                self._record_user_metrics(self._user_analytics)
+            return self._user_analytics
+
+    def refresh(self):
+        """
+        Reloads the analytics whose export file changed since they were loaded. A change is only picked up
+        once the file looks the same on two consecutive calls, so a file still being written isn't ingested.
+        :return: True when any analytics were swapped
+        """
+        with self._reload_lock:
+            reloaded = False
+            match_analytics = self._match_analytics
+            if match_analytics is not None and self._settled(MATCH_FILE, match_analytics):
+                reloaded |= self._swap(MATCH_FILE, match_analytics)
+            user_analytics = self._user_analytics
+            if user_analytics is not None and self._settled(USER_FILE, user_analytics):
+                reloaded |= self._swap(USER_FILE, user_analytics)
+            return reloaded
+
+    def _settled(self, file, analytics):
+        path = analytics.match_file_path if file == MATCH_FILE else analytics.user_file_path
+        try:
+            fingerprint = export_fingerprint(path)
+        except OSError:
+            # the file is being replaced, or was removed, keep serving what was loaded
+            return False
+        if fingerprint == analytics.fingerprint():
+            self._pending.pop(file, None)
+            return False
+        if self._pending.get(file) != fingerprint:
+            self._pending[file] = fingerprint
+            return False
+        return True
+
+    def _swap(self, file, analytics):
+        try:
+            reloaded = analytics.reload()
+        except Exception as e:
+            # a broken export keeps the previous version serving, it's retried once the file changes again
+            logging.warning(f"Could not reload '{file}' of export '{self.export_id}', keeping the loaded version: {e}")
+            return False
+        with self._lock:
+            if file == MATCH_FILE:
+                self._match_analytics = reloaded
+                self._record_match_metrics(reloaded)
+            else:
+                self._user_analytics = reloaded
+                self._record_user_metrics(reloaded)
+        self._pending.pop(file, None)
+        logging.info(f"Reloaded '{file}' of export '{self.export_id}'.")
+        if file == MATCH_FILE:
+            try:
+                reloaded.prune_snapshots()
+            except Exception as e:
+                logging.warning(f"Could not prune the snapshots of export '{self.export_id}': {e}")
+        return True
+
+    def _record_match_metrics(self, match_analytics):
+        index = match_analytics.index
+        EXPORT_INTERACTIONS.set(len(index), export=self.export_id)
+        EXPORT_MESSAGES.set(len(index.chat_ts), export=self.export_id)
+        EXPORT_BYTES.set(export_file_size(match_analytics.match_file_path), export=self.export_id, file=MATCH_FILE)
+
+    def _record_user_metrics(self, user_analytics):
+        EXPORT_BYTES.set(export_file_size(user_analytics.user_file_path), export=self.export_id, file=USER_FILE)
+
+    def forget_metrics(self):
+        # evicted exports shouldn't keep reporting their sizes
+        EXPORT_INTERACTIONS.remove(export=self.export_id)
+        EXPORT_MESSAGES.remove(export=self.export_id)
+        for file in (MATCH_FILE, USER_FILE):
+            EXPORT_BYTES.remove(export=self.export_id, file=file)
+
+
+class ExportRegistry:
+    """
+    Serves many exports from one process. Each export lives in its own directory under EXPORTS_PATH
+    (holding matches.json, user.json and media/), or is the .zip file downloaded from Hinge, read without
+    extracting it, and is addressed by the directory or archive name. Exports are loaded on demand and at
+    most max_loaded of them are kept in memory, evicting the least recently used.
+    """
+    def __init__(self, exports_path=None, max_loaded=None):
+        if exports_path is None:
+            exports_path = os.environ.get("EXPORTS_PATH")
+        if max_loaded is None:
+            max_loaded = int(os.environ.get("EXPORT_CACHE_SIZE", DEFAULT_MAX_LOADED))
+
+        self.exports_path = exports_path
+        self.max_loaded = max_loaded
+        self._loaded = OrderedDict()
+        self._lock = threading.Lock()
+        self._watcher = None
+        self._stop_watching = threading.Event()
+
+    def export_ids(self):
+        export_ids = []
+        if os.environ.get("MATCH_FILE_PATH") or os.environ.get("USER_FILE_PATH"):
+            export_ids.append(DEFAULT_EXPORT)
+        if self.exports_path and os.path.isdir(self.exports_path):
+            names = set()
+            for name in os.listdir(self.exports_path):
+                path = os.path.join(self.exports_path, name)
+                if os.path.isdir(path):
+                    names.add(name)
+                elif name.lower().endswith(ARCHIVE_SUFFIX) and os.path.isfile(path):
+                    names.add(name[:-len(ARCHIVE_SUFFIX)])
+            export_ids.extend(sorted(names))
+        return export_ids
+
+    def add_archive(self, export_id, file):
+        """
+        Stores an uploaded export archive under EXPORTS_PATH. The upload is written next to its destination
+        and only renamed into place once it has been checked, so a broken upload never replaces an export.
+        :param file: binary file object holding the .zip downloaded from Hinge
+        """
+        if not self.exports_path:
+            raise Exception("EXPORTS_PATH environment variable is not set.")
+        if not EXPORT_ID_PATTERN.match(export_id or "") or export_id == DEFAULT_EXPORT:
+            raise Exception(f"Invalid export name '{export_id}', use letters, digits, '-' and '_'.")
+
+        os.makedirs(self.exports_path, exist_ok=True)
+        archive_path = os.path.join(self.exports_path, export_id + ARCHIVE_SUFFIX)
+        tmp_path = f"{archive_path}.upload-{os.getpid()}-{threading.get_ident()}"
+        try:
+            with open(tmp_path, "wb") as tmp_file:
+                shutil.copyfileobj(file, tmp_file, 1 << 20)
+            if not zipfile.is_zipfile(tmp_path):
+                raise Exception("The upload is not a zip archive.")
+            members = locate_members(tmp_path)
+            if members["matches"] is None and members["user"] is None:
+                raise Exception("The archive has neither a matches.json nor a user.json file.")
+            os.replace(tmp_path, archive_path)
+        finally:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+        logging.info(f"Stored uploaded export '{export_id}'.")
+        return export_id
+
+    def get(self, export_id=None):
+        """
+        :param export_id: name of the export, None for the default export configured in the environment
+        :return: the Export, loading it if it isn't already in memory
+        """
+        export_id = export_id or DEFAULT_EXPORT
+        with self._lock:
+            export = self._loaded.get(export_id)
+            if export is not None:
+                self._loaded.move_to_end(export_id)
+                return export
+
+            export = self._resolve(export_id)
+            self._loaded[export_id] = export
+            while len(self._loaded) > self.max_loaded:
+                evicted_id, evicted = self._loaded.popitem(last=False)
+                evicted.forget_metrics()
+                logging.info(f"Evicted export '{evicted_id}' from memory.")
+            return export
+
+    def loaded_ids(self):
+        with self._lock:
+            return list(self._loaded)
+
+    def refresh(self):
+        """Reloads the loaded exports whose files changed on disk, see Export.refresh."""
+        with self._lock:
+            exports = list(self._loaded.values())
+        reloaded = []
+        for export in exports:
+            if export.refresh():
+                reloaded.append(export.export_id)
+        return reloaded
+
+    def watch(self, interval=None):
+        """
+        Starts a daemon thread calling refresh every interval seconds, EXPORT_WATCH_INTERVAL by default and
+        disabled when 0. Threads don't survive a fork, so every worker process starts its own watcher.
+        """
+        if interval is None:
+            interval = float(os.environ.get("EXPORT_WATCH_INTERVAL", DEFAULT_WATCH_INTERVAL))
+        if interval <= 0 or (self._watcher is not None and self._watcher.is_alive()):
+            return
+        self._stop_watching.clear()
+        self._watcher = threading.Thread(target=self._watch, args=(interval,), name="export-watcher", daemon=True)
+        self._watcher.start()
+
+    def stop_watching(self):
+        self._stop_watching.set()
+        if self._watcher is not None:
+            self._watcher.join()
+            self._watcher = None
+
+    def _watch(self, interval):
+        while not self._stop_watching.wait(interval):
+            try:
+                self.refresh()
+            except Exception as e:
+                logging.warning(f"Checking the exports for changes failed: {e}")
+
+    def _resolve(self, export_id):
+        if export_id == DEFAULT_EXPORT:
+            return Export(DEFAULT_EXPORT, assets_url="assets/")
+
+        # export ids come from the url, so only accept the plain names of directories in the exports path
+        if export_id not in self.export_ids():
+            raise Exception(f"Unknown export '{export_id}'.")
+
+        export_dir = os.path.join(self.exports_path, export_id)
+        assets_root = os.environ.get("ASSETS_PATH", "app/assets/")
+        if os.path.isdir(export_dir):
+            match_file_path = os.path.join(export_dir, MATCH_FILE)
+            user_file_path = os.path.join(export_dir, USER_FILE)
+            media_path = os.path.join(export_dir, MEDIA_DIR)
+        else:
+            # the files are read straight out of the archive, wherever Hinge put them inside it
+            archive_path = export_dir + ARCHIVE_SUFFIX
+            members = locate_members(archive_path)
+            match_file_path = archive_member_path(archive_path, members["matches"] or MATCH_FILE)
+            user_file_path = archive_member_path(archive_path, members["user"] or USER_FILE)
+            media_path = archive_member_path(archive_path, members["media"] or MEDIA_DIR + "/")
+        return Export(
+            export_id,
+            match_file_path=match_file_path,
+            user_file_path=user_file_path,
+            media_path=media_path,
+            assets_path=os.path.join(assets_root, "exports", export_id),
+            assets_url=f"assets/exports/{export_id}/")
+
+
+# shared by the pages so every page resolves exports through the same bounded set
+export_registry = ExportRegistry()
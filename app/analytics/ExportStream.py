@@ -0,0 +1,81 @@
+import json
+
+CHUNK_SIZE = 1 << 16
+_WHITESPACE = " \t\n\r"
+
+
+def iter_json_array(file, chunk_size=CHUNK_SIZE, with_text=False):
+    """
+    Incrementally walks a top-level JSON array and yields its elements one at a time, so only the
+    element being decoded (plus one read chunk) is held in memory instead of the whole document.
+    :param file: text file object positioned at the start of the array
+    :param chunk_size: number of characters to read from the file at a time
+    :param with_text: yield (element, raw JSON text of the element) pairs instead of just the elements
+    """
+    decoder = json.JSONDecoder()
+    reader = _ChunkReader(file, chunk_size)
+
+    if reader.next_token() != "[":
+        raise Exception("Expected the export to be a JSON array.")
+    reader.pos += 1
+
+    if reader.next_token() == "]":
+        return
+
+    while True:
+        reader.next_token()
+        value = reader.decode(decoder)
+        yield (value, reader.buffer[reader.value_start:reader.pos]) if with_text else value
+
+        token = reader.next_token()
+        reader.pos += 1
+        if token == "]":
+            return
+        if token != ",":
+            raise Exception(f"Malformed JSON array, unexpected {token!r} between elements.")
+
+
+class _ChunkReader:
+    def __init__(self, file, chunk_size):
+        self.file = file
+        self.chunk_size = chunk_size
+        self.buffer = ""
+        self.pos = 0
+        self.value_start = 0
+        self.eof = False
+
+    def fill(self, size=None):
+        # drop what has already been consumed before appending the next chunk
+        chunk = self.file.read(size or self.chunk_size)
+        self.buffer = self.buffer[self.pos:] + chunk
+        self.pos = 0
+        if not chunk:
+            self.eof = True
+
+    def next_token(self):
+        """Skips whitespace and returns the next character without consuming it."""
+        while True:
+            while self.pos < len(self.buffer) and self.buffer[self.pos] in _WHITESPACE:
+                self.pos += 1
+            if self.pos < len(self.buffer):
+                return self.buffer[self.pos]
+            if self.eof:
+                raise Exception("Unexpected end of JSON array.")
+            self.fill()
+
+    def decode(self, decoder):
+        size = self.chunk_size
+        while True:
+            try:
+                value, end = decoder.raw_decode(self.buffer, self.pos)
+                # a value that runs to the end of the buffer might continue in the next chunk (e.g. numbers)
+                if end < len(self.buffer) or self.eof:
+                    self.value_start = self.pos
+                    self.pos = end
+                    return value
+            except json.JSONDecodeError:
+                if self.eof:
+                    raise
+            # the element spans past the buffer, grow the reads so large elements are not re-decoded too often
+            self.fill(size)
+            size *= 2
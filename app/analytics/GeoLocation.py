@@ -0,0 +1,175 @@
+from concurrent.futures import ThreadPoolExecutor
+import logging
+import os
+import sqlite3
+import threading
+import time
+
+# Nominatim's usage policy allows at most one request per second
+DEFAULT_MIN_INTERVAL = 1.0
+DEFAULT_MAX_WORKERS = 2
+
+
+class GeoLocationService:
+    """
+    Resolves device IP addresses to a city and its coordinates.
+
+    IPs are looked up in the local GeoLite2 database, which is opened once, and the resulting cities are
+    geocoded to coordinates. Both steps are cached in SQLite, so an IP or city is only ever resolved once
+    across runs. IPs are deduplicated before any lookup, and the remaining geocodes run on a small thread
+    pool behind a rate limiter.
+    """
+    def __init__(self, geolite_db_path=None, cache_path=None, reader=None, geocoder=None, max_workers=None, min_interval=None):
+        """
+        :param geolite_db_path: path to the GeoLite2 City database
+        :param cache_path: SQLite file used to persist lookups, in memory only when not set
+        :param reader: GeoIP reader, opened from geolite_db_path when not given
+        :param geocoder: geocoder with a geocode(query) method, Nominatim when not given
+        """
+        if cache_path is None:
+            cache_path = os.environ.get("GEO_CACHE_PATH")
+        if max_workers is None:
+            max_workers = int(os.environ.get("GEOCODE_MAX_WORKERS", DEFAULT_MAX_WORKERS))
+        if min_interval is None:
+            min_interval = float(os.environ.get("GEOCODE_MIN_INTERVAL", DEFAULT_MIN_INTERVAL))
+
+        self.geolite_db_path = geolite_db_path
+        self.max_workers = max_workers
+        self._reader = reader
+        self._geocoder = geocoder
+        self._rate_limiter = _RateLimiter(min_interval)
+
+        if cache_path and os.path.dirname(cache_path):
+            os.makedirs(os.path.dirname(cache_path), exist_ok=True)
+        self.cache_path = cache_path
+        self._db_lock = threading.Lock()
+        self._connect()
+
+    def _connect(self):
+        self._db = sqlite3.connect(self.cache_path or ":memory:", check_same_thread=False)
+        self._db_pid = os.getpid()
+        with self._db_lock, self._db:
+            self._db.execute("CREATE TABLE IF NOT EXISTS ip_cities (ip TEXT PRIMARY KEY, city TEXT, region TEXT, country TEXT)")
+            self._db.execute("CREATE TABLE IF NOT EXISTS geocodes (query TEXT PRIMARY KEY, latitude REAL, longitude REAL)")
+
+    def locate(self, ip_addresses):
+        """
+        :param ip_addresses: IP addresses, duplicates are looked up once
+        :return: list of dicts with the ip, city, region, country, latitude and longitude of each IP that resolved
+        """
+        # a SQLite connection can't be shared with a forked worker, each process opens its own
+        if self._db_pid != os.getpid():
+            self._connect()
+
+        ip_cities = {}
+        for ip in dict.fromkeys(ip_addresses):
+            city = self._city(ip)
+            if city is not None:
+                ip_cities[ip] = city
+
+        coordinates = self._geocode_all({_query(city) for city in ip_cities.values()})
+
+        locations = []
+        for ip, (city, region, country) in ip_cities.items():
+            location = coordinates.get(_query((city, region, country)))
+            if location is not None:
+                locations.append({
+                    "ip": ip,
+                    "city": city,
+                    "region": region,
+                    "country": country,
+                    "latitude": location[0],
+                    "longitude": location[1]
+                })
+        return locations
+
+    def _city(self, ip):
+        with self._db_lock:
+            row = self._db.execute("SELECT city, region, country FROM ip_cities WHERE ip = ?", (ip,)).fetchone()
+        if row is not None:
+            # IPs the database doesn't know are cached as empty rows so they aren't looked up again
+            return row if row[2] is not None else None
+
+        reader = self._get_reader()
+        if reader is None:
+            return None
+        try:
+            response = reader.city(ip)
+            city = (response.city.name, response.subdivisions.most_specific.name, response.country.name)
+        except Exception:
+            city = (None, None, None)  # invalid or private IP
+
+        with self._db_lock, self._db:
+            self._db.execute("INSERT OR REPLACE INTO ip_cities VALUES (?, ?, ?, ?)", (ip,) + city)
+        return city if city[2] is not None else None
+
+    def _geocode_all(self, queries):
+        coordinates = {}
+        missing = []
+        with self._db_lock:
+            for query in queries:
+                row = self._db.execute("SELECT latitude, longitude FROM geocodes WHERE query = ?", (query,)).fetchone()
+                if row is None:
+                    missing.append(query)
+                elif row[0] is not None:
+                    coordinates[query] = row
+
+        if missing:
+            with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+                results = list(executor.map(self._geocode, missing))
+            # failed lookups aren't cached, only places the geocoder doesn't know are remembered as misses
+            resolved = [(query, result) for query, result in zip(missing, results) if result is not None]
+            with self._db_lock, self._db:
+                self._db.executemany("INSERT OR REPLACE INTO geocodes VALUES (?, ?, ?)",
+                                     [(query,) + result for query, result in resolved])
+            coordinates.update((query, result) for query, result in resolved if result[0] is not None)
+        return coordinates
+
+    def _geocode(self, query):
+        """:return: (latitude, longitude), (None, None) when the place isn't found, None when the lookup failed"""
+        self._rate_limiter.wait()
+        try:
+            location = self._get_geocoder().geocode(query)
+        except Exception as e:
+            # timeouts, rate limiting or no network, the query is tried again on the next lookup
+            logging.warning(f"Unable to geocode '{query}': {e}")
+            return None
+        if not location:
+            return (None, None)
+        return (location.latitude, location.longitude)
+
+    def _get_reader(self):
+        if self._reader is None and self.geolite_db_path:
+            try:
+                import geoip2.database
+                self._reader = geoip2.database.Reader(self.geolite_db_path)
+            except Exception as e:
+                logging.warning(f"Unable to open the GeoLite database '{self.geolite_db_path}': {e}")
+                self.geolite_db_path = None
+        return self._reader
+
+    def _get_geocoder(self):
+        if self._geocoder is None:
+            from geopy.geocoders import Nominatim
+            self._geocoder = Nominatim(user_agent="geoip_mapper")
+        return self._geocoder
+
+
+class _RateLimiter:
+    """Spaces out calls from any number of threads so they start at least min_interval seconds apart."""
+    def __init__(self, min_interval):
+        self.min_interval = min_interval
+        self._next_call = 0.0
+        self._lock = threading.Lock()
+
+    def wait(self):
+        with self._lock:
+            now = time.monotonic()
+            delay = self._next_call - now
+            self._next_call = max(now, self._next_call) + self.min_interval
+        if delay > 0:
+            time.sleep(delay)
+
+
+def _query(city):
+    return ", ".join(str(part) for part in city)
@@ -1,9 +1,31 @@
-import json, os
+import gc, hashlib, logging, os, time
+from array import array
+from contextlib import contextmanager
 from datetime import datetime, timedelta
+import numpy as np
+
+from .ExportArchive import open_export_file
+from .ExportStream import iter_json_array
+from .MatchIndex import MatchIndex, MatchIndexBuilder
+from .Metrics import ANALYTICS_SECONDS, INGEST_SECONDS, timed
+from .Rollups import Rollups, period_labels
+from .Snapshot import (SnapshotStore, content_digest, export_fingerprint, hashed_export_file, ingest_stat_key,
+                       key_fingerprint, stat_key)
+from .Timestamps import MISSING, datetime_to_epoch, to_datetime64
+
+SECONDS_PER_HOUR = 3600
+SECONDS_PER_DAY = 3600 * 24
 
 class MatchAnalytics:
-    def __init__(self):
-        self.match_file_path = os.environ.get("MATCH_FILE_PATH")
+    def __init__(self, match_file_path=None, stream=None, previous=None):
+        # the paths default to the environment for the single export the app serves out of the box
+        self.match_file_path = match_file_path or os.environ.get("MATCH_FILE_PATH")
+        # in stream mode the export is walked one interaction at a time and never held in memory
+        if stream is None:
+            stream = os.environ.get("MATCH_INGEST_MODE", "load") == "stream"
+        self.stream = stream
+        # content hash of every interaction, so a reload can reuse the rows that didn't change
+        self.entry_hashes = None
 
         if self.match_file_path is None:
             raise Exception("MATCH_FILE_PATH environment variable is not set.")
@@ -11,109 +33,326 @@ class MatchAnalytics:
         if '.json' not in self.match_file_path:
             raise Exception("The match file needs to be a JSON file.")
 
-        with open(self.match_file_path, 'r') as file:
-            match_data = json.load(file)
-        self.match_data = match_data
+        start = time.perf_counter()
+        self._stat_key = ingest_stat_key(self.match_file_path)
+        self._fingerprint = key_fingerprint(self._stat_key) if self._stat_key else None
+        # parsed exports are cached as memory-mapped snapshots when a snapshot directory is configured
+        snapshot_path = os.environ.get("SNAPSHOT_PATH")
+        if snapshot_path:
+            snapshots = SnapshotStore(snapshot_path)
+            with snapshots.lock(self.match_file_path, "matches"):
+                mode = self._attach_snapshot(snapshots, previous)
+        else:
+            self._parse(previous)
+            # sorted event times, so windowed queries are binary searches instead of rescans
+            self.rollups = Rollups.from_index(self.index)
+            mode = self._parse_mode(previous)
+        INGEST_SECONDS.observe(time.perf_counter() - start, kind="matches", mode=mode)
+
+    def reload(self):
+        """
+        Ingests the export again after it changed on disk, only parsing the interactions whose raw text
+        changed. Returns a new MatchAnalytics and leaves this one untouched, so callers still holding it
+        keep a consistent view until they fetch the new one.
+        """
+        return MatchAnalytics(self.match_file_path, stream=self.stream, previous=self)
+
+    def _parse(self, previous=None, digest=None):
+        """:param digest: hash object fed the bytes of the export as they are parsed, see content_digest"""
+        # every parse hashes the raw text of each interaction, which is what tells unchanged ones apart on the
+        # next reload, so even the first reload after a fresh load reuses rows. only a fresh load keeps the raw records
+        self.match_data = [] if not self.stream and previous is None else None
+        with self._open_export(digest) as file, _gc_paused():
+            entries = iter_json_array(file, with_text=True)
+            if self.match_data is not None:
+                entries = _kept(entries, self.match_data)
+            # build the columnar index once so the analytics below never re-walk the raw entries
+            self.index, self.entry_hashes = _index_entries(entries, previous)
+
+    def _open_export(self, digest):
+        if digest is None:
+            return open_export_file(self.match_file_path)
+        return hashed_export_file(self.match_file_path, digest)
+
+    def _parse_mode(self, previous):
+        if previous is not None:
+            return "reload"
+        return "stream" if self.stream else "load"
+
+    def _attach_snapshot(self, snapshots, previous=None):
+        # the first process to load an export writes its snapshot, every process then maps that same file,
+        # so the columns are shared between workers instead of each holding its own copy
+        snapshot = snapshots.load(self.match_file_path, "matches", key=self._stat_key)
+        mode = "snapshot"
+        if snapshot is None:
+            # the snapshot is named by the bytes parsed, the file may have changed again by the time it's saved
+            digest = content_digest()
+            self._parse(previous, digest)
+            rollups = Rollups.from_index(self.index)
+            columns = dict(self.index.columns(), **rollups.columns())
+            if self.entry_hashes is not None:
+                columns["entry_hash"] = self.entry_hashes
+            snapshot = snapshots.save(self.match_file_path, "matches", columns,
+                                      {"block_types": self.index.block_types}, digest.hexdigest(), self._stat_key)
+            mode = self._parse_mode(previous)
+            if snapshot is None:
+                # the snapshot couldn't be read back, keep serving from this process's own copy
+                self.rollups = rollups
+                return mode
+
+        columns, meta = snapshot
+        # raw records are re-read from the export on demand rather than kept next to the shared columns
+        self.match_data = None
+        self.index = MatchIndex.from_columns(columns, meta["block_types"])
+        self.rollups = Rollups.from_columns(columns)
+        self.entry_hashes = columns.get("entry_hash")
+        return mode
+
+    def fingerprint(self):
+        return self._fingerprint or export_fingerprint(self.match_file_path)
+
+    def prune_snapshots(self):
+        """
+        Removes the snapshots of earlier versions of the export once this version replaced them, so watched
+        exports that keep changing don't pile up snapshots in SNAPSHOT_PATH.
+        """
+        snapshot_path = os.environ.get("SNAPSHOT_PATH")
+        if not snapshot_path or self._stat_key is None:
+            return
+        snapshots = SnapshotStore(snapshot_path)
+        with snapshots.lock(self.match_file_path, "matches"):
+            keep_keys = {self._stat_key}
+            try:
+                # a version written since this one was loaded is about to be reloaded, keep it as well
+                keep_keys.add(stat_key(self.match_file_path))
+            except OSError:
+                pass
+            snapshots.prune(self.match_file_path, "matches", keep_keys)
 
+    @timed(ANALYTICS_SECONDS)
     def get_match_data(self):
         all_matches = []
-        for entry in self.match_data:
+        for entry in self._iter_entries():
             matches = entry.get("match", [])
             all_matches.extend(matches)
         return all_matches
     
+    @timed(ANALYTICS_SECONDS)
     def get_block_data(self):
         all_blocks = []
-        for entry in self.match_data:
+        for entry in self._iter_entries():
             blocks = entry.get("block", [])
             all_blocks.extend(blocks)
         return all_blocks 
     
+    @timed(ANALYTICS_SECONDS)
     def get_likes_data(self):
         all_likes = []
-        for entry in self.match_data:
+        for entry in self._iter_entries():
             likes = entry.get("like", [])
             all_likes.extend(likes)
         return all_likes
     
+    @timed(ANALYTICS_SECONDS)
     def get_chat_data(self):
         all_chats = []
-        for entry in self.match_data:
+        for entry in self._iter_entries():
             chats = entry.get("chats", [])
             all_chats.extend(chats)
         return all_chats 
 
-    def get_message_count_last_12_months(self):
-        now = datetime.now()
-        one_year_ago = now - timedelta(days=365)
+    def _iter_entries(self):
+        # raw records are only kept in load mode, otherwise they are re-read from the export on demand
+        if self.match_data is not None:
+            yield from self.match_data
+            return
+        with open_export_file(self.match_file_path) as file:
+            yield from iter_json_array(file)
 
-        msg_counts_per_month = []
-        for entry in self.match_data:
-            match = entry.get("match", [])
-            chats = entry.get("chats", [])
-            if match:
-                match_time = datetime.fromisoformat(match[0]["timestamp"])
-                if match_time >= one_year_ago:
-                    month = match_time.strftime("%Y-%m")
-                    msg_counts_per_month.append({
-                        "month": month,
-                        "message_count": len(chats)
-                    })
-        return msg_counts_per_month
-
-    def get_response_latency(self):
-        latency_data = []
-        for entry in self.match_data:
-            match = entry.get("match", [])
-            chats = entry.get("chats", [])
+    @timed(ANALYTICS_SECONDS)
+    def get_message_count_last_12_months(self, as_frame=False):
+        one_year_ago = datetime_to_epoch(datetime.now() - timedelta(days=365))
+        df = self.get_message_counts(start=one_year_ago, granularity="month", as_frame=True)
+        return _records(df.rename(columns={"period": "month"}), as_frame)
 
-            if match and chats:
-                match_time = datetime.fromisoformat(match[0]["timestamp"])
-                first_message_time = datetime.fromisoformat(chats[0]["timestamp"])
-                latency = (first_message_time - match_time).total_seconds() / (3600 * 24)
-
-                latency_data.append({
-                    "match_time": match_time,
-                    "first_message_time": first_message_time,
-                    "latency_days": latency
-                })
-        return latency_data
-    
-    def get_match_durations(self):
-        durations = []
-        for entry in self.match_data:
-            match = entry.get("match", [])
-            block = entry.get("block", [])
-
-            if match and block:
-                match_time = datetime.fromisoformat(match[0]["timestamp"])
-                block_time = datetime.fromisoformat(block[0]["timestamp"])
-                duration_days = (block_time - match_time).days
-
-                durations.append({
-                    "match_time": match_time,
-                    "block_time": block_time,
-                    "duration_days": duration_days
-                })
-        return durations
-
-    def get_match_rm_counts(self):
-        records = []
-
-        for entry in self.match_data:
-            match_time = entry.get("match", [{}])[0].get("timestamp")
-            block_time = entry.get("block", [{}])[0].get("timestamp")
-            chats = entry.get("chats", [])
+    @timed(ANALYTICS_SECONDS)
+    def get_message_counts(self, start=None, end=None, granularity="month", as_frame=False):
+        """
+        Messages exchanged in each match made in [start, end), with the day, week or month it was made in.
+        :param start: epoch seconds, from the first match when not set
+        :param end: epoch seconds, through the last match when not set
+        """
+        index = self.index
+        rows = self.rollups.match_rows(start, end)
+        df = _frame({
+            "period": period_labels(index.match_ts[rows], granularity),
+            "message_count": index.chat_count[rows]
+        })
+        return _records(df, as_frame)
+
+    @timed(ANALYTICS_SECONDS)
+    def get_activity_counts(self, start=None, end=None, granularity="month", as_frame=False):
+        """Number of matches, likes, chats and blocks per day, week or month in [start, end)."""
+        return _records(self.rollups.counts(start, end, granularity), as_frame)
+
+    @timed(ANALYTICS_SECONDS)
+    def get_response_latency(self, as_frame=False):
+        index = self.index
+        rows = index.has("match_ts") & index.has("first_chat_ts")
+        match_ts = index.match_ts[rows]
+        first_message_ts = index.first_chat_ts[rows]
+
+        df = _frame({
+            "match_time": to_datetime64(match_ts),
+            "first_message_time": to_datetime64(first_message_ts),
+            "latency_days": (first_message_ts - match_ts) / (3600 * 24)
+        })
+        return _records(df, as_frame)
+
+    @timed(ANALYTICS_SECONDS)
+    def get_match_durations(self, as_frame=False):
+        index = self.index
+        rows = index.has("match_ts") & index.has("block_ts")
+        match_ts = index.match_ts[rows]
+        block_ts = index.block_ts[rows]
+
+        df = _frame({
+            "match_time": to_datetime64(match_ts),
+            "block_time": to_datetime64(block_ts),
+            # floor division matches timedelta.days for negative durations too
+            "duration_days": (block_ts - match_ts) // SECONDS_PER_DAY
+        })
+        return _records(df, as_frame)
+
+    @timed(ANALYTICS_SECONDS)
+    def get_match_rm_counts(self, as_frame=False):
+        index = self.index
+        rows = index.has("match_ts") & index.has("block_ts")
+
+        df = _frame({
+            "message_count": index.chat_count[rows],
+            "duration_days": (index.block_ts[rows] - index.match_ts[rows]) // SECONDS_PER_DAY
+        })
+        return _records(df, as_frame)
+
+    @timed(ANALYTICS_SECONDS)
+    def get_inter_message_gaps(self, as_frame=False):
+        """Hours between consecutive messages of the same conversation."""
+        rows, chat_ts = _sorted_chats(self.index)
+        same_conversation = rows[1:] == rows[:-1]
+
+        df = _frame({
+            "interaction": rows[1:][same_conversation],
+            "gap_hours": np.diff(chat_ts)[same_conversation] / SECONDS_PER_HOUR
+        })
+        return _records(df, as_frame)
+
+    @timed(ANALYTICS_SECONDS)
+    def get_conversation_lengths(self, as_frame=False):
+        """Message count and hours from the first to the last message of every conversation."""
+        rows, chat_ts = _sorted_chats(self.index)
+        starts = np.flatnonzero(np.r_[True, rows[1:] != rows[:-1]]) if len(rows) else np.empty(0, dtype=np.int64)
+        ends = np.r_[starts[1:], len(rows)]
+
+        df = _frame({
+            "interaction": rows[starts],
+            "message_count": ends - starts,
+            "length_hours": (chat_ts[ends - 1] - chat_ts[starts]) / SECONDS_PER_HOUR
+        })
+        return _records(df, as_frame)
+
+    @timed(ANALYTICS_SECONDS)
+    def get_last_message_to_block(self, as_frame=False):
+        """Days from the last message of a conversation to the match being removed."""
+        index = self.index
+        rows, chat_ts = _sorted_chats(index)
+        # after sorting, the last message of each conversation is where the next conversation starts
+        last = np.flatnonzero(np.r_[rows[1:] != rows[:-1], True]) if len(rows) else np.empty(0, dtype=np.int64)
+        rows, last_message_ts = rows[last], chat_ts[last]
+        blocked = index.has("block_ts")[rows]
+        rows, last_message_ts = rows[blocked], last_message_ts[blocked]
+
+        df = _frame({
+            "interaction": rows,
+            "last_message_time": to_datetime64(last_message_ts),
+            "block_time": to_datetime64(index.block_ts[rows]),
+            "days_to_block": (index.block_ts[rows] - last_message_ts) / SECONDS_PER_DAY
+        })
+        return _records(df, as_frame)
+
+
+def _sorted_chats(index):
+    # chats aren't guaranteed to be in order within an export, sort by conversation then time
+    rows = index.chat_rows()
+    chat_ts = index.chat_ts
+    present = chat_ts != MISSING
+    rows, chat_ts = rows[present], chat_ts[present]
+    order = np.lexsort((chat_ts, rows))
+    return rows[order], chat_ts[order]
+
+
+def _frame(columns):
+    # pandas is imported when an analytic is first computed rather than when the app starts
+    import pandas as pd
+    return pd.DataFrame(columns)
+
+
+def _records(df, as_frame):
+    # the analytics are computed as frames, callers that want plain records get them converted in one go
+    if as_frame:
+        return df
+    return df.to_dict("records")
+
+
+@contextmanager
+def _gc_paused():
+    """
+    Turns the cyclic garbage collector off while an export is parsed. Parsed records are plain dicts and lists
+    that can't form cycles, collecting while they pile up would only walk them over and over.
+    """
+    enabled = gc.isenabled()
+    gc.disable()
+    try:
+        yield
+    finally:
+        if enabled:
+            gc.enable()
+
+
+def _kept(entries, records):
+    """Passes the (interaction, raw JSON text) pairs through while appending every interaction to records."""
+    for entry, text in entries:
+        records.append(entry)
+        yield entry, text
 
-            if match_time and block_time:
-                match_dt = datetime.fromisoformat(match_time)
-                block_dt = datetime.fromisoformat(block_time)
-                delta_days = (block_dt - match_dt).days
-                message_count = len(chats)
 
-                records.append({
-                    "message_count": message_count,
-                    "duration_days": delta_days
-                })
+def _index_entries(entries, previous=None):
+    """
+    Builds the index of (interaction, raw JSON text) pairs along with the content hash of every interaction.
+    Interactions whose hash is also in previous are copied from its index instead of being parsed again.
+    """
+    reusable = {}
+    if previous is not None and previous.entry_hashes is not None:
+        reusable = dict(zip(previous.entry_hashes.tolist(), range(len(previous.entry_hashes))))
+    # new interactions are appended after the previous rows, then everything is put back in export order
+    reused_rows = len(previous.index) if reusable else 0
+    builder = MatchIndexBuilder()
+    hashes = array("Q")
+    rows = array("q")
+    added = 0
+    for entry, text in entries:
+        digest = int.from_bytes(hashlib.blake2b(text.encode(), digest_size=8).digest(), "little")
+        hashes.append(digest)
+        row = reusable.get(digest)
+        if row is None:
+            builder.add(entry)
+            row = reused_rows + added
+            added += 1
+        rows.append(row)
 
-        return records
\ No newline at end of file
+    hashes = np.frombuffer(hashes, dtype=np.uint64).copy()
+    if not reusable:
+        return builder.build(), hashes
+    logging.info(f"Reused {len(rows) - added} of {len(rows)} interactions from the previous ingest.")
+    index = previous.index.concat(builder.build()).take(np.frombuffer(rows, dtype=np.int64))
+    return index, hashes
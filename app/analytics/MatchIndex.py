@@ -0,0 +1,170 @@
+from array import array
+import numpy as np
+
+from .Timestamps import MISSING, to_epoch
+# number of interactions buffered before their timestamps are parsed into arrays
+CHUNK_ROWS = 1 << 16
+
+
+class MatchIndex:
+    """
+    Columnar view of the interactions in a matches export. Each interaction is one row and each
+    column is a NumPy array, so the match analytics can be answered with vectorized operations
+    instead of walking the raw list of dicts.
+
+    Timestamps are stored as int64 epoch seconds, with MISSING where the event did not happen.
+
+    Individual messages are stored CSR style: chat_ts and chat_len hold the timestamp and body length of
+    every message in export order, and the messages of row i are chat_offsets[i]:chat_offsets[i + 1].
+    """
+    TIMESTAMP_COLUMNS = ("match_ts", "first_chat_ts", "block_ts", "like_ts")
+    CHAT_COLUMNS = ("chat_offsets", "chat_ts", "chat_len")
+    COLUMNS = TIMESTAMP_COLUMNS + ("chat_count", "block_type") + CHAT_COLUMNS
+
+    def __init__(self, match_ts, first_chat_ts, block_ts, like_ts, chat_count, block_type, block_types,
+                 chat_offsets, chat_ts, chat_len):
+        self.match_ts = match_ts
+        self.first_chat_ts = first_chat_ts
+        self.block_ts = block_ts
+        self.like_ts = like_ts
+        self.chat_count = chat_count
+        # block types are stored as small integer codes into the block_types vocabulary, -1 means no block
+        self.block_type = block_type
+        self.block_types = block_types
+        self.chat_offsets = chat_offsets
+        self.chat_ts = chat_ts
+        self.chat_len = chat_len
+
+    def __len__(self):
+        return len(self.match_ts)
+
+    @classmethod
+    def from_entries(cls, entries):
+        """
+        Builds the index in a single pass over the interactions.
+        :param entries: iterable of interaction dicts as they appear in matches.json
+        """
+        builder = MatchIndexBuilder()
+        for entry in entries:
+            builder.add(entry)
+        return builder.build()
+
+    @classmethod
+    def from_columns(cls, columns, block_types):
+        """Rebuilds an index from the arrays returned by columns(), e.g. a memory-mapped snapshot."""
+        return cls(block_types=list(block_types), **{column: columns[column] for column in cls.COLUMNS})
+
+    def columns(self):
+        return {column: getattr(self, column) for column in self.COLUMNS}
+
+    def has(self, column):
+        """Boolean mask of the rows where the given timestamp column is present."""
+        return getattr(self, column) != MISSING
+
+    def chats(self, row):
+        """Timestamps and body lengths of the messages of one interaction."""
+        start, end = self.chat_offsets[row], self.chat_offsets[row + 1]
+        return self.chat_ts[start:end], self.chat_len[start:end]
+
+    def chat_rows(self):
+        """Row of every message, parallel to chat_ts and chat_len."""
+        return np.repeat(np.arange(len(self), dtype=np.int64), np.diff(self.chat_offsets))
+
+    def concat(self, other):
+        """Index holding the rows of this index followed by the rows of other."""
+        # other's block type codes are remapped onto this index's vocabulary, extended with any new types
+        block_types = list(self.block_types) + [name for name in other.block_types if name not in self.block_types]
+        codes = np.array([block_types.index(name) for name in other.block_types] + [-1], dtype=np.int16)
+        columns = {column: np.concatenate([getattr(self, column), getattr(other, column)])
+                   for column in self.TIMESTAMP_COLUMNS + ("chat_count", "chat_ts", "chat_len")}
+        return MatchIndex(
+            block_type=np.concatenate([self.block_type, codes[other.block_type]]),
+            block_types=block_types,
+            chat_offsets=np.concatenate([self.chat_offsets, other.chat_offsets[1:] + self.chat_offsets[-1]]),
+            **columns)
+
+    def take(self, rows):
+        """Index holding the given rows, in the given order."""
+        rows = np.asarray(rows, dtype=np.int64)
+        lengths = np.diff(self.chat_offsets)[rows]
+        chat_offsets = np.zeros(len(rows) + 1, dtype=np.int64)
+        np.cumsum(lengths, out=chat_offsets[1:])
+        # position of every kept message in the old chat columns: its row's old start plus its rank in the row
+        starts = np.repeat(self.chat_offsets[:-1][rows] - chat_offsets[:-1], lengths)
+        messages = starts + np.arange(chat_offsets[-1], dtype=np.int64)
+        columns = {column: getattr(self, column)[rows]
+                   for column in self.TIMESTAMP_COLUMNS + ("chat_count", "block_type")}
+        return MatchIndex(block_types=list(self.block_types), chat_offsets=chat_offsets,
+                          chat_ts=self.chat_ts[messages], chat_len=self.chat_len[messages], **columns)
+
+
+class MatchIndexBuilder:
+    """
+    Accumulates interactions one at a time and converts them into a MatchIndex. Raw timestamps are
+    buffered as strings and parsed a whole column at a time every chunk_rows interactions, so the
+    memory held by the builder stays proportional to the derived arrays rather than the raw export.
+    """
+    def __init__(self, chunk_rows=CHUNK_ROWS):
+        self.chunk_rows = chunk_rows
+        self._pending = {column: [] for column in MatchIndex.TIMESTAMP_COLUMNS}
+        self._parsed = {column: [] for column in MatchIndex.TIMESTAMP_COLUMNS}
+        self._chat_count = array("i")
+        self._block_type = array("h")
+        self._block_types = {}
+        self._pending_chats = []
+        self._parsed_chats = []
+        self._chat_len = array("i")
+
+    def add(self, entry):
+        self._pending["match_ts"].append(_first_timestamp(entry, "match"))
+        self._pending["first_chat_ts"].append(_first_timestamp(entry, "chats"))
+        self._pending["block_ts"].append(_first_timestamp(entry, "block"))
+        self._pending["like_ts"].append(_first_timestamp(entry, "like"))
+        chats = entry.get("chats") or []
+        self._chat_count.append(len(chats))
+        for chat in chats:
+            self._pending_chats.append(chat.get("timestamp"))
+            self._chat_len.append(len(chat.get("body") or ""))
+
+        blocks = entry.get("block") or []
+        block_type = blocks[0].get("block_type") if blocks else None
+        if block_type is None:
+            self._block_type.append(-1)
+        else:
+            self._block_type.append(self._block_types.setdefault(block_type, len(self._block_types)))
+
+        if len(self._pending["match_ts"]) >= self.chunk_rows or len(self._pending_chats) >= self.chunk_rows:
+            self._flush()
+
+    def build(self):
+        self._flush()
+        columns = {column: np.concatenate(chunks) if chunks else np.empty(0, dtype=np.int64)
+                   for column, chunks in self._parsed.items()}
+        chat_count = np.frombuffer(self._chat_count, dtype=np.int32).copy()
+        chat_offsets = np.zeros(len(chat_count) + 1, dtype=np.int64)
+        np.cumsum(chat_count, out=chat_offsets[1:])
+        return MatchIndex(
+            chat_count=chat_count,
+            block_type=np.frombuffer(self._block_type, dtype=np.int16).copy(),
+            block_types=list(self._block_types),
+            chat_offsets=chat_offsets,
+            chat_ts=np.concatenate(self._parsed_chats) if self._parsed_chats else np.empty(0, dtype=np.int64),
+            chat_len=np.frombuffer(self._chat_len, dtype=np.int32).copy(),
+            **columns)
+
+    def _flush(self):
+        if self._pending["match_ts"]:
+            for column, values in self._pending.items():
+                self._parsed[column].append(to_epoch(values))
+                values.clear()
+        if self._pending_chats:
+            self._parsed_chats.append(to_epoch(self._pending_chats))
+            self._pending_chats.clear()
+
+
+def _first_timestamp(entry, key):
+    events = entry.get(key) or []
+    if not events:
+        return None
+    return events[0].get("timestamp")
+
@@ -0,0 +1,109 @@
+from concurrent.futures import ThreadPoolExecutor
+import hashlib
+import json
+import logging
+import os
+import threading
+
+from .MediaSync import MANIFEST_FILE
+
+# longest edge in pixels of each variant, "card" matches the 500px slideshow card
+VARIANTS = {"thumbnail": 160, "card": 500, "full": 1600}
+DERIVATIVES_DIR = "derivatives"
+IMAGE_EXTENSIONS = (".jpg", ".jpeg", ".png")
+JPEG_QUALITY = 80
+
+
+def generate_derivatives(assets_path, max_workers=None):
+    """
+    Generates resized, compressed variants of every image in the asset directory.
+
+    Variants are written to assets/derivatives/ named by the content hash of their source image, so an
+    image only ever gets resized once and the files can be served with long-lived cache headers. Missing
+    variants are rendered on a thread pool. Images Pillow can't read keep being served as the original.
+    :return: dict of image file name to dict of variant name to path relative to the asset directory
+    """
+    if not assets_path or not os.path.isdir(assets_path):
+        return {}
+    try:
+        import PIL  # noqa: F401
+    except ImportError:
+        logging.warning("Pillow is not installed, serving original images without derivatives.")
+        return {}
+
+    output_dir = os.path.join(assets_path, DERIVATIVES_DIR)
+    os.makedirs(output_dir, exist_ok=True)
+    hashes = _content_hashes(assets_path)
+
+    derivatives = {}
+    pending = []
+    for file_name, content_hash in hashes.items():
+        variants = {variant: f"{DERIVATIVES_DIR}/{content_hash[:16]}-{variant}.jpg" for variant in VARIANTS}
+        derivatives[file_name] = variants
+        if not all(os.path.exists(os.path.join(assets_path, path)) for path in variants.values()):
+            pending.append((os.path.join(assets_path, file_name),
+                            {variant: os.path.join(assets_path, path) for variant, path in variants.items()}))
+
+    try:
+        results = _render_all(pending, max_workers)
+    except Exception as e:
+        # the images left unrendered are served as the originals, they are retried on the next load
+        logging.warning(f"Unable to render image derivatives, serving the originals: {e}")
+        results = [False] * len(pending)
+
+    for (src_path, _), rendered in zip(pending, results):
+        if not rendered:
+            derivatives.pop(os.path.basename(src_path), None)
+    logging.info(f"Image derivatives: {len(pending)} rendered, {len(derivatives)} available.")
+    return derivatives
+
+
+def _render_all(pending, max_workers=None):
+    if len(pending) <= 1:
+        return [_render(job) for job in pending]
+    # Pillow releases the GIL while decoding, resizing and encoding, so threads render in parallel. Unlike a
+    # process pool they are safe to start both in the gunicorn master during warmup and in the forked workers.
+    with ThreadPoolExecutor(max_workers=max_workers or min(len(pending), os.cpu_count() or 1)) as executor:
+        return list(executor.map(_render, pending))
+
+
+def _render(job):
+    from PIL import Image, ImageOps
+
+    src_path, outputs = job
+    try:
+        with Image.open(src_path) as image:
+            # phones store rotation in EXIF, apply it before the metadata is dropped
+            image = ImageOps.exif_transpose(image).convert("RGB")
+            for variant, path in outputs.items():
+                size = VARIANTS[variant]
+                resized = image.copy()
+                resized.thumbnail((size, size))
+                tmp_path = f"{path}.tmp-{os.getpid()}-{threading.get_ident()}"
+                resized.save(tmp_path, "JPEG", quality=JPEG_QUALITY, optimize=True, progressive=True)
+                os.replace(tmp_path, path)
+    except Exception as e:
+        logging.warning(f"Unable to generate derivatives for '{src_path}': {e}")
+        return False
+    return True
+
+
+def _content_hashes(assets_path):
+    # the media sync already hashed every file it placed, only hash images it doesn't know about
+    try:
+        with open(os.path.join(assets_path, MANIFEST_FILE), "r") as file:
+            manifest = json.load(file)
+    except (OSError, ValueError):
+        manifest = {}
+
+    hashes = {}
+    for file_name in sorted(os.listdir(assets_path)):
+        if not file_name.lower().endswith(IMAGE_EXTENSIONS):
+            continue
+        record = manifest.get(file_name)
+        if record is not None:
+            hashes[file_name] = record["sha256"]
+        else:
+            with open(os.path.join(assets_path, file_name), "rb") as file:
+                hashes[file_name] = hashlib.sha256(file.read()).hexdigest()
+    return hashes
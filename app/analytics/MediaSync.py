@@ -0,0 +1,212 @@
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+import hashlib
+import json
+import logging
+import os
+import shutil
+import threading
+import zipfile
+
+from .ExportArchive import iter_media_members, split_archive_path
+
+MANIFEST_FILE = ".media-manifest.json"
+LOCK_FILE = ".media-sync.lock"
+# ioctl request for FICLONE, which shares a file's blocks copy-on-write on btrfs/xfs
+_FICLONE = 0x40049409
+
+
+def sync_media(src_dir, dest_dir, max_workers=None):
+    """
+    Incrementally mirrors the media directory of an export into the asset directory.
+
+    A manifest in the asset directory records the size, mtime and content hash of every synced file.
+    Files whose size and mtime are unchanged are skipped without being read, and files that were only
+    touched are recognized by their hash. New and changed files are hardlinked where the filesystem allows,
+    reflinked or copied otherwise, in parallel. Assets whose source file is gone are removed; files the
+    sync didn't create (e.g. stylesheets in the assets directory) are left alone. Every worker syncs the
+    exports it loads, so syncs of the same asset directory are serialized across processes.
+    :return: dict with the number of files transferred, unchanged and removed
+    """
+    archive_path, prefix = split_archive_path(src_dir or "")
+    if prefix is not None:
+        return _sync_archive(archive_path, prefix, dest_dir)
+
+    summary = {"transferred": 0, "unchanged": 0, "removed": 0}
+    if not src_dir or not os.path.isdir(src_dir):
+        logging.warning(f"Media directory '{src_dir}' does not exist. Skipping media sync...")
+        return summary
+
+    os.makedirs(dest_dir, exist_ok=True)
+    with _sync_lock(dest_dir):
+        return _sync_dir(src_dir, dest_dir, summary, max_workers)
+
+
+def _sync_dir(src_dir, dest_dir, summary, max_workers):
+    logging.info(f"Syncing image files from media directory: {src_dir} to asset directory: {dest_dir}.")
+    manifest = _read_manifest(os.path.join(dest_dir, MANIFEST_FILE))
+
+    sources = {entry.name: entry for entry in os.scandir(src_dir) if entry.is_file()}
+    synced = {}
+    pending = []
+    for name, entry in sources.items():
+        stat = entry.stat()
+        record = manifest.get(name)
+        dest_exists = os.path.exists(os.path.join(dest_dir, name))
+        if record and dest_exists and record["size"] == stat.st_size and record.get("mtime_ns") == stat.st_mtime_ns:
+            synced[name] = record
+            summary["unchanged"] += 1
+        else:
+            pending.append((name, entry.path, stat, record if dest_exists else None))
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        for name, record, transferred in executor.map(lambda job: _sync_file(dest_dir, *job), pending):
+            synced[name] = record
+            summary["transferred" if transferred else "unchanged"] += 1
+
+    _finish_sync(dest_dir, manifest, synced, summary)
+    return summary
+
+
+def _sync_archive(archive_path, prefix, dest_dir):
+    """
+    sync_media for a media folder inside a zip archive. Photos are decompressed straight into the asset
+    directory, and the size and CRC-32 the archive records for every member tell unchanged photos apart
+    without decompressing them.
+    """
+    summary = {"transferred": 0, "unchanged": 0, "removed": 0}
+    if not os.path.isfile(archive_path):
+        logging.warning(f"Export archive '{archive_path}' does not exist. Skipping media sync...")
+        return summary
+
+    os.makedirs(dest_dir, exist_ok=True)
+    with _sync_lock(dest_dir):
+        _sync_members(archive_path, prefix, dest_dir, summary)
+    return summary
+
+
+def _sync_members(archive_path, prefix, dest_dir, summary):
+    logging.info(f"Syncing image files from '{prefix}' in archive: {archive_path} to asset directory: {dest_dir}.")
+    manifest = _read_manifest(os.path.join(dest_dir, MANIFEST_FILE))
+    synced = {}
+    with zipfile.ZipFile(archive_path) as archive:
+        for info in iter_media_members(archive, prefix):
+            name = info.filename[len(prefix):]
+            dest_path = os.path.join(dest_dir, name)
+            previous = manifest.get(name)
+            if previous and os.path.exists(dest_path) and previous.get("crc32") == info.CRC \
+                    and previous["size"] == info.file_size:
+                synced[name] = previous
+                summary["unchanged"] += 1
+                continue
+
+            # hashed while it is decompressed, the derivatives are named by the content hash
+            digest = hashlib.sha256()
+            tmp_path = _tmp_path(dest_path)
+            with archive.open(info) as src, _create(tmp_path) as dest:
+                for chunk in iter(lambda: src.read(1 << 20), b""):
+                    digest.update(chunk)
+                    dest.write(chunk)
+            os.replace(tmp_path, dest_path)
+            synced[name] = {"size": info.file_size, "crc32": info.CRC, "sha256": digest.hexdigest()}
+            summary["transferred"] += 1
+
+    _finish_sync(dest_dir, manifest, synced, summary)
+
+
+def _finish_sync(dest_dir, manifest, synced, summary):
+    for name in manifest.keys() - synced.keys():
+        stale_path = os.path.join(dest_dir, name)
+        if os.path.exists(stale_path):
+            os.remove(stale_path)
+        summary["removed"] += 1
+
+    _write_manifest(os.path.join(dest_dir, MANIFEST_FILE), synced)
+    logging.info(f"Media sync: {summary['transferred']} transferred, {summary['unchanged']} unchanged, "
+                 f"{summary['removed']} removed.")
+
+
+def _sync_file(dest_dir, name, src_path, stat, previous):
+    content_hash = _hash_file(src_path)
+    record = {"size": stat.st_size, "mtime_ns": stat.st_mtime_ns, "sha256": content_hash}
+    # touched but identical, only the manifest needs updating
+    if previous is not None and previous.get("sha256") == content_hash:
+        return name, record, False
+
+    dest_path = os.path.join(dest_dir, name)
+    tmp_path = _tmp_path(dest_path)
+    _place(src_path, tmp_path)
+    os.replace(tmp_path, dest_path)
+    return name, record, True
+
+
+def _place(src_path, dest_path):
+    try:
+        os.link(src_path, dest_path)
+        return
+    except OSError:
+        pass  # different filesystem, links not supported or a leftover file in the way
+
+    try:
+        import fcntl
+        with open(src_path, "rb") as src, _create(dest_path) as dest:
+            fcntl.ioctl(dest.fileno(), _FICLONE, src.fileno())
+        shutil.copystat(src_path, dest_path)
+        return
+    except (ImportError, OSError):
+        pass  # no reflink support, fall back to a byte copy
+
+    with open(src_path, "rb") as src, _create(dest_path) as dest:
+        shutil.copyfileobj(src, dest, 1 << 20)
+    shutil.copystat(src_path, dest_path)
+
+
+def _tmp_path(dest_path):
+    # unique per process and thread, so concurrent syncs never write to each other's files
+    return f"{dest_path}.sync-tmp-{os.getpid()}-{threading.get_ident()}"
+
+
+def _create(path):
+    """
+    Opens a new file for writing. Whatever is at path is unlinked rather than truncated, it may be a
+    hardlink to the source photo, and the file is created exclusively so it can't be one by the time it's written.
+    """
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+    return os.fdopen(os.open(path, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o644), "wb")
+
+
+@contextmanager
+def _sync_lock(dest_dir):
+    with open(os.path.join(dest_dir, LOCK_FILE), "a") as file:
+        try:
+            import fcntl
+            fcntl.flock(file.fileno(), fcntl.LOCK_EX)
+        except ImportError:
+            pass  # no advisory locks, the unique temp files still keep concurrent syncs from clobbering sources
+        yield
+
+
+def _hash_file(path, chunk_size=1 << 20):
+    digest = hashlib.sha256()
+    with open(path, "rb") as file:
+        for chunk in iter(lambda: file.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _read_manifest(path):
+    try:
+        with open(path, "r") as file:
+            return json.load(file)
+    except (OSError, ValueError):
+        return {}
+
+
+def _write_manifest(path, manifest):
+    tmp_path = f"{path}.tmp-{os.getpid()}"
+    with open(tmp_path, "w") as file:
+        json.dump(manifest, file)
+    os.replace(tmp_path, path)
@@ -0,0 +1,320 @@
+from bisect import bisect_left
+import functools
+import json
+import logging
+import os
+import threading
+import time
+
+# upper bounds in seconds, from a cached card to a cold ingest of a large export
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+# upper bounds in bytes, from a health check to Dash's plotly.js bundle
+SIZE_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304, 16777216)
+# seconds between writes of a process's values to the shared metrics directory
+DEFAULT_SHARE_INTERVAL = 5
+
+
+class MetricsRegistry:
+    """
+    Counters, gauges and histograms rendered in the Prometheus text format.
+
+    Metrics are kept in process with a lock per metric, so recording one is a dict lookup and a few
+    additions. Values that already live elsewhere (e.g. cache hit counters) are exposed through collectors,
+    callables run at scrape time, instead of being mirrored on every update. With share, the values of
+    several processes are merged, so a scrape answered by any gunicorn worker reports the same totals.
+    """
+    def __init__(self):
+        self._metrics = {}
+        self._collectors = []
+        self._lock = threading.Lock()
+        self._shared_dir = None
+        self._process_id = None
+
+    def counter(self, name, help, labelnames=()):
+        return self._register(Counter(name, help, labelnames))
+
+    def gauge(self, name, help, labelnames=()):
+        return self._register(Gauge(name, help, labelnames))
+
+    def histogram(self, name, help, labelnames=(), buckets=LATENCY_BUCKETS):
+        return self._register(Histogram(name, help, labelnames, buckets))
+
+    def collector(self, collect):
+        """
+        Registers a callable returning (name, type, help, samples) tuples, where samples is a list of
+        (labels dict, value) pairs. Can be used as a decorator.
+        """
+        with self._lock:
+            self._collectors.append(collect)
+        return collect
+
+    def share(self, directory, interval=DEFAULT_SHARE_INTERVAL):
+        """
+        Aggregates the metrics of every process sharing directory. Each process writes its values there every
+        interval seconds and whenever it renders, and rendering merges all of them: counters and histograms
+        are summed, including those of exited processes so they never go backwards, while gauges are reported
+        per live process with a worker label. Call it again in every forked process, the values it inherited
+        are dropped since the parent keeps reporting them.
+        """
+        pid = os.getpid()
+        if self._process_id is not None and not self._process_id.startswith(f"{pid}-"):
+            self.reset()
+        os.makedirs(directory, exist_ok=True)
+        self._shared_dir = directory
+        # the start time keeps a restarted worker that was given a reused pid from overwriting the old file
+        self._process_id = f"{pid}-{time.time_ns()}"
+        self._write_shared(self._families())
+        if interval > 0:
+            threading.Thread(target=self._share, args=(interval,), name="metrics-share", daemon=True).start()
+
+    def reset(self):
+        with self._lock:
+            metrics = list(self._metrics.values())
+        for metric in metrics:
+            metric.reset()
+
+    def render(self):
+        families = self._families()
+        if self._shared_dir is not None:
+            self._write_shared(families)
+            families = self._merge_shared()
+        lines = []
+        for name, metric_type, help, buckets, samples in families:
+            lines.extend(_render_family(name, metric_type, help, buckets, samples))
+        return "\n".join(lines) + "\n"
+
+    def _families(self):
+        # (name, type, help, histogram buckets, [(labels, value)]) of every metric and collected value
+        with self._lock:
+            metrics = list(self._metrics.values())
+            collectors = list(self._collectors)
+        families = [(metric.name, metric.type, metric.help, getattr(metric, "buckets", None), metric.samples())
+                    for metric in metrics]
+        for collect in collectors:
+            families.extend((name, metric_type, help, None, samples) for name, metric_type, help, samples in collect())
+        return families
+
+    def _share(self, interval):
+        while True:
+            time.sleep(interval)
+            try:
+                self._write_shared(self._families())
+            except Exception as e:
+                logging.warning(f"Unable to write the metrics to '{self._shared_dir}': {e}")
+
+    def _write_shared(self, families):
+        path = os.path.join(self._shared_dir, f"{self._process_id}.json")
+        tmp_path = f"{path}.tmp-{threading.get_ident()}"
+        with open(tmp_path, "w") as file:
+            json.dump(families, file)
+        os.replace(tmp_path, path)
+
+    def _merge_shared(self):
+        merged = {}
+        for file_name in sorted(os.listdir(self._shared_dir)):
+            if not file_name.endswith(".json"):
+                continue
+            try:
+                with open(os.path.join(self._shared_dir, file_name), "r") as file:
+                    families = json.load(file)
+            except (OSError, ValueError):
+                continue  # being replaced, it's read again on the next scrape
+            pid = file_name.split("-")[0]
+            alive = _alive(int(pid))
+            for name, metric_type, help, buckets, samples in families:
+                family = merged.setdefault(name, (metric_type, help, buckets and tuple(buckets), {}))
+                for labels, value in samples:
+                    if metric_type == "gauge":
+                        if not alive:
+                            continue
+                        labels = dict(labels, worker=pid)
+                    key = tuple(sorted(labels.items()))
+                    family[3][key] = _add(family[3].get(key), value)
+        return [(name, metric_type, help, buckets, [(dict(key), value) for key, value in samples.items()])
+                for name, (metric_type, help, buckets, samples) in merged.items()]
+
+    def _register(self, metric):
+        with self._lock:
+            if metric.name in self._metrics:
+                raise Exception(f"Metric '{metric.name}' is already registered.")
+            self._metrics[metric.name] = metric
+        return metric
+
+
+class _Metric:
+    type = None
+
+    def __init__(self, name, help, labelnames):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def remove(self, **labels):
+        with self._lock:
+            self._values.pop(self._key(labels), None)
+
+    def reset(self):
+        with self._lock:
+            self._values.clear()
+
+    def _key(self, labels):
+        if len(labels) != len(self.labelnames):
+            raise Exception(f"Metric '{self.name}' expects the labels {', '.join(self.labelnames) or 'none'}.")
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+    def samples(self):
+        with self._lock:
+            values = list(self._values.items())
+        return [(dict(zip(self.labelnames, key)), value) for key, value in values]
+
+
+class Counter(_Metric):
+    type = "counter"
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+
+class Gauge(_Metric):
+    type = "gauge"
+
+    def set(self, value, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = value
+
+
+class Histogram(_Metric):
+    type = "histogram"
+
+    def __init__(self, name, help, labelnames, buckets):
+        super().__init__(name, help, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value, **labels):
+        key = self._key(labels)
+        # one count per bucket, made cumulative when rendered, plus an overflow slot for +Inf
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._values.get(key)
+            if series is None:
+                series = self._values[key] = [[0] * (len(self.buckets) + 1), 0.0]
+            series[0][index] += 1
+            series[1] += value
+
+    def time(self, **labels):
+        return _Timer(self, labels)
+
+    def samples(self):
+        # per bucket counts, made cumulative when rendered, and the sum of the observed values
+        with self._lock:
+            values = [(key, list(counts), total) for key, (counts, total) in self._values.items()]
+        return [(dict(zip(self.labelnames, key)), [counts, total]) for key, counts, total in values]
+
+
+class _Timer:
+    def __init__(self, histogram, labels):
+        self.histogram = histogram
+        self.labels = labels
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.histogram.observe(time.perf_counter() - self.start, **self.labels)
+        return False
+
+
+def timed(histogram, name=None):
+    """
+    Decorator recording the duration of every call in a histogram with a single label, set to name or to
+    the function's qualified name, e.g. "MatchAnalytics.get_response_latency".
+    """
+    def decorator(fn):
+        labels = {histogram.labelnames[0]: name or fn.__qualname__}
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                histogram.observe(time.perf_counter() - start, **labels)
+        return wrapper
+    return decorator
+
+
+def _render_family(name, metric_type, help, buckets, samples):
+    lines = [f"# HELP {name} {help}", f"# TYPE {name} {metric_type}"]
+    for labels, value in samples:
+        if metric_type != "histogram":
+            lines.append(f"{name}{_format_labels(labels)} {_format_value(value)}")
+            continue
+        counts, total = value
+        cumulative = 0
+        for bound, count in zip(tuple(buckets) + (float("inf"),), counts):
+            cumulative += count
+            lines.append(f"{name}_bucket{_format_labels(dict(labels, le=_format_value(bound)))} {cumulative}")
+        lines.append(f"{name}_sum{_format_labels(labels)} {_format_value(total)}")
+        lines.append(f"{name}_count{_format_labels(labels)} {cumulative}")
+    return lines
+
+
+def _add(merged, value):
+    if merged is None:
+        return value
+    if isinstance(value, list):
+        # a histogram's bucket counts and sum
+        return [[a + b for a, b in zip(merged[0], value[0])], merged[1] + value[1]]
+    return merged + value
+
+
+def _alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass  # exists, but belongs to another user
+    return True
+
+
+def _format_labels(labels):
+    if not labels:
+        return ""
+    escaped = (f'{name}="{_escape(value)}"' for name, value in labels.items())
+    return "{" + ",".join(escaped) + "}"
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_value(value):
+    if value == float("inf"):
+        return "+Inf"
+    return repr(value) if isinstance(value, float) else str(value)
+
+
+# shared by the analytics, the pages and the /metrics route
+metrics = MetricsRegistry()
+ANALYTICS_SECONDS = metrics.histogram("hinge_analytics_seconds", "Time spent in analytics methods.", ["method"])
+INGEST_SECONDS = metrics.histogram("hinge_ingest_seconds", "Time spent loading an export file.", ["kind", "mode"])
+CARD_SECONDS = metrics.histogram("hinge_card_seconds", "Time spent building a page card.", ["card"])
+CALLBACK_SECONDS = metrics.histogram("hinge_callback_seconds", "Time spent handling a Dash callback.", ["callback"])
+CALLBACK_ERRORS = metrics.counter("hinge_callback_errors_total", "Dash callbacks that failed.", ["callback"])
+CALLBACK_BYTES = metrics.histogram("hinge_callback_bytes", "Size of a Dash callback response before compression.",
+                                   ["callback"], buckets=SIZE_BUCKETS)
+RESPONSE_BYTES = metrics.histogram("hinge_response_bytes", "Size of a response body as sent.", ["route", "encoding"],
+                                   buckets=SIZE_BUCKETS)
+RESPONSE_UNCOMPRESSED_BYTES = metrics.histogram("hinge_response_uncompressed_bytes",
+                                                "Size of a response body before compression.", ["route"],
+                                                buckets=SIZE_BUCKETS)
+EXPORT_INTERACTIONS = metrics.gauge("hinge_export_interactions", "Interactions in a loaded export.", ["export"])
+EXPORT_MESSAGES = metrics.gauge("hinge_export_messages", "Chat messages in a loaded export.", ["export"])
+EXPORT_BYTES = metrics.gauge("hinge_export_bytes", "Size of a loaded export file.", ["export", "file"])
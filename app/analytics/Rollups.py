@@ -0,0 +1,122 @@
+import numpy as np
+
+from .Timestamps import MISSING
+
+SECONDS_PER_DAY = 3600 * 24
+GRANULARITIES = ("day", "week", "month")
+# event kind to the MatchIndex column holding its timestamps
+EVENT_COLUMNS = {"matches": "match_ts", "likes": "like_ts", "chats": "chat_ts", "blocks": "block_ts"}
+
+
+class Rollups:
+    """
+    Time rollups of a matches export, built once at ingest.
+
+    Every event kind is kept as a sorted array of epoch seconds, so the number of events in any window is
+    two binary searches and a bucketed series is one searchsorted over the bucket edges, whatever the
+    window or granularity. The interactions are also kept ordered by match time, so the matches made in a
+    window are a contiguous slice.
+    """
+    def __init__(self, events, match_order, sorted_match_ts):
+        self.events = events
+        self._match_order = match_order
+        self._sorted_match_ts = sorted_match_ts
+
+    @classmethod
+    def from_index(cls, index):
+        events = {}
+        for kind, column in EVENT_COLUMNS.items():
+            timestamps = getattr(index, column)
+            events[kind] = np.sort(timestamps[timestamps != MISSING])
+        # MISSING is the smallest int64, so interactions without a match sort first and are skipped below
+        match_order = np.argsort(index.match_ts, kind="stable")
+        match_order = match_order[np.searchsorted(index.match_ts[match_order], MISSING, side="right"):]
+        return cls(events, match_order, index.match_ts[match_order])
+
+    @classmethod
+    def from_columns(cls, columns):
+        """Rebuilds the rollups from the arrays returned by columns(), e.g. a memory-mapped snapshot."""
+        events = {kind: columns[f"rollup_{kind}"] for kind in EVENT_COLUMNS}
+        return cls(events, columns["rollup_match_order"], columns["rollup_match_ts"])
+
+    def columns(self):
+        columns = {f"rollup_{kind}": timestamps for kind, timestamps in self.events.items()}
+        columns["rollup_match_order"] = self._match_order
+        columns["rollup_match_ts"] = self._sorted_match_ts
+        return columns
+
+    def span(self):
+        """Epoch seconds of the first event and one past the last event, None when there are no events."""
+        present = [timestamps for timestamps in self.events.values() if len(timestamps)]
+        if not present:
+            return None
+        return min(timestamps[0] for timestamps in present), max(timestamps[-1] for timestamps in present) + 1
+
+    def count(self, kind, start=None, end=None):
+        """Number of events of one kind in [start, end)."""
+        timestamps = self.events[kind]
+        lo = 0 if start is None else np.searchsorted(timestamps, np.int64(start))
+        hi = len(timestamps) if end is None else np.searchsorted(timestamps, np.int64(end))
+        return int(hi - lo)
+
+    def counts(self, start=None, end=None, granularity="month"):
+        """
+        Number of events of every kind per day, week or month.
+        :param start: epoch seconds the window starts at, the first event when not set
+        :param end: epoch seconds the window ends before, after the last event when not set
+        :return: DataFrame with a period column and a count column per event kind
+        """
+        import pandas as pd
+
+        span = self.span()
+        if span is None:
+            return pd.DataFrame(columns=["period"] + list(self.events))
+        # searching with a float would cast every sorted array, keep the bounds int64
+        start = np.int64(span[0] if start is None else start)
+        end = np.int64(span[1] if end is None else end)
+
+        edges = bucket_edges(start, end, granularity)
+        # the first and last buckets may only partly overlap the window, count just the part inside it
+        bounds = np.clip(edges, start, end)
+        df = pd.DataFrame({"period": period_labels(edges[:-1], granularity)})
+        for kind, timestamps in self.events.items():
+            df[kind] = np.diff(np.searchsorted(timestamps, bounds))
+        return df
+
+    def match_rows(self, start=None, end=None):
+        """Rows of the interactions matched in [start, end), in export order."""
+        lo = 0 if start is None else np.searchsorted(self._sorted_match_ts, np.int64(start))
+        hi = len(self._sorted_match_ts) if end is None else np.searchsorted(self._sorted_match_ts, np.int64(end))
+        return np.sort(self._match_order[lo:hi])
+
+
+def floor_period(epochs, granularity):
+    """Start of the day, week (Monday) or month each epoch falls in, in epoch seconds."""
+    epochs = np.asarray(epochs, dtype=np.int64)
+    if granularity == "month":
+        return epochs.astype("datetime64[s]").astype("datetime64[M]").astype("datetime64[s]").astype(np.int64)
+    days = epochs // SECONDS_PER_DAY
+    if granularity == "week":
+        # the epoch was a Thursday, shift so weeks start on Monday
+        days = days - (days + 3) % 7
+    elif granularity != "day":
+        raise Exception(f"Unknown granularity '{granularity}', expected one of {', '.join(GRANULARITIES)}.")
+    return days * SECONDS_PER_DAY
+
+
+def bucket_edges(start, end, granularity):
+    """Edges of the periods covering [start, end), from the start of the first period to past the end."""
+    first = int(floor_period(start, granularity))
+    if granularity == "month":
+        first_month = np.datetime64(first, "s").astype("datetime64[M]")
+        last_month = np.datetime64(int(end) - 1, "s").astype("datetime64[M]")
+        months = np.arange(first_month, last_month + 2)
+        return months.astype("datetime64[s]").astype(np.int64)
+    step = SECONDS_PER_DAY if granularity == "day" else 7 * SECONDS_PER_DAY
+    return np.arange(first, int(end) + step, step, dtype=np.int64)
+
+
+def period_labels(epochs, granularity):
+    """ISO labels of the periods the epochs fall in, "2025-04" for months and the first day otherwise."""
+    unit = "datetime64[M]" if granularity == "month" else "datetime64[D]"
+    return floor_period(epochs, granularity).astype("datetime64[s]").astype(unit).astype(str)
@@ -0,0 +1,281 @@
+from contextlib import contextmanager
+import hashlib
+import io
+import json
+import logging
+import mmap
+import os
+import numpy as np
+
+from .ExportArchive import archive_member_path, open_export_file, split_archive_path
+
+# bump whenever the columns written for an export change, so older snapshots are treated as stale
+SNAPSHOT_VERSION = 3
+
+_MAGIC = b"HNGPACK1"
+_ALIGNMENT = 64
+
+
+def stat_key(path):
+    """Cheap identity of a file: its absolute path, size and modification time, those of its archive for members."""
+    archive_path, member = split_archive_path(path)
+    stat = os.stat(archive_path)
+    path = os.path.abspath(archive_path) if member is None else archive_member_path(os.path.abspath(archive_path), member)
+    return f"{path}:{stat.st_size}:{stat.st_mtime_ns}"
+
+
+def export_fingerprint(path):
+    """Short identity of an export file that changes whenever the file is modified or replaced."""
+    return key_fingerprint(stat_key(path))
+
+
+def key_fingerprint(key):
+    return hashlib.blake2b(key.encode(), digest_size=8).hexdigest()
+
+
+def ingest_stat_key(path):
+    """
+    Stat key taken just before an export is read, so it never claims a newer version of the file than
+    was loaded. None when the file can't be stat'ed, reading it then reports the error.
+    """
+    try:
+        return stat_key(path)
+    except OSError:
+        return None
+
+
+def ingest_fingerprint(path):
+    key = ingest_stat_key(path)
+    return None if key is None else key_fingerprint(key)
+
+
+def content_digest():
+    return hashlib.blake2b(digest_size=16)
+
+
+def content_hash(path, chunk_size=1 << 20):
+    digest = content_digest()
+    with open_export_file(path, "rb") as file:
+        for chunk in iter(lambda: file.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+@contextmanager
+def hashed_export_file(path, digest, buffer_size=1 << 20):
+    """
+    Opens an export file as text while feeding every byte read from it into digest, so a snapshot is named
+    by the bytes that were actually parsed rather than by whatever the file holds once parsing is done.
+    Once the block exits, digest.hexdigest() equals content_hash of the version that was read.
+    :param digest: hash object from content_digest
+    """
+    with open_export_file(path, "rb") as raw:
+        buffered = io.BufferedReader(_HashingReader(raw, digest), buffer_size)
+        yield io.TextIOWrapper(buffered, encoding="utf-8")
+        # parsers stop at the end of the document, the trailing whitespace is part of the content too
+        for _ in iter(lambda: buffered.read(buffer_size), b""):
+            pass
+
+
+class _HashingReader(io.RawIOBase):
+    def __init__(self, file, digest):
+        self.file = file
+        self.digest = digest
+
+    def readable(self):
+        return True
+
+    def readinto(self, buffer):
+        data = self.file.read(len(buffer))
+        buffer[:len(data)] = data
+        self.digest.update(data)
+        return len(data)
+
+    def readall(self):
+        data = self.file.read()
+        self.digest.update(data)
+        return data
+
+
+def write_pack(path, columns, meta):
+    """
+    Writes a set of NumPy columns to a single file: a JSON header followed by the raw column bytes,
+    each aligned so the file can be memory-mapped and the columns viewed without copying.
+    The file is written next to its destination and renamed into place so readers never see it half written.
+    """
+    layout = []
+    offset = 0
+    for name, values in columns.items():
+        values = np.ascontiguousarray(values)
+        layout.append({"name": name, "dtype": values.dtype.str, "shape": list(values.shape), "offset": offset})
+        offset = _align(offset + values.nbytes)
+
+    header = json.dumps({"meta": meta, "columns": layout}).encode()
+    data_start = _align(len(_MAGIC) + 8 + len(header))
+
+    tmp_path = f"{path}.tmp-{os.getpid()}"
+    with open(tmp_path, "wb") as file:
+        file.write(_MAGIC)
+        file.write(len(header).to_bytes(8, "little"))
+        file.write(header)
+        for column, values in zip(layout, columns.values()):
+            file.seek(data_start + column["offset"])
+            file.write(np.ascontiguousarray(values).tobytes())
+        file.truncate(data_start + offset)
+    os.replace(tmp_path, path)
+
+
+def read_pack(path):
+    """
+    Memory-maps a file written by write_pack and returns read-only column views plus its metadata.
+    :return: tuple of (dict of column name to array, meta dict)
+    """
+    with open(path, "rb") as file:
+        buffer = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+
+    if buffer[:len(_MAGIC)] != _MAGIC:
+        raise Exception(f"'{path}' is not a snapshot file.")
+    header_length = int.from_bytes(buffer[len(_MAGIC):len(_MAGIC) + 8], "little")
+    header = json.loads(buffer[len(_MAGIC) + 8:len(_MAGIC) + 8 + header_length])
+    data_start = _align(len(_MAGIC) + 8 + header_length)
+
+    columns = {}
+    for column in header["columns"]:
+        dtype = np.dtype(column["dtype"])
+        count = int(np.prod(column["shape"], dtype=np.int64))
+        values = np.frombuffer(buffer, dtype=dtype, count=count, offset=data_start + column["offset"])
+        columns[column["name"]] = values.reshape(column["shape"])
+    return columns, header["meta"]
+
+
+class SnapshotStore:
+    """
+    Caches parsed exports as memory-mappable snapshot files in a directory.
+
+    Snapshots are named by the content hash of the export they were built from. A small index per export
+    maps its path, size and mtime to that hash so an unchanged file is matched without reading it; when the
+    stat changed the content is hashed, so a touched or re-copied export with the same bytes still hits.
+    An export's index is only read and written while holding its lock.
+
+    Every process that loads a snapshot maps the same file, so with the directory on a tmpfs such as
+    /dev/shm the columns live once in shared memory however many workers attach to them.
+    """
+    def __init__(self, snapshot_dir):
+        self.snapshot_dir = snapshot_dir
+        os.makedirs(snapshot_dir, exist_ok=True)
+
+    def load(self, source_path, kind, key=None):
+        """
+        :param key: stat key of the export, taken now when not given
+        :return: tuple of (columns, meta) for the export, or None when there is no fresh snapshot
+        """
+        key = key or stat_key(source_path)
+        index = self._read_index(source_path, kind)
+        digest = index.get(key)
+        if digest is None or not os.path.exists(self._pack_path(kind, digest)):
+            digest = content_hash(source_path)
+            if not os.path.exists(self._pack_path(kind, digest)):
+                return None
+            index[key] = digest
+            self._write_index(source_path, kind, index)
+
+        snapshot = self._read(source_path, kind, digest)
+        if snapshot is not None:
+            logging.info(f"Loaded {kind} snapshot for '{source_path}'.")
+        return snapshot
+
+    def save(self, source_path, kind, columns, meta, digest, key):
+        """
+        Stores the columns parsed from an export. Both the content hash and the stat key must describe the
+        version that was parsed, the file may have changed again since and must not inherit these columns.
+        :param digest: content hash of the bytes parsed, see hashed_export_file
+        :param key: stat key taken before the export was read
+        :return: tuple of (columns, meta) mapped from the saved snapshot, None when it can't be read back
+        """
+        write_pack(self._pack_path(kind, digest), columns, dict(meta, version=SNAPSHOT_VERSION))
+
+        index = self._read_index(source_path, kind)
+        index[key] = digest
+        self._write_index(source_path, kind, index)
+        logging.info(f"Saved {kind} snapshot for '{source_path}'.")
+        return self._read(source_path, kind, digest)
+
+    def prune(self, source_path, kind, keep_keys):
+        """
+        Drops the index entries of an export other than keep_keys, and the snapshots only they referred to.
+        Processes still mapping a removed snapshot keep their view, the file is freed once they unmap it.
+        :param keep_keys: stat keys of the versions of the export that are still served
+        """
+        index = self._read_index(source_path, kind)
+        stale = {key: digest for key, digest in index.items() if key not in keep_keys}
+        if not stale:
+            return
+        for key in stale:
+            del index[key]
+        self._write_index(source_path, kind, index)
+
+        # exports with the same content share their snapshot, it's only removed once none of them refer to it
+        referenced = set()
+        for file_name in os.listdir(self.snapshot_dir):
+            if file_name.startswith(f"{kind}-") and file_name.endswith(".json"):
+                referenced.update(_read_json(os.path.join(self.snapshot_dir, file_name)).values())
+        for digest in set(stale.values()) - referenced:
+            try:
+                os.remove(self._pack_path(kind, digest))
+            except FileNotFoundError:
+                pass
+        logging.info(f"Pruned {len(stale)} outdated {kind} snapshot entries for '{source_path}'.")
+
+    @contextmanager
+    def lock(self, source_path, kind):
+        """
+        Holds an exclusive lock on the snapshot of an export across processes, so when several workers load
+        the same export at once one of them builds the snapshot and the others wait and attach to it.
+        """
+        with open(self._export_path(source_path, kind, ".lock"), "a") as file:
+            try:
+                import fcntl
+                fcntl.flock(file.fileno(), fcntl.LOCK_EX)
+            except ImportError:
+                pass  # no advisory locks, concurrent builders write the same snapshot and the last rename wins
+            yield
+
+    def _read(self, source_path, kind, digest):
+        try:
+            columns, meta = read_pack(self._pack_path(kind, digest))
+        except Exception as e:
+            logging.warning(f"Ignoring unreadable snapshot for '{source_path}': {e}")
+            return None
+        if meta.get("version") != SNAPSHOT_VERSION:
+            return None
+        return columns, meta
+
+    def _pack_path(self, kind, digest):
+        return os.path.join(self.snapshot_dir, f"{kind}-{digest}.pack")
+
+    def _export_path(self, source_path, kind, suffix):
+        # the lock and index of an export are named by its path
+        name = hashlib.blake2b(os.path.abspath(source_path).encode(), digest_size=8).hexdigest()
+        return os.path.join(self.snapshot_dir, f"{kind}-{name}{suffix}")
+
+    def _read_index(self, source_path, kind):
+        return _read_json(self._export_path(source_path, kind, ".json"))
+
+    def _write_index(self, source_path, kind, index):
+        path = self._export_path(source_path, kind, ".json")
+        tmp_path = f"{path}.tmp-{os.getpid()}"
+        with open(tmp_path, "w") as file:
+            json.dump(index, file)
+        os.replace(tmp_path, path)
+
+
+def _read_json(path):
+    try:
+        with open(path, "r") as file:
+            return json.load(file)
+    except (OSError, ValueError):
+        return {}
+
+
+def _align(offset):
+    return (offset + _ALIGNMENT - 1) // _ALIGNMENT * _ALIGNMENT
@@ -0,0 +1,56 @@
+from datetime import datetime
+import numpy as np
+
+# sentinel for missing timestamps. it is the same bit pattern NumPy uses for NaT,
+# so datetime64 views of epoch columns stay correct.
+MISSING = np.iinfo(np.int64).min
+
+# formats Hinge uses in its exports, matches.json has whole seconds while user.json has milliseconds
+SECONDS_FORMAT = "%Y-%m-%d %H:%M:%S"
+FRACTIONAL_FORMAT = "%Y-%m-%d %H:%M:%S.%f"
+
+_NANOS_PER_UNIT = {"s": 1_000_000_000, "ms": 1_000_000, "us": 1_000, "ns": 1}
+_EPOCH = datetime(1970, 1, 1)
+
+
+def detect_format(values):
+    """
+    Picks the strptime format for a column of export timestamps from its first present value.
+    :return: the format, or None when the column has no timestamps
+    """
+    for value in values:
+        if value is not None:
+            return FRACTIONAL_FORMAT if "." in value else SECONDS_FORMAT
+    return None
+
+
+def to_epoch(values, unit="s"):
+    """
+    Converts a whole column of export timestamps to int64 epochs in one vectorized call.
+    Hinge timestamps carry no offset and are treated as UTC. Missing values become MISSING.
+    :param values: sequence of timestamp strings, None where the event is missing
+    :param unit: resolution of the returned epochs, one of "s", "ms", "us" or "ns"
+    """
+    # pandas is only needed once an export is parsed, not when the app starts
+    import pandas as pd
+
+    series = pd.Series(values, dtype=object)
+    timestamp_format = detect_format(series)
+    try:
+        parsed = pd.to_datetime(series, format=timestamp_format)
+    except ValueError:
+        # the column mixes whole-second and fractional timestamps, let pandas infer each one
+        parsed = pd.to_datetime(series, format="ISO8601")
+
+    nanos = parsed.to_numpy(dtype="datetime64[ns]").view(np.int64)
+    return np.where(nanos == MISSING, MISSING, nanos // _NANOS_PER_UNIT[unit])
+
+
+def datetime_to_epoch(dt):
+    """Epoch seconds of a naive datetime, read on the same clock as the export timestamps."""
+    return int((dt - _EPOCH).total_seconds())
+
+
+def to_datetime64(epochs):
+    """View an epoch seconds column as datetime64 for display, MISSING shows up as NaT."""
+    return epochs.astype("datetime64[s]")
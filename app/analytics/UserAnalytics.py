@@ -1,21 +1,30 @@
-from datetime import datetime
 from collections import defaultdict
-import geoip2.database
-from geopy.geocoders import Nominatim
-import pandas as pd
 import json
 import os
-import shutil
 import logging
+import time
+
+from .ExportArchive import open_export_file
+from .GeoLocation import GeoLocationService
+from .MediaDerivatives import generate_derivatives
+from .MediaSync import sync_media
+from .Metrics import ANALYTICS_SECONDS, INGEST_SECONDS, timed
+from .Snapshot import export_fingerprint, ingest_fingerprint
+from .Timestamps import to_epoch
+
+MILLISECONDS_PER_DAY = 1000 * 3600 * 24
 
 logging.basicConfig(level=logging.INFO)
 
 class UserAnalytics:
-    def __init__(self):
-        self.assets_path = os.environ.get("ASSETS_PATH")
-        self.user_file_path = os.environ.get("USER_FILE_PATH")
-        self.geo_lite_db_path = os.environ.get("GEOLITE_DB_PATH")
-        self.media_path = os.environ.get("MEDIA_PATH")
+    def __init__(self, user_file_path=None, media_path=None, assets_path=None, geo_lite_db_path=None, copy_media=True):
+        # the paths default to the environment for the single export the app serves out of the box
+        self.assets_path = assets_path or os.environ.get("ASSETS_PATH")
+        self.user_file_path = user_file_path or os.environ.get("USER_FILE_PATH")
+        self.geo_lite_db_path = geo_lite_db_path or os.environ.get("GEOLITE_DB_PATH")
+        self.media_path = media_path or os.environ.get("MEDIA_PATH")
+        self.copy_media = copy_media
+        self._geolocation_service = None
 
         # TODO: come back and fix this
         # if self.geo_lite_db_path is None:
@@ -27,17 +36,43 @@ class UserAnalytics:
         if '.json' not in self.user_file_path:
             raise Exception("The user file needs to be a JSON file.")
 
-        with open(self.user_file_path, 'r') as file:
+        start = time.perf_counter()
+        self._fingerprint = ingest_fingerprint(self.user_file_path)
+        with open_export_file(self.user_file_path) as file:
             user_data = json.load(file)
         
         self.user_data = user_data
+        INGEST_SECONDS.observe(time.perf_counter() - start, kind="user", mode="load")
         
-        # need to copy the files from the media_path to the assets_dir
-        _copy_files(self.media_path, self.assets_path)
-
-    def get_media_file_paths(self):
+        # need to sync the files from the media_path to the assets_dir, headless callers don't serve them
+        if copy_media:
+            start = time.perf_counter()
+            sync_media(self.media_path, self.assets_path)
+            # resized variants of the photos so the slideshow doesn't ship full resolution originals
+            self.media_derivatives = generate_derivatives(self.assets_path)
+            INGEST_SECONDS.observe(time.perf_counter() - start, kind="media", mode="sync")
+        else:
+            self.media_derivatives = {}
+
+    def fingerprint(self):
+        return self._fingerprint or export_fingerprint(self.user_file_path)
+
+    def reload(self):
+        """Loads the export again after it changed on disk, returning a new UserAnalytics."""
+        return UserAnalytics(self.user_file_path, media_path=self.media_path, assets_path=self.assets_path,
+                             geo_lite_db_path=self.geo_lite_db_path, copy_media=self.copy_media)
+
+    @timed(ANALYTICS_SECONDS)
+    def get_media_file_paths(self, variant=None):
+        """
+        :param variant: derivative to return ("thumbnail", "card" or "full"), the originals when not set
+        :return: image paths relative to the asset directory
+        """
         jpg_files = [f for f in os.listdir(self.assets_path) if f.endswith(".jpg") or f.endswith(".jpeg") or f.endswith(".png")]
-        return jpg_files
+        if variant is None:
+            return jpg_files
+        # images without derivatives fall back to the original
+        return [self.media_derivatives.get(f, {}).get(variant, f) for f in jpg_files]
     
     def get_account_data(self):
         return self.user_data["account"]
@@ -54,6 +89,7 @@ class UserAnalytics:
     def get_location_data(self):
         return self.user_data["location"]
 
+    @timed(ANALYTICS_SECONDS)
     def build_user_location_dict(self):
         location = self.get_location_data()
         user_location = {}
@@ -67,6 +103,7 @@ class UserAnalytics:
 
         return user_location
 
+    @timed(ANALYTICS_SECONDS)
     def build_user_summary_dict(self):
         profile_data = self.get_profile_data()
         account_data = self.get_account_data()
@@ -107,6 +144,7 @@ class UserAnalytics:
 
         return user_summary
     
+    @timed(ANALYTICS_SECONDS)
     def profile_preference_selections(self):
         profile_data = self.get_profile_data()
         preference_data = self.get_preferences_data()
@@ -119,6 +157,7 @@ class UserAnalytics:
 
         return profile_values, preference_values
 
+    @timed(ANALYTICS_SECONDS)
     def count_stringeny_attributes(self):
         preferences = self.get_preferences_data()
 
@@ -140,6 +179,7 @@ class UserAnalytics:
         return dict(display_counts)
 
     
+    @timed(ANALYTICS_SECONDS)
     def count_displayed_attributes(self):
         profile_data = self.get_profile_data()
         
@@ -160,57 +200,18 @@ class UserAnalytics:
                     display_counts[category]["true" if display_value else "false"] += 1
         return dict(display_counts)
 
+    @timed(ANALYTICS_SECONDS)
     def collect_location_from_ip(self):
+        import pandas as pd
+
         device_data = self.get_devices_data()
         ip_addresses = [device["ip_address"] for device in device_data]
 
-        geolocation_data = [self._get_city_info(ip) for ip in ip_addresses if self._get_city_info(ip) is not None]
-
-        return pd.DataFrame(geolocation_data)
-    
-def _copy_files(src_dir, dest_dir):
-    os.makedirs(dest_dir, exist_ok=True)
-    logging.info(f"Copying images files from media directory: {src_dir} to asset directory; {dest_dir}." )
-
-    # only proceed if the destination directory is empty
-    if os.listdir(dest_dir):
-        logging.info(f"Asset directory: '{dest_dir}' is not empty. Skipping copy...")
-        return
-
-    # loop through all files in source directory
-    for file_name in os.listdir(src_dir):
-        src_path = os.path.join(src_dir, file_name)
-        dest_path = os.path.join(dest_dir, file_name)
-
-        # only copy files (not subdirectories)
-        if os.path.isfile(src_path):
-            shutil.copy2(src_path, dest_path)  # copy2 preserves metadata
-
-    def _get_city_info(self, ip):
-        # initialize GeoLite2 reader & geocoder
-        geolite_db_path = self.geo_lite_db_path
-        reader = geoip2.database.Reader(geolite_db_path)
-        geolocator = Nominatim(user_agent="geoip_mapper")
-        try:
-            response = reader.city(ip)
-            city = response.city.name
-            region = response.subdivisions.most_specific.name
-            country = response.country.name
-
-            # get latitude & longitude
-            location = geolocator.geocode(f"{city}, {region}, {country}")
-            if location:
-                return {
-                    "ip": ip,
-                    "city": city,
-                    "region": region,
-                    "country": country,
-                    "latitude": location.latitude,
-                    "longitude": location.longitude
-                }
-        except:
-            return None  # invalid or private IP
-
+        # the service is created once so the GeoLite reader, geocoder and lookup cache are reused
+        if self._geolocation_service is None:
+            self._geolocation_service = GeoLocationService(self.geo_lite_db_path)
+        geolocation_data = self._geolocation_service.locate(ip_addresses)
+        return pd.DataFrame(geolocation_data, columns=["ip", "city", "region", "country", "latitude", "longitude"])
     
 def _convert_height(cm):
     inches = cm / 2.54
@@ -221,14 +222,10 @@ def _convert_height(cm):
     return feet, remaining_inches 
 
 def _timestamp_durations(leading_timestamp, lagging_timestamp):
-    lead_dt_format = "%Y-%m-%d %H:%M:%S.%f"
-    lag_dt_format = "%Y-%m-%d %H:%M:%S.%f"
-
-    # parse timestamps
-    lag_time = datetime.strptime(lagging_timestamp, lag_dt_format)
-    lead_time = datetime.strptime(leading_timestamp, lead_dt_format)
+    # parse both timestamps in one vectorized call, keeping milliseconds so whole days aren't rounded up
+    lag_time, lead_time = to_epoch([lagging_timestamp, leading_timestamp], unit="ms")
 
     # calculate difference in days
-    days_difference = (lead_time - lag_time).days
+    days_difference = int((lead_time - lag_time) // MILLISECONDS_PER_DAY)
 
-    return days_difference
\ No newline at end of file
+    return days_difference
@@ -0,0 +1,106 @@
+"""
+Headless batch analytics over a directory of Hinge exports.
+
+Each sub-directory of the exports directory is one export (matches.json, user.json), as is each .zip
+archive downloaded from Hinge, the same layout the app serves through EXPORTS_PATH. The match and user
+analytics for every export are computed in a process pool and written to one consolidated CSV or Parquet
+file with a row per export.
+
+    python app/batch.py data/exports --output metrics.csv --workers 8
+"""
+from concurrent.futures import ProcessPoolExecutor
+import argparse
+import logging
+import os
+import time
+
+import pandas as pd
+
+from analytics.ExportArchive import ARCHIVE_SUFFIX, archive_member_path, locate_members
+from analytics.ExportMetrics import summarize_match_analytics, summarize_user_analytics
+from analytics.ExportRegistry import MATCH_FILE, USER_FILE
+from analytics.MatchAnalytics import MatchAnalytics
+from analytics.UserAnalytics import UserAnalytics
+
+
+def summarize_export(export_path):
+    """
+    Computes the metrics row for one export, a directory or a .zip archive. Failures are recorded in the
+    row instead of raised, so one malformed export doesn't abort the whole batch.
+    """
+    export_id = os.path.basename(os.path.normpath(export_path))
+    if export_id.lower().endswith(ARCHIVE_SUFFIX):
+        export_id = export_id[:-len(ARCHIVE_SUFFIX)]
+    row = {"export_id": export_id, "error": None}
+    try:
+        match_file_path, user_file_path = _export_files(export_path)
+        if match_file_path:
+            row.update(summarize_match_analytics(MatchAnalytics(match_file_path=match_file_path)))
+        if user_file_path:
+            row.update(summarize_user_analytics(UserAnalytics(user_file_path=user_file_path, copy_media=False)))
+    except Exception as e:
+        row["error"] = f"{type(e).__name__}: {e}"
+    return row
+
+
+def _export_files(export_path):
+    # paths of the match and user files, None for a file the export doesn't have
+    if os.path.isdir(export_path):
+        match_file_path = os.path.join(export_path, MATCH_FILE)
+        user_file_path = os.path.join(export_path, USER_FILE)
+        return (match_file_path if os.path.exists(match_file_path) else None,
+                user_file_path if os.path.exists(user_file_path) else None)
+
+    # archives are read without extracting them, wherever Hinge put the files inside
+    members = locate_members(export_path)
+    return (archive_member_path(export_path, members["matches"]) if members["matches"] else None,
+            archive_member_path(export_path, members["user"]) if members["user"] else None)
+
+
+def find_exports(exports_path):
+    export_paths = {}
+    for name in os.listdir(exports_path):
+        path = os.path.join(exports_path, name)
+        if os.path.isfile(os.path.join(path, MATCH_FILE)) or os.path.isfile(os.path.join(path, USER_FILE)):
+            export_paths[name] = path
+        elif name.lower().endswith(ARCHIVE_SUFFIX) and os.path.isfile(path):
+            # a directory of the same name wins, as in the app
+            export_paths.setdefault(name[:-len(ARCHIVE_SUFFIX)], path)
+    return [export_paths[export_id] for export_id in sorted(export_paths)]
+
+
+def run_batch(exports_path, output_path, workers=None):
+    export_paths = find_exports(exports_path)
+    start = time.perf_counter()
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        rows = list(executor.map(summarize_export, export_paths, chunksize=max(1, len(export_paths) // 64)))
+    elapsed = time.perf_counter() - start
+
+    # nullable dtypes keep the count columns integers even when a failed export leaves them empty
+    df = pd.DataFrame(rows).convert_dtypes()
+    if output_path.endswith(".parquet"):
+        # parquet needs pyarrow or fastparquet, which aren't required by the app itself
+        df.to_parquet(output_path, index=False)
+    else:
+        df.to_csv(output_path, index=False)
+
+    failed = int(df["error"].notna().sum()) if len(df) else 0
+    throughput = len(rows) / elapsed if elapsed > 0 else 0.0
+    logging.info(f"Summarized {len(rows)} exports ({failed} failed) in {elapsed:.2f}s, "
+                 f"{throughput:.1f} exports/second. Wrote '{output_path}'.")
+    return df
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compute match and user metrics for a directory of Hinge exports.")
+    parser.add_argument("exports_path", help="directory with one sub-directory or .zip archive per export")
+    parser.add_argument("--output", default="export_metrics.csv", help="output file, .csv or .parquet")
+    parser.add_argument("--workers", type=int, default=None, help="worker processes, defaults to the number of cores")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    run_batch(args.exports_path, args.output, args.workers)
+
+
+if __name__ == '__main__':
+    main()
@@ -5,10 +5,19 @@ __author__ = "Shelby Potts"
 __version__ = "0.0.0"
 
 import dash_mantine_components as dmc
-from flask import Flask
+from flask import Flask, Response, g, jsonify, request
 import dash
 from dash import Dash, dcc, html
+import logging
 import os
+import threading
+import time
+
+from analytics.ExportRegistry import export_registry
+from analytics.Metrics import (CALLBACK_BYTES, CALLBACK_ERRORS, CALLBACK_SECONDS, RESPONSE_BYTES,
+                               RESPONSE_UNCOMPRESSED_BYTES, metrics)
+from utilities.Compression import ResponseCompressor
+from utilities.FigureCache import figure_cache
 
 import pages.MatchPage as MatchPage
 import pages.UserPage as UserPage
@@ -17,7 +26,128 @@ import pages.InfoPage as InfoPage
 
 external_stylesheets = [dmc.theme.DEFAULT_COLORS]
 server = Flask(__name__)
-app = Dash(__name__, server=server, use_pages=True, external_stylesheets=external_stylesheets)
+# requests larger than this are rejected before their body is read
+server.config["MAX_CONTENT_LENGTH"] = int(os.environ.get("MAX_UPLOAD_BYTES", 1 << 30))
+# page cards are rendered by callbacks after navigation, so their component ids aren't in the initial layout
+app = Dash(__name__, server=server, use_pages=True, external_stylesheets=external_stylesheets,
+           suppress_callback_exceptions=True)
+
+# off when a proxy in front of the app already compresses
+compressor = ResponseCompressor() if os.environ.get("COMPRESS_RESPONSES", "true").lower() == "true" else None
+
+# registered first so it runs last, after the other hooks have seen the uncompressed body
+@server.after_request
+def compress_response(response):
+    # routes are labelled by their rule, e.g. the one all Dash callbacks share, so the label set stays small
+    route = request.url_rule.rule if request.url_rule is not None else "unmatched"
+    measurable = not response.direct_passthrough
+    if measurable:
+        RESPONSE_UNCOMPRESSED_BYTES.observe(response.content_length or 0, route=route)
+    encoding = compressor.compress(response, request.accept_encodings, request.path) if compressor else None
+    if measurable:
+        RESPONSE_BYTES.observe(response.content_length or 0, route=route, encoding=encoding or "identity")
+    return response
+
+@server.after_request
+def cache_image_derivatives(response):
+    # derivatives are named by the content hash of their source, so they never change once written
+    if "/derivatives/" in request.path and response.status_code == 200:
+        response.cache_control.no_cache = None
+        response.cache_control.public = True
+        response.cache_control.max_age = 31536000  # 1 year
+        response.cache_control.immutable = True
+    return response
+
+@server.before_request
+def start_callback_timer():
+    g.request_start = time.perf_counter()
+
+@server.after_request
+def record_callback_metrics(response):
+    # every Dash callback is a POST to this route, named by the outputs it updates
+    if request.path.endswith("/_dash-update-component") and "request_start" in g:
+        body = request.get_json(silent=True) or {}
+        callback_name = body.get("output", "unknown")
+        CALLBACK_SECONDS.observe(time.perf_counter() - g.request_start, callback=callback_name)
+        CALLBACK_BYTES.observe(response.content_length or 0, callback=callback_name)
+        if response.status_code >= 400:
+            CALLBACK_ERRORS.inc(callback=callback_name)
+    return response
+
+@metrics.collector
+def collect_cache_metrics():
+    # the cache and the registry keep their own counters, they are read at scrape time
+    return [
+        ("hinge_figure_cache_requests_total", "counter", "Figure cache lookups by result.",
+         [({"result": "hit"}, figure_cache.hits), ({"result": "disk_hit"}, figure_cache.disk_hits),
+          ({"result": "miss"}, figure_cache.misses)]),
+        ("hinge_figure_cache_bytes", "gauge", "Size of the figures held in memory.", [({}, figure_cache.size_bytes)]),
+        ("hinge_figure_cache_entries", "gauge", "Figures held in memory.", [({}, len(figure_cache))]),
+        ("hinge_exports_loaded", "gauge", "Exports held in memory.", [({}, len(export_registry.loaded_ids()))])
+    ]
+
+# set once warmup has loaded the exports, until then the readiness probe keeps traffic away
+ready = threading.Event()
+
+def warmup():
+    """
+    Loads the exports the registry can hold and renders their cards into the figure cache. The production
+    entry point runs this in the master process before forking, so the workers start with warm caches.
+    """
+    for export_id in export_registry.export_ids()[:export_registry.max_loaded]:
+        start = time.perf_counter()
+        try:
+            MatchPage.message_counts_boxplot(export_id)
+            MatchPage.activity_timeline(export_id)
+            MatchPage.response_latency_hist(export_id)
+            MatchPage.match_duration_hist(export_id)
+            MatchPage.match_removal_count_scatter(export_id)
+            UserPage.stringency_vs_flexibility(export_id)
+            UserPage.geolocation(export_id)
+            UserPage.potential_misalignments(export_id)
+            UserPage.disclosure_vs_privacy(export_id)
+            UserPage.create_user_location_card(export_id)
+        except Exception as e:
+            # a broken export shows its error on its pages, it shouldn't keep the others from being served
+            logging.warning(f"Unable to warm up export '{export_id}': {e}")
+            continue
+        logging.info(f"Warmed up export '{export_id}' in {time.perf_counter() - start:.2f}s.")
+    ready.set()
+
+@server.route("/healthz")
+def liveness():
+    return Response("ok", mimetype="text/plain")
+
+@server.route("/readyz")
+def readiness():
+    if not ready.is_set():
+        return Response("warming up", status=503, mimetype="text/plain")
+    return Response("ready", mimetype="text/plain")
+
+@server.route("/metrics")
+def prometheus_metrics():
+    return Response(metrics.render(), mimetype="text/plain; version=0.0.4")
+
+@server.route("/exports", methods=["POST"])
+def upload_export():
+    """
+    Adds the .zip downloaded from Hinge as a new export, served from the archive without extracting it:
+
+        curl -F export=@export.zip -F name=alice http://localhost:8050/exports
+    """
+    # anyone who can reach the server could store files on it, so uploads have to be switched on
+    if os.environ.get("ALLOW_UPLOADS", "false").lower() != "true":
+        return jsonify(error="Uploads are disabled, set ALLOW_UPLOADS=true to enable them."), 403
+    upload = request.files.get("export")
+    if upload is None:
+        return jsonify(error="Expected the export archive in the 'export' form field."), 400
+
+    export_id = request.form.get("name") or os.path.splitext(os.path.basename(upload.filename or ""))[0]
+    try:
+        export_registry.add_archive(export_id, upload.stream)
+    except Exception as e:
+        return jsonify(error=str(e)), 400
+    return jsonify(export=export_id, url=f"/matches?export={export_id}"), 201
 
 dash.register_page("home", path='/', layout=HomePage.layout)
 dash.register_page("matches", path='/matches', layout=MatchPage.layout)
@@ -74,4 +204,7 @@ if __name__ == '__main__':
     host = os.environ.get("HOST")
     port = int(os.environ.get("PORT", 8050))
 
+    warmup()
+    # reload exports that change on disk while the app is running
+    export_registry.watch()
     app.run(debug=True, host=host, port=port)
\ No newline at end of file
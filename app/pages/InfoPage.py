@@ -29,7 +29,8 @@ layout = html.Div([
     dmc.Text(
         "After you get an email from Hinge saying your data export is complete, go to the app and download the "
         "export. Navigate to where the export was downloaded and open the `.zip` file. From here you should see "
-        "the `matches.json` file and the `user.json` file which can be used for this analysis."),
+        "the `matches.json` file and the `user.json` file which can be used for this analysis. The app can also "
+        "read them straight from the `.zip` file, without unzipping it first."),
     dmc.Space(h=20),
     dmc.Text("Caveats", size="xl"),
     dmc.Text(
@@ -1,37 +1,79 @@
-from dash import html, dcc
-import pandas as pd
+from datetime import datetime, timedelta
+import os
+from dash import html, dcc, callback, no_update
+from dash.dependencies import Input, Output, State
 import dash_mantine_components as dmc
-import plotly.express as px
+import numpy as np
+# plotly.express brings pandas with it, the figure builders import it on first use to keep startup fast
 
-from analytics.MatchAnalytics import MatchAnalytics
+from analytics.ExportRegistry import export_registry
+from analytics.Metrics import CARD_SECONDS, timed
+from analytics.Rollups import floor_period
+from analytics.Timestamps import datetime_to_epoch
+from utilities.Aggregation import box_stats, decimate, histogram, sample_rows
+from utilities.FigureCache import figure_cache
 
-match_analytics = MatchAnalytics()
+# window selector value to its length in days, None covers the whole export
+WINDOWS = {"3m": 91, "6m": 182, "12m": 365, "all": None}
+WINDOW_LABELS = {"3m": "Last 3 Months", "6m": "Last 6 Months", "12m": "Last 12 Months", "all": "All Time"}
+GRANULARITY_LABELS = {"day": "Day", "week": "Week", "month": "Month"}
+# charts are aggregated server side, these are the only raw points that still reach the browser:
+# "outliers" draws the box plot's outliers, "sample" a random sample of all matches and "none" neither
+BOX_POINTS = os.environ.get("MATCH_BOX_POINTS", "outliers")
+MAX_POINTS = int(os.environ.get("FIGURE_MAX_POINTS", 2000))
+# scatters switch from SVG to WebGL markers above this many points, and are decimated above the second
+WEBGL_THRESHOLD = int(os.environ.get("SCATTER_WEBGL_THRESHOLD", 5000))
+SCATTER_MAX_POINTS = int(os.environ.get("SCATTER_MAX_POINTS", 20000))
 
-def message_counts_boxplot():
-    message_counts = match_analytics.get_message_count_last_12_months()
+def get_match_analytics(export_id=None):
+    # the analytics are loaded the first time an export's page is opened rather than when the app starts
+    return export_registry.get(export_id).match_analytics()
 
-    df = pd.DataFrame(message_counts)
-    # change the month to a date so we can sort it and then convert it back to a string
-    df["month"] = pd.to_datetime(df["month"])
-    df = df.sort_values("month")
-    df["month"] = df["month"].dt.strftime("%Y-%m")
+def _window_start(window):
+    # windows end now, the start is floored to the day so a window's figures are cached for the whole day
+    days = WINDOWS[window]
+    if days is None:
+        return None
+    return int(floor_period(datetime_to_epoch(datetime.now() - timedelta(days=days)), "day"))
 
-    fig = px.box(
-        df,
-        x="month",
-        y="message_count",
+def _message_counts_boxplot_figure(match_analytics, start, granularity):
+    import plotly.graph_objects as go
+
+    df = match_analytics.get_message_counts(start=start, granularity=granularity, as_frame=True)
+    # quartiles are computed here, the browser only gets five numbers per box instead of every match
+    # (periods are ISO strings, so the sorted groups are in chronological order)
+    stats = box_stats(df["period"].to_numpy(), df["message_count"].to_numpy(), max_outliers=MAX_POINTS)
+
+    fig = go.Figure(go.Box(
+        x=stats["group"], q1=stats["q1"], median=stats["median"], q3=stats["q3"], mean=stats["mean"],
+        lowerfence=stats["lowerfence"], upperfence=stats["upperfence"], name="", showlegend=False))
+    if BOX_POINTS == "outliers":
+        fig.add_trace(go.Scatter(x=stats["outlier_groups"], y=stats["outlier_values"], mode="markers",
+                                 name="Outliers", showlegend=False))
+    elif BOX_POINTS == "sample":
+        rows = sample_rows(len(df), MAX_POINTS)
+        fig.add_trace(go.Scatter(x=df["period"].to_numpy()[rows], y=df["message_count"].to_numpy()[rows],
+                                 mode="markers", opacity=0.4, name="Matches", showlegend=False))
+    fig.update_layout(
         height=600, # increase height
-        labels={"month": "Month", "message_count": "Number of Messages"},
-        points="all"  # show individual data points too
-    )
-    fig.update_layout(xaxis_tickangle=-45)
+        xaxis_title=GRANULARITY_LABELS[granularity], yaxis_title="Number of Messages",
+        xaxis_tickangle=-45, xaxis_type="category")
+    return fig
+
+@timed(CARD_SECONDS)
+def message_counts_boxplot(export_id=None, window="12m", granularity="month"):
+    match_analytics = get_match_analytics(export_id)
+    start = _window_start(window)
+    fig = figure_cache.get_or_build(match_analytics.fingerprint(), "message_counts_boxplot",
+                                    lambda: _message_counts_boxplot_figure(match_analytics, start, granularity),
+                                    start=start, granularity=granularity)
 
     return dmc.Card(
         children=[
             dmc.Space(h=10),
-            dmc.Text("Message Count Variability by Month (Last 12 Months)", weight=700, size="xl"),
+            dmc.Text(f"Message Count Variability by {GRANULARITY_LABELS[granularity]} ({WINDOW_LABELS[window]})", weight=700, size="xl"),
             dmc.Space(h=10),
-            dmc.Text("This box plot shows how the number of messages exchanged per match varies across each month over the past year. Each box represents the distribution of message counts for matches that had at least one message in that month. The plot highlights patterns in user engagement, such as which months tend to have higher or lower activity, and reveals any outliers — matches with unusually high or low message counts. This can be useful for identifying seasonal trends or behavioral shifts in how users interact over time.", size="md"),
+            dmc.Text("This box plot shows how the number of messages exchanged per match varies across each day, week or month of the selected window. Each box represents the distribution of message counts for the matches made in that period. The plot highlights patterns in user engagement, such as which months tend to have higher or lower activity, and reveals any outliers — matches with unusually high or low message counts. This can be useful for identifying seasonal trends or behavioral shifts in how users interact over time.", size="md"),
             dmc.Space(h=10),
             dcc.Graph(figure=fig)  
         ],
@@ -40,14 +82,59 @@ def message_counts_boxplot():
         style={"height": "750px"},
     )
 
-def response_latency_hist():
-    latency_data = match_analytics.get_response_latency()
-    fig = px.histogram(
-        latency_data,
-        x="latency_days",
-        nbins=20,
-        labels={"latency_days": "Latency (days)"}
+def _activity_timeline_figure(match_analytics, start, granularity):
+    import plotly.express as px
+
+    activity = match_analytics.get_activity_counts(start=start, granularity=granularity, as_frame=True)
+    fig = px.line(
+        activity,
+        x="period",
+        y=["matches", "likes", "chats", "blocks"],
+        labels={"period": GRANULARITY_LABELS[granularity], "value": "Count", "variable": "Event"}
+    )
+    return fig
+
+@timed(CARD_SECONDS)
+def activity_timeline(export_id=None, window="12m", granularity="month"):
+    match_analytics = get_match_analytics(export_id)
+    start = _window_start(window)
+    fig = figure_cache.get_or_build(match_analytics.fingerprint(), "activity_timeline",
+                                    lambda: _activity_timeline_figure(match_analytics, start, granularity),
+                                    start=start, granularity=granularity)
+
+    return dmc.Card(
+        children=[
+            dmc.Space(h=10),
+            dmc.Text(f"Activity by {GRANULARITY_LABELS[granularity]} ({WINDOW_LABELS[window]})", weight=700, size="xl"),
+            dmc.Space(h=10),
+            dmc.Text("This chart counts the matches, likes, messages and removals in each period of the selected window. "
+                     "Peaks and lulls show when the user was most active on the app and how conversations kept up with new matches.", size="md"),
+            dmc.Space(h=10),
+            dcc.Graph(figure=fig)
+        ],
+        shadow="sm",
+        radius="md",
+        style={"height": "600px"},
     )
+
+def _histogram_figure(edges, counts, x_title):
+    import plotly.graph_objects as go
+
+    # one bar per precomputed bin, drawn edge to edge like a plotly histogram
+    fig = go.Figure(go.Bar(x=(edges[:-1] + edges[1:]) / 2, y=counts, width=edges[1:] - edges[:-1]))
+    fig.update_layout(bargap=0, xaxis_title=x_title, yaxis_title="count")
+    return fig
+
+def _response_latency_hist_figure(match_analytics):
+    latency_data = match_analytics.get_response_latency(as_frame=True)
+    edges, counts = histogram(latency_data["latency_days"].to_numpy(), nbins=20)
+    return _histogram_figure(edges, counts, "Latency (days)")
+
+@timed(CARD_SECONDS)
+def response_latency_hist(export_id=None):
+    match_analytics = get_match_analytics(export_id)
+    fig = figure_cache.get_or_build(match_analytics.fingerprint(), "response_latency_hist", lambda: _response_latency_hist_figure(match_analytics))
+
     return dmc.Card(
         children=[
             dmc.Space(h=10),
@@ -63,14 +150,16 @@ def response_latency_hist():
         style={"height": "550px"},
     )
 
-def match_duration_hist():
-    durations = match_analytics.get_match_durations()
+def _match_duration_hist_figure(match_analytics):
+    durations = match_analytics.get_match_durations(as_frame=True)
+    edges, counts = histogram(durations["duration_days"].to_numpy(), nbins=40, integer=True)
+    return _histogram_figure(edges, counts, "Duration (days)")
+
+@timed(CARD_SECONDS)
+def match_duration_hist(export_id=None):
+    match_analytics = get_match_analytics(export_id)
+    fig = figure_cache.get_or_build(match_analytics.fingerprint(), "match_duration_hist", lambda: _match_duration_hist_figure(match_analytics))
 
-    fig = px.histogram(
-        durations,
-        x="duration_days",
-        labels={"duration_days": "Duration (days)"}
-    )
     return dmc.Card(
         children=[
             dmc.Space(h=10),
@@ -87,20 +176,39 @@ def match_duration_hist():
         style={"height": "550px"},
     )
 
-def match_removal_count_scatter():
-    match_rm_counts = pd.DataFrame(match_analytics.get_match_rm_counts())
-
-    fig = px.scatter(
-        match_rm_counts,
-        x="message_count",
-        y="duration_days",
-        labels={
-            "message_count": "Messages Exchanged",
-            "duration_days": "Days Between Match and Removal"
-        },
-        opacity=0.7
-    )
-    fig.update_traces(marker=dict(size=10))
+def _match_removal_count_scatter_figure(match_analytics, x_range=None, y_range=None):
+    import plotly.graph_objects as go
+
+    match_rm_counts = match_analytics.get_match_rm_counts(as_frame=True)
+    message_count = match_rm_counts["message_count"].to_numpy()
+    duration_days = match_rm_counts["duration_days"].to_numpy()
+    # only the points inside the visible ranges are sent, thinned where they pile up on each other
+    rows, density, visible = decimate(message_count, duration_days, SCATTER_MAX_POINTS, x_range, y_range)
+
+    if len(rows) < visible:
+        # the thinned points are colored by how many matches they stand for, so the density still shows
+        marker = dict(size=6, color=np.log10(density), colorscale="Viridis",
+                      colorbar=dict(title="Matches (log10)"))
+        title = f"{len(rows):,} of {visible:,} matches shown, zoom in for more detail"
+    else:
+        marker = dict(size=10, opacity=0.7)
+        title = None
+    trace = go.Scattergl if len(rows) > WEBGL_THRESHOLD else go.Scatter
+    fig = go.Figure(trace(x=message_count[rows], y=duration_days[rows], mode="markers", marker=marker))
+    fig.update_layout(
+        title=title, xaxis_title="Messages Exchanged", yaxis_title="Days Between Match and Removal",
+        # keeps the user's zoom when the callback swaps in the figure for the new range
+        uirevision="match-removal-count-scatter")
+    if x_range is not None:
+        fig.update_xaxes(range=list(x_range))
+    if y_range is not None:
+        fig.update_yaxes(range=list(y_range))
+    return fig
+
+@timed(CARD_SECONDS)
+def match_removal_count_scatter(export_id=None):
+    match_analytics = get_match_analytics(export_id)
+    fig = figure_cache.get_or_build(match_analytics.fingerprint(), "match_removal_count_scatter", lambda: _match_removal_count_scatter_figure(match_analytics))
 
     return dmc.Card(
         children=[
@@ -111,23 +219,100 @@ def match_removal_count_scatter():
             "Clusters near the bottom-left corner indicate 'early exits' — matches that were short-lived and involved little to no conversation, often pointing to ghosting or " \
             "instant disengagement. Conversely, matches in the top-right show more sustained interactions before ending.", size="md"),
             dmc.Space(h=10),
-            dcc.Graph(figure=fig)  
+            dcc.Graph(id="match-removal-scatter", figure=fig)
         ],
         shadow="sm",
         radius="md",
         style={"height": "600px"},
     )
 
+def _relayout_range(relayout_data, axis):
+    """Range of an axis after a zoom, "auto" after it was reset, None when the axis didn't change."""
+    if relayout_data.get(f"{axis}.autorange"):
+        return "auto"
+    if f"{axis}.range[0]" in relayout_data:
+        return relayout_data[f"{axis}.range[0]"], relayout_data[f"{axis}.range[1]"]
+    if f"{axis}.range" in relayout_data:
+        return tuple(relayout_data[f"{axis}.range"])
+    return None
+
 
-layout = html.Div([
+def layout(export=None, **kwargs):
+    # only the page skeleton is built on navigation, the cards are filled in by load_match_cards.
+    # the export to show comes from the url, e.g. /matches?export=<export id>
+    return html.Div([
+        dcc.Store(id="match-export", data=export),
         dmc.Text("Match Analytics", align="center", style={"fontSize": 28}, weight=500),
         dmc.Text("This section reveals patterns in the user's matching behavior, preferences, and key factors that influence successful connections with potential matches."),
         dmc.Space(h=20),
-        message_counts_boxplot(),
+        dmc.Group([
+            dmc.SegmentedControl(id="match-window", value="12m",
+                                 data=[{"value": value, "label": label} for value, label in WINDOW_LABELS.items()]),
+            dmc.SegmentedControl(id="match-granularity", value="month",
+                                 data=[{"value": value, "label": label} for value, label in GRANULARITY_LABELS.items()])
+        ]),
         dmc.Space(h=20),
-        response_latency_hist(),
+        dcc.Loading(html.Div(id="match-window-cards"), type="circle"),
         dmc.Space(h=20),
-        match_duration_hist(),
-        dmc.Space(h=20),
-        match_removal_count_scatter()
+        dcc.Loading(html.Div(id="match-cards"), type="circle")
     ])
+
+@callback(
+    Output("match-window-cards", "children"),
+    Input("match-export", "data"),
+    Input("match-window", "value"),
+    Input("match-granularity", "value")
+)
+def load_match_window_cards(export_id, window, granularity):
+    # the windowed cards are answered from the rollups, so changing the window doesn't rescan the export
+    try:
+        get_match_analytics(export_id)
+    except Exception as e:
+        return dmc.Text(str(e), color="red")
+
+    return [
+        message_counts_boxplot(export_id, window, granularity),
+        dmc.Space(h=20),
+        activity_timeline(export_id, window, granularity)
+    ]
+
+@callback(
+    Output("match-cards", "children"),
+    Input("match-export", "data")
+)
+def load_match_cards(export_id):
+    try:
+        get_match_analytics(export_id)
+    except Exception:
+        # the error is already shown in place of the windowed cards
+        return None
+
+    return [
+        response_latency_hist(export_id),
+        dmc.Space(h=20),
+        match_duration_hist(export_id),
+        dmc.Space(h=20),
+        match_removal_count_scatter(export_id)
+    ]
+
+@callback(
+    Output("match-removal-scatter", "figure"),
+    Input("match-removal-scatter", "relayoutData"),
+    State("match-export", "data"),
+    prevent_initial_call=True
+)
+def redecimate_match_removal_scatter(relayout_data, export_id):
+    # zooming re-decimates the visible range, so the detail hidden by thinning appears as the user zooms in
+    x_range = _relayout_range(relayout_data or {}, "xaxis")
+    y_range = _relayout_range(relayout_data or {}, "yaxis")
+    if x_range is None and y_range is None:
+        return no_update  # e.g. a resize, the points didn't change
+
+    match_analytics = get_match_analytics(export_id)
+    if x_range in (None, "auto") and y_range in (None, "auto"):
+        # back to the whole export, which is the cached figure of the card
+        return figure_cache.get_or_build(match_analytics.fingerprint(), "match_removal_count_scatter",
+                                         lambda: _match_removal_count_scatter_figure(match_analytics))
+    # zoomed figures aren't cached, the ranges hardly ever repeat
+    return _match_removal_count_scatter_figure(
+        match_analytics, None if x_range == "auto" else x_range, None if y_range == "auto" else y_range)
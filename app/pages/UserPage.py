@@ -1,17 +1,21 @@
-from dash import html, dcc, callback
+from dash import html, dcc, callback, clientside_callback
 import dash_mantine_components as dmc
-import plotly.express as px
+# plotly.express brings pandas with it, the figure builders import it on first use to keep startup fast
 from dash.dependencies import Input, Output, State
 import plotly.graph_objects as go
 
-from analytics.UserAnalytics import UserAnalytics
+from analytics.ExportRegistry import export_registry
+from analytics.Metrics import CARD_SECONDS, timed
+from utilities.FigureCache import figure_cache
 
 BLUE = "#3BAAC4"
 REDISH = "#C4553B"
 
-user_analytics = UserAnalytics()
+def get_user_analytics(export_id=None):
+    # the analytics are loaded the first time an export's page is opened rather than when the app starts
+    return export_registry.get(export_id).user_analytics()
 
-def stringency_vs_flexibility():
+def _stringency_vs_flexibility_figure(user_analytics):
     dealbreaker_counts = user_analytics.count_stringeny_attributes()
 
     category_labels = {
@@ -50,6 +54,13 @@ def stringency_vs_flexibility():
         barmode='group',  
         template="plotly_white"
     )
+    return fig
+
+@timed(CARD_SECONDS)
+def stringency_vs_flexibility(export_id=None):
+    user_analytics = get_user_analytics(export_id)
+    fig = figure_cache.get_or_build(user_analytics.fingerprint(), "stringency_vs_flexibility", lambda: _stringency_vs_flexibility_figure(user_analytics))
+
     return dmc.Card(
         children=[
             dmc.Space(h=10),
@@ -65,7 +76,9 @@ def stringency_vs_flexibility():
         style={"height": "600px"},
     )
 
-def geolocation():
+def _geolocation_figure(user_analytics):
+    import plotly.express as px
+
     df = user_analytics.collect_location_from_ip()
     fig = px.scatter_geo(
         df,
@@ -82,6 +95,13 @@ def geolocation():
         showocean=True, oceancolor="rgb(204, 230, 255)",  # customize ocean color
         showcountries=True, countrycolor="rgb(255, 255, 255)"  # show country borders
     )
+    return fig
+
+@timed(CARD_SECONDS)
+def geolocation(export_id=None):
+    user_analytics = get_user_analytics(export_id)
+    fig = figure_cache.get_or_build(user_analytics.fingerprint(), "geolocation", lambda: _geolocation_figure(user_analytics))
+
     return dmc.Card(
         children=[
             dmc.Space(h=10),
@@ -97,7 +117,7 @@ def geolocation():
         style={"height": "550px"},
     )
 
-def potential_misalignments():
+def _potential_misalignments_figure(user_analytics):
     # define categories
     categories = ["Religion", "Ethnicity", "Smoking", "Drinking", "Marijuana", "Drugs", "Children", "Family Plans", "Education", "Politics"]
 
@@ -114,6 +134,12 @@ def potential_misalignments():
     )])
 
     fig.update_layout(title="Profile Visibility Comparison Between The User and Their Preferences")
+    return fig
+
+@timed(CARD_SECONDS)
+def potential_misalignments(export_id=None):
+    user_analytics = get_user_analytics(export_id)
+    fig = figure_cache.get_or_build(user_analytics.fingerprint(), "potential_misalignments", lambda: _potential_misalignments_figure(user_analytics))
 
     return dmc.Card(
         children=[
@@ -131,7 +157,7 @@ def potential_misalignments():
     )
 
 
-def disclosure_vs_privacy():
+def _disclosure_vs_privacy_figure(user_analytics):
     category_counts = user_analytics.count_displayed_attributes()
 
     category_labels = {
@@ -169,6 +195,13 @@ def disclosure_vs_privacy():
         barmode='group',  
         template="plotly_white"
     )
+    return fig
+
+@timed(CARD_SECONDS)
+def disclosure_vs_privacy(export_id=None):
+    user_analytics = get_user_analytics(export_id)
+    fig = figure_cache.get_or_build(user_analytics.fingerprint(), "disclosure_vs_privacy", lambda: _disclosure_vs_privacy_figure(user_analytics))
+
     return dmc.Card(
         children=[
             dmc.Space(h=10),
@@ -184,14 +217,18 @@ def disclosure_vs_privacy():
         style={"height": "520px"},
     )
 
-def user_photo_slideshow():
-    jpg_files = user_analytics.get_media_file_paths()
+@timed(CARD_SECONDS)
+def user_photo_slideshow(export_id=None):
+    export = export_registry.get(export_id)
+    # the store holds urls so the slideshow doesn't need to know where each export's assets live
+    jpg_files = [export.assets_url + file_name for file_name in export.user_analytics().get_media_file_paths(variant="card")]
 
     return dmc.Card(
         children=[
             dmc.Text("User Uploaded Photos", align="center", weight=750, size="xl"),
             dmc.Space(h=10),
-            html.Img(id="slideshow-image", style={"width": "100%", "borderRadius": "10px"}),  # Image placeholder
+            html.Img(id="slideshow-image", src=jpg_files[0] if jpg_files else None,
+                     style={"width": "100%", "borderRadius": "10px"}),
             dcc.Interval(id="interval-component", interval=10000, n_intervals=0),
             dcc.Store(id="image-store", data=jpg_files)  # Store images
         ],
@@ -201,18 +238,28 @@ def user_photo_slideshow():
         style={"width": "500px", "height": "550px", "padding": "20px"},
     )
 
-@callback(
+# the slideshow rotates in the browser, the server only sends the list of urls when the page loads
+clientside_callback(
+    """
+    function(n_intervals, jpg_files) {
+        // NOTE: images have to the in an "assets" directory in the same folder as the app.py file
+        if (!jpg_files || jpg_files.length === 0) {
+            return window.dash_clientside.no_update;
+        }
+        // preload the next slide so it is already cached when the interval fires
+        const next = new Image();
+        next.src = jpg_files[(n_intervals + 1) % jpg_files.length];
+        return jpg_files[n_intervals % jpg_files.length];
+    }
+    """,
     Output("slideshow-image", "src"),
     Input("interval-component", "n_intervals"),
     State("image-store", "data")  # Get images dynamically from Store
 )
-def update_image(n_intervals, jpg_files):
-    # NOTE: images have to the in an "assets" directory in the same folder as the app.py file
-    return f"assets/{jpg_files[n_intervals % len(jpg_files)]}"  # Use relative path with /assets/
 
 
-def create_user_location_card():
-    user_location = user_analytics.build_user_location_dict()
+def _create_user_location_card_figure(user_location):
+    import plotly.express as px
 
     fig = px.scatter_mapbox(
         lat=[user_location["latitude"]],
@@ -227,6 +274,14 @@ def create_user_location_card():
         mapbox_style="carto-positron",
         mapbox_center={"lat": user_location["latitude"], "lon": user_location["longitude"]}
     )
+    return fig
+
+@timed(CARD_SECONDS)
+def create_user_location_card(export_id=None):
+    user_analytics = get_user_analytics(export_id)
+    user_location = user_analytics.build_user_location_dict()
+    fig = figure_cache.get_or_build(user_analytics.fingerprint(), "create_user_location_card", lambda: _create_user_location_card_figure(user_location))
+
     return dmc.Card(
         children=[
             dmc.Space(h=10),
@@ -245,7 +300,9 @@ def create_user_location_card():
     )
 
 
-def create_user_summary_card():
+@timed(CARD_SECONDS)
+def create_user_summary_card(export_id=None):
+    user_analytics = get_user_analytics(export_id)
     user_summary = user_analytics.build_user_summary_dict()
     
     return dmc.Card(
@@ -273,31 +330,49 @@ def create_user_summary_card():
         style={"width": "500px", "padding": "20px", "height": "550px"},
     )
 
-layout = html.Div([
-    dmc.Text("User Analytics", align="center", style={"fontSize": 28}, weight=500),
-    dmc.Space(h=10),
-    dmc.Text("This section contains insights into how the user's profile is presented, the preferences they've set, and how their interactions shape their experience on the app."),
-    dmc.Space(h=20),
-    dmc.Grid(
-    children=[
-        dmc.Col(
-            user_photo_slideshow(),
-            span=4
-        ),
-         dmc.Col(
-            create_user_summary_card(),
-            span=4,  
-         ),
-         dmc.Col(
-            create_user_location_card(),
-            span=4  
-         )
-    ],
-    style={"height": "60vh"}  ),
-    dmc.Space(h=120),
-    disclosure_vs_privacy(),
-    potential_misalignments(),
-    # geolocation(), # TODO: this is causing issues with too many lookup calls
-    stringency_vs_flexibility(),
-    dmc.Space(h=50)
-])
+def layout(export=None, **kwargs):
+    # only the page skeleton is built on navigation, the cards are filled in by load_user_cards.
+    # the export to show comes from the url, e.g. /user?export=<export id>
+    return html.Div([
+        dcc.Store(id="user-export", data=export),
+        dmc.Text("User Analytics", align="center", style={"fontSize": 28}, weight=500),
+        dmc.Space(h=10),
+        dmc.Text("This section contains insights into how the user's profile is presented, the preferences they've set, and how their interactions shape their experience on the app."),
+        dmc.Space(h=20),
+        dcc.Loading(html.Div(id="user-cards"), type="circle")
+    ])
+
+@callback(
+    Output("user-cards", "children"),
+    Input("user-export", "data")
+)
+def load_user_cards(export_id):
+    try:
+        get_user_analytics(export_id)
+    except Exception as e:
+        return dmc.Text(str(e), color="red")
+
+    return [
+        dmc.Grid(
+        children=[
+            dmc.Col(
+                user_photo_slideshow(export_id),
+                span=4
+            ),
+             dmc.Col(
+                create_user_summary_card(export_id),
+                span=4,
+             ),
+             dmc.Col(
+                create_user_location_card(export_id),
+                span=4
+             )
+        ],
+        style={"height": "60vh"}  ),
+        dmc.Space(h=120),
+        disclosure_vs_privacy(export_id),
+        potential_misalignments(export_id),
+        geolocation(export_id),
+        stringency_vs_flexibility(export_id),
+        dmc.Space(h=50)
+    ]
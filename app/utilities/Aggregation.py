@@ -0,0 +1,146 @@
+import math
+
+import numpy as np
+
+# multiples a histogram bin width is rounded up to, times a power of ten
+NICE_STEPS = (1, 2, 2.5, 5, 10)
+
+
+def bin_edges(values, nbins=20, integer=False):
+    """
+    Edges of about nbins equal bins covering values, with a round bin width (1, 2, 2.5 or 5 times a power of
+    ten) the way plotly picks them.
+    :param integer: the values are whole numbers, bins are then at least 1 wide and start on a whole number
+    """
+    values = np.asarray(values)
+    if len(values) == 0:
+        return np.empty(0, dtype=np.float64)
+    lo, hi = float(values.min()), float(values.max())
+    if hi == lo:
+        width = 1.0
+    else:
+        raw = (hi - lo) / nbins
+        magnitude = 10 ** math.floor(math.log10(raw))
+        width = next(step * magnitude for step in NICE_STEPS if step * magnitude >= raw)
+    if integer:
+        width = max(1.0, math.ceil(width))
+        # centered on the integers, so each value sits in the middle of its bar
+        start = math.floor(lo) - 0.5
+    else:
+        start = math.floor(lo / width) * width
+    count = max(1, math.floor((hi - start) / width) + 1)
+    return start + width * np.arange(count + 1)
+
+
+def histogram(values, nbins=20, integer=False):
+    """
+    Bins values server side, so a chart gets one bar per bin instead of every raw value.
+    :return: tuple of (bin edges, counts per bin)
+    """
+    values = np.asarray(values)
+    edges = bin_edges(values, nbins, integer)
+    if len(edges) == 0:
+        return edges, np.empty(0, dtype=np.int64)
+    counts, _ = np.histogram(values, bins=edges)
+    return edges, counts
+
+
+def box_stats(groups, values, max_outliers=None, seed=0):
+    """
+    Box plot statistics of values per group, computed the way plotly does for raw points: quartiles with
+    linear interpolation, whiskers reaching the furthest values within 1.5 IQR of the box and every value
+    past them an outlier.
+    :param groups: group of each value, e.g. the period a match was made in
+    :param max_outliers: outliers are sampled down to at most this many over all groups
+    :return: dict of arrays with one entry per group (group, q1, median, q3, mean, lowerfence, upperfence,
+             count), plus outlier_groups and outlier_values
+    """
+    groups = np.asarray(groups)
+    values = np.asarray(values, dtype=np.float64)
+    labels, inverse = np.unique(groups, return_inverse=True)
+    # values sorted within each group, so every group is one contiguous, sorted slice
+    order = np.lexsort((values, inverse))
+    sorted_values = values[order]
+    bounds = np.searchsorted(inverse[order], np.arange(len(labels) + 1))
+
+    stats = {name: np.empty(len(labels)) for name in ("q1", "median", "q3", "mean", "lowerfence", "upperfence")}
+    outliers = []
+    for i in range(len(labels)):
+        group_values = sorted_values[bounds[i]:bounds[i + 1]]
+        q1, median, q3 = np.percentile(group_values, [25, 50, 75])
+        iqr = q3 - q1
+        inside = group_values[(group_values >= q1 - 1.5 * iqr) & (group_values <= q3 + 1.5 * iqr)]
+        stats["q1"][i], stats["median"][i], stats["q3"][i] = q1, median, q3
+        stats["mean"][i] = group_values.mean()
+        stats["lowerfence"][i], stats["upperfence"][i] = inside[0], inside[-1]
+        outliers.append(np.flatnonzero((group_values < inside[0]) | (group_values > inside[-1])) + bounds[i])
+
+    outlier_rows = np.concatenate(outliers) if outliers else np.empty(0, dtype=np.int64)
+    if max_outliers is not None and len(outlier_rows) > max_outliers:
+        outlier_rows = outlier_rows[sample_rows(len(outlier_rows), max_outliers, seed)]
+    return dict(stats, group=labels, count=np.diff(bounds),
+                outlier_groups=labels[inverse[order][outlier_rows]], outlier_values=sorted_values[outlier_rows])
+
+
+def sample_rows(total, size, seed=0):
+    """Sorted positions of a random sample of size out of total rows, the same every time for the same seed."""
+    if total <= size:
+        return np.arange(total)
+    return np.sort(np.random.default_rng(seed).choice(total, size=size, replace=False))
+
+
+def decimate(x, y, max_points, x_range=None, y_range=None, grid=128, seed=0):
+    """
+    Picks at most max_points of the points inside the given ranges while keeping the shape of the cloud. The
+    visible area is split into a grid x grid raster and every occupied cell keeps up to the same number of
+    points, so sparse regions and outliers all survive and only dense cells are thinned. The size of each
+    kept point's cell is returned along with it, so the thinned density can still be shown, e.g. as color.
+    The grid is made coarser when max_points is below its number of cells, so every occupied cell can keep one.
+    :param x_range: (min, max) of x to keep, all points when not set, likewise y_range
+    :return: tuple of (kept rows in their original order, points in each kept row's cell, visible points)
+    """
+    x = np.asarray(x, dtype=np.float64)
+    y = np.asarray(y, dtype=np.float64)
+    visible = np.ones(len(x), dtype=bool)
+    if x_range is not None:
+        visible &= (x >= x_range[0]) & (x <= x_range[1])
+    if y_range is not None:
+        visible &= (y >= y_range[0]) & (y <= y_range[1])
+    rows = np.flatnonzero(visible)
+    if len(rows) == 0:
+        return rows, np.empty(0, dtype=np.int64), 0
+
+    grid = max(1, min(grid, math.isqrt(max_points)))
+    cells = _grid_cell(x[rows], x_range, grid) * grid + _grid_cell(y[rows], y_range, grid)
+    # shuffled before grouping by cell, so the points a cell keeps are a random sample of it
+    shuffled = np.random.default_rng(seed).permutation(len(rows))
+    order = shuffled[np.argsort(cells[shuffled], kind="stable")]
+    sorted_cells = cells[order]
+    starts = np.flatnonzero(np.r_[True, sorted_cells[1:] != sorted_cells[:-1]])
+    counts = np.diff(np.r_[starts, len(order)])
+    rank = np.arange(len(order)) - np.repeat(starts, counts)
+
+    keep = rank < _cell_quota(counts, max_points)
+    kept = order[keep]
+    density = np.repeat(counts, counts)[keep]
+    in_order = np.argsort(kept)
+    return rows[kept[in_order]], density[in_order], len(rows)
+
+
+def _grid_cell(values, value_range, grid):
+    lo, hi = value_range if value_range is not None else (values.min(), values.max())
+    if hi <= lo:
+        return np.zeros(len(values), dtype=np.int64)
+    return np.clip(((values - lo) / (hi - lo) * grid).astype(np.int64), 0, grid - 1)
+
+
+def _cell_quota(counts, max_points):
+    # the largest per cell cap that keeps the total within max_points, at least one point per occupied cell
+    lo, hi = 1, int(counts.max())
+    while lo < hi:
+        mid = (lo + hi + 1) // 2
+        if np.minimum(counts, mid).sum() <= max_points:
+            lo = mid
+        else:
+            hi = mid - 1
+    return lo
@@ -0,0 +1,94 @@
+from collections import OrderedDict
+import gzip
+import os
+import threading
+
+# payloads below this size aren't worth the CPU, the headers alone are a few hundred bytes
+DEFAULT_MIN_BYTES = 1024
+# cheap levels, a callback response is compressed on every request
+DEFAULT_GZIP_LEVEL = 5
+DEFAULT_BROTLI_QUALITY = 4
+# compressed bodies of responses with an ETag (Dash's JavaScript bundles) are kept, they never change
+DEFAULT_CACHE_ENTRIES = 32
+COMPRESSIBLE_TYPES = ("text/", "application/json", "application/javascript", "application/x-javascript",
+                      "image/svg+xml")
+
+
+class ResponseCompressor:
+    """
+    Compresses Flask responses with brotli or gzip, whichever the client accepts and prefers. Brotli is
+    optional, without the package every client is served gzip.
+
+    Responses that are small, already encoded, streamed or not text are passed through unchanged.
+    """
+    def __init__(self, min_bytes=None, gzip_level=None, brotli_quality=None, cache_entries=DEFAULT_CACHE_ENTRIES):
+        self.min_bytes = int(os.environ.get("COMPRESS_MIN_BYTES", DEFAULT_MIN_BYTES)) if min_bytes is None else min_bytes
+        self.gzip_level = int(os.environ.get("GZIP_LEVEL", DEFAULT_GZIP_LEVEL)) if gzip_level is None else gzip_level
+        self.brotli_quality = int(os.environ.get("BROTLI_QUALITY", DEFAULT_BROTLI_QUALITY)) \
+            if brotli_quality is None else brotli_quality
+        self.cache_entries = cache_entries
+        self._cache = OrderedDict()
+        self._lock = threading.Lock()
+        try:
+            import brotli
+            self._brotli = brotli
+            self.encodings = ["br", "gzip"]
+        except ImportError:
+            self._brotli = None
+            self.encodings = ["gzip"]
+
+    def compress(self, response, accept_encodings, cache_key=None):
+        """
+        Compresses the response body in place when worthwhile.
+        :param accept_encodings: werkzeug Accept of the request's Accept-Encoding header
+        :param cache_key: identifies the body for caching, e.g. the path, only used with an ETag
+        :return: the encoding applied, None when the response was left alone
+        """
+        if response.direct_passthrough or response.status_code != 200 or "Content-Encoding" in response.headers:
+            return None
+        if not (response.mimetype or "").startswith(COMPRESSIBLE_TYPES):
+            return None
+        # the body differs per encoding, caches in between must key on the header
+        response.vary.add("Accept-Encoding")
+        encoding = accept_encodings.best_match(self.encodings)
+        if encoding is None:
+            return None
+
+        data = response.get_data()
+        if len(data) < self.min_bytes:
+            return None
+        etag = response.headers.get("ETag")
+        key = (cache_key, etag, encoding) if etag and cache_key else None
+        compressed = self._cached(key)
+        if compressed is None:
+            compressed = self._encode(data, encoding)
+            self._store(key, compressed)
+
+        response.set_data(compressed)
+        # the ETag is kept as is, Dash answers revalidations by comparing it verbatim and Vary already
+        # keeps caches from mixing up the encodings
+        response.headers["Content-Encoding"] = encoding
+        return encoding
+
+    def _encode(self, data, encoding):
+        if encoding == "br":
+            return self._brotli.compress(data, quality=self.brotli_quality)
+        # a fixed mtime keeps the output the same for the same input
+        return gzip.compress(data, compresslevel=self.gzip_level, mtime=0)
+
+    def _cached(self, key):
+        if key is None:
+            return None
+        with self._lock:
+            compressed = self._cache.get(key)
+            if compressed is not None:
+                self._cache.move_to_end(key)
+            return compressed
+
+    def _store(self, key, compressed):
+        if key is None:
+            return
+        with self._lock:
+            self._cache[key] = compressed
+            while len(self._cache) > self.cache_entries:
+                self._cache.popitem(last=False)
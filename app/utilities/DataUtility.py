@@ -1,41 +1,163 @@
-import json
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
-import requests
+from urllib.parse import urlparse
+import hashlib
+import json
+import logging
+import os
+import threading
+
+LIKED_PHOTOS_PATH = "data/liked_photos"
+MANIFEST_FILE = "manifest.jsonl"
+CHUNK_SIZE = 1 << 16
 
 
-def liked_photos(df):
+def liked_photos(df, output_dir=LIKED_PHOTOS_PATH, max_workers=8, per_host_limit=4, retries=3, backoff=0.5):
     """
     In a recent data export from Hinge, they started including the urls of the liked photos in the content metadata.
-    This retrieves the url metadata.
+    This retrieves the url metadata and downloads the photos.
     :param df: DataFrame of normalized events
+    :param output_dir: directory the photos and the download manifest are written to
+    :param max_workers: number of concurrent downloads
+    :param per_host_limit: maximum concurrent downloads from any single host
+    :param retries: retries per photo for connection errors and 429/5xx responses
+    :param backoff: backoff factor between retries, in seconds
+    :return: dict with the number of photos downloaded, skipped, deduplicated and failed
     """
-    Path("../data/liked_photos").mkdir(parents=True, exist_ok=True)
+    downloader = PhotoDownloader(output_dir, max_workers=max_workers, per_host_limit=per_host_limit,
+                                 retries=retries, backoff=backoff)
+    return downloader.download(liked_photo_urls(df))
 
+
+def liked_photo_urls(df):
     # get events that have content metadata
     content = df["content"].dropna()
     # extract the urls from the content metadata
     urls = []
     for record in content:
+        # most content records aren't photos, skip them without decoding
+        if '"photo"' not in record:
+            continue
         json_data = json.loads(record)
         url = json_data[0]["photo"]["url"]
         if len(url) > 1:
             # add to a list
             urls.append(url)
+    return urls
+
+
+class PhotoDownloader:
+    """
+    Downloads photos concurrently over a pooled session with retries, streaming each one to disk.
+
+    Completed downloads are appended to a manifest in the output directory, so a rerun skips everything
+    already on disk. Photos are content-hashed while they stream, and a photo whose bytes match one that
+    was already downloaded is recorded against the existing file instead of being kept twice.
+    """
+    def __init__(self, output_dir, max_workers=8, per_host_limit=4, retries=3, backoff=0.5, timeout=30):
+        self.output_dir = output_dir
+        self.max_workers = max_workers
+        self.per_host_limit = per_host_limit
+        self.timeout = timeout
+
+        # requests is only needed once photos are downloaded, not when the module is imported
+        import requests
+        from requests.adapters import HTTPAdapter
+        from urllib3.util.retry import Retry
+
+        retry = Retry(total=retries, backoff_factor=backoff, status_forcelist=(429, 500, 502, 503, 504),
+                      allowed_methods=("GET",), raise_on_status=False)
+        adapter = HTTPAdapter(pool_connections=max_workers, pool_maxsize=max_workers, max_retries=retry)
+        self.session = requests.Session()
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+
+        self._host_limits = {}
+        self._lock = threading.Lock()
+        self._manifest = {}
+        self._hashes = {}
+
+    def download(self, urls):
+        Path(self.output_dir).mkdir(parents=True, exist_ok=True)
+        self._load_manifest()
+
+        pending = [url for url in dict.fromkeys(urls) if not self._is_complete(url)]
+        summary = {"downloaded": 0, "skipped": len(set(urls)) - len(pending), "duplicates": 0, "failed": 0}
+
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            for status in executor.map(self._download_one, pending):
+                summary[status] += 1
+
+        logging.info(f"Liked photos: {summary['downloaded']} downloaded, {summary['skipped']} already on disk, "
+                     f"{summary['duplicates']} duplicates, {summary['failed']} failed.")
+        return summary
+
+    def _download_one(self, url):
+        from requests import RequestException
+
+        file_name = "liked_photo_" + hashlib.sha1(url.encode()).hexdigest()[:16] + ".jpg"
+        path = os.path.join(self.output_dir, file_name)
+        tmp_path = path + ".part"
+        digest = hashlib.sha256()
+
+        try:
+            with self._host_limit(url):
+                with self.session.get(url, stream=True, timeout=self.timeout) as response:
+                    if response.status_code != 200:
+                        logging.warning(f"Failed to download photo. Status code: {response.status_code}")
+                        return "failed"
+                    with open(tmp_path, "wb") as file:
+                        for chunk in response.iter_content(CHUNK_SIZE):
+                            digest.update(chunk)
+                            file.write(chunk)
+        except (RequestException, OSError) as e:
+            logging.warning(f"Failed to download photo: {e}")
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            return "failed"
 
-    counter = 0
-    for photo_url in urls:
-        response = requests.get(photo_url)
+        content_hash = digest.hexdigest()
+        with self._lock:
+            existing = self._hashes.get(content_hash)
+            if existing is not None and os.path.exists(os.path.join(self.output_dir, existing)):
+                os.remove(tmp_path)
+                file_name, status = existing, "duplicates"
+            else:
+                os.replace(tmp_path, path)
+                self._hashes[content_hash] = file_name
+                status = "downloaded"
+            self._record(url, file_name, content_hash)
+        return status
 
-        if response.status_code == 200:
-            # get the content of the response (photo binary data)
-            photo_content = response.content
+    def _host_limit(self, url):
+        host = urlparse(url).netloc
+        with self._lock:
+            if host not in self._host_limits:
+                self._host_limits[host] = threading.BoundedSemaphore(self.per_host_limit)
+            return self._host_limits[host]
 
-            file_name = "{}{}{}".format("data/liked_photos/liked_photo_", counter, ".jpg")
-            with open(file_name, "wb") as file:
-                file.write(photo_content)
+    def _is_complete(self, url):
+        entry = self._manifest.get(url)
+        return entry is not None and os.path.exists(os.path.join(self.output_dir, entry["file"]))
 
-            print("Photo downloaded successfully.")
-        else:
-            print(f"Failed to download photo. Status code: {response.status_code}")
+    def _load_manifest(self):
+        self._manifest = {}
+        self._hashes = {}
+        path = os.path.join(self.output_dir, MANIFEST_FILE)
+        if not os.path.exists(path):
+            return
+        with open(path, "r") as file:
+            for line in file:
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    continue  # a line cut short by an interrupted run
+                self._manifest[entry["url"]] = entry
+                self._hashes.setdefault(entry["sha256"], entry["file"])
 
-        counter = counter + 1
+    def _record(self, url, file_name, content_hash):
+        # the manifest is append-only so an interrupted run keeps everything it finished
+        entry = {"url": url, "file": file_name, "sha256": content_hash}
+        self._manifest[url] = entry
+        with open(os.path.join(self.output_dir, MANIFEST_FILE), "a") as file:
+            file.write(json.dumps(entry) + "\n")
@@ -0,0 +1,144 @@
+from collections import OrderedDict
+import hashlib
+import json
+import logging
+import os
+import threading
+
+try:
+    # several times faster than json for figures, and encodes NumPy arrays without converting them to lists
+    import orjson
+except ImportError:
+    orjson = None
+
+DEFAULT_MAX_BYTES = 64 * 1024 * 1024
+
+
+class FigureCache:
+    """
+    Caches serialized Plotly figures keyed by (export fingerprint, chart id, filter params).
+
+    Figures are held as JSON strings in memory up to max_bytes, evicting the least recently used ones,
+    and optionally written to a disk directory that survives restarts and is shared between processes.
+    Because the export fingerprint is part of the key, a refreshed export never serves stale figures.
+    """
+    def __init__(self, max_bytes=None, disk_path=None):
+        if max_bytes is None:
+            max_bytes = int(os.environ.get("FIGURE_CACHE_MAX_BYTES", DEFAULT_MAX_BYTES))
+        if disk_path is None:
+            disk_path = os.environ.get("FIGURE_CACHE_PATH")
+
+        self.max_bytes = max_bytes
+        self.disk_path = disk_path
+        if disk_path:
+            os.makedirs(disk_path, exist_ok=True)
+
+        self._entries = OrderedDict()
+        self._size = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+
+    def get_or_build(self, fingerprint, chart_id, build, **params):
+        """
+        Returns the cached figure for the key, calling build() to create and cache it on a miss.
+        :param fingerprint: identity of the export the figure is computed from
+        :param chart_id: name of the chart
+        :param build: callable returning a plotly figure (or figure dict)
+        :param params: filter parameters the figure depends on
+        :return: the figure as a dict, ready to pass to dcc.Graph
+        """
+        key = _cache_key(fingerprint, chart_id, params)
+
+        payload = self._get_memory(key)
+        if payload is None:
+            payload = self._get_disk(key)
+        if payload is None:
+            with self._lock:
+                self.misses += 1
+            figure = build()
+            payload = figure.to_json() if hasattr(figure, "to_json") else _dumps(figure)
+            self._put_memory(key, payload)
+            self._put_disk(key, payload)
+        return _loads(payload)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._size = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+    @property
+    def size_bytes(self):
+        return self._size
+
+    def _get_memory(self, key):
+        with self._lock:
+            payload = self._entries.get(key)
+            if payload is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+            return payload
+
+    def _put_memory(self, key, payload):
+        size = len(payload)
+        # a figure bigger than the whole cache would just evict everything else
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            if key in self._entries:
+                self._size -= len(self._entries.pop(key))
+            self._entries[key] = payload
+            self._size += size
+            while self._size > self.max_bytes:
+                _, evicted = self._entries.popitem(last=False)
+                self._size -= len(evicted)
+
+    def _get_disk(self, key):
+        if not self.disk_path:
+            return None
+        try:
+            with open(self._disk_file(key), "r") as file:
+                payload = file.read()
+        except OSError:
+            return None
+        with self._lock:
+            self.disk_hits += 1
+        self._put_memory(key, payload)
+        return payload
+
+    def _put_disk(self, key, payload):
+        if not self.disk_path:
+            return
+        path = self._disk_file(key)
+        tmp_path = f"{path}.tmp-{os.getpid()}-{threading.get_ident()}"
+        try:
+            with open(tmp_path, "w") as file:
+                file.write(payload)
+            os.replace(tmp_path, path)
+        except OSError as e:
+            logging.warning(f"Unable to write figure cache entry to '{path}': {e}")
+
+    def _disk_file(self, key):
+        return os.path.join(self.disk_path, hashlib.sha256(key.encode()).hexdigest() + ".json")
+
+
+def _dumps(figure):
+    if orjson is None:
+        return json.dumps(figure)
+    return orjson.dumps(figure, option=orjson.OPT_SERIALIZE_NUMPY).decode()
+
+
+def _loads(payload):
+    return orjson.loads(payload) if orjson is not None else json.loads(payload)
+
+
+def _cache_key(fingerprint, chart_id, params):
+    return json.dumps([fingerprint, chart_id, params], sort_keys=True, default=str)
+
+
+# shared by the pages so every visitor hits the same cache
+figure_cache = FigureCache()
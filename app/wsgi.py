@@ -0,0 +1,19 @@
+"""
+Production entry point, served by gunicorn with the settings in gunicorn.conf.py:
+
+    gunicorn --config gunicorn.conf.py
+
+The app is imported and warmed up once in the master process. Workers are forked afterwards and share
+the parsed exports and rendered figures copy-on-write instead of each loading their own.
+"""
+import gc
+
+from main import server, warmup
+
+# the WSGI callable gunicorn serves, see wsgi_app in gunicorn.conf.py
+application = server
+
+warmup()
+# move everything loaded so far out of the collector's reach, otherwise the first collection in each
+# worker writes to every object's header and copies the pages they live on
+gc.freeze()
@@ -0,0 +1,62 @@
+"""
+Reports how long importing the app takes and which modules it spends that time on.
+
+The module is imported in a fresh interpreter with `-X importtime`, so the numbers are those of a cold
+container start rather than of modules the benchmark process already has loaded.
+
+    python benchmarks/import_report.py --module main --top 25
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+
+APP_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "app")
+
+
+def import_report(module="main", top=25):
+    """
+    :param module: module to import, relative to app/ like the app's own imports
+    :param top: number of modules with the largest cumulative import time to report
+    :return: dict with the total import time in seconds and the slowest modules
+    """
+    result = subprocess.run([sys.executable, "-X", "importtime", "-c", f"import {module}"], cwd=APP_DIR,
+                            capture_output=True, text=True)
+    if result.returncode != 0:
+        raise Exception(f"Importing '{module}' failed:\n{result.stderr[-2000:]}")
+
+    modules = []
+    for line in result.stderr.splitlines():
+        # import time: self [us] | cumulative | imported package
+        if not line.startswith("import time:") or "[us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        modules.append({"module": name.strip(), "depth": (len(name) - len(name.lstrip()) - 1) // 2,
+                        "self_seconds": int(self_us) / 1e6, "cumulative_seconds": int(cumulative_us) / 1e6})
+
+    total = next((entry["cumulative_seconds"] for entry in modules if entry["module"] == module), None)
+    slowest = sorted(modules, key=lambda entry: entry["cumulative_seconds"], reverse=True)[:top]
+    return {"module": module, "total_seconds": total, "modules_imported": len(modules), "slowest": slowest}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Report the import time of the app's modules.")
+    parser.add_argument("--module", default="main", help="module to import, relative to app/")
+    parser.add_argument("--top", type=int, default=25, help="number of modules to list")
+    parser.add_argument("--json", action="store_true", help="print the report as JSON")
+    args = parser.parse_args()
+
+    report = import_report(args.module, args.top)
+    if args.json:
+        print(json.dumps(report, indent=2))
+        return
+    print(f"import {report['module']}: {report['total_seconds'] * 1000:.1f} ms, "
+          f"{report['modules_imported']} modules")
+    for entry in report["slowest"]:
+        print(f"{entry['cumulative_seconds'] * 1000:10.1f} ms {entry['self_seconds'] * 1000:10.1f} ms  "
+              f"{'  ' * entry['depth']}{entry['module']}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,211 @@
+"""
+Benchmarks ingest, every analytics method and every card builder on synthetic exports of increasing size.
+
+Each benchmark is timed over a few runs and then run once more under tracemalloc for its peak memory.
+The import time of the app in a fresh interpreter is reported as well. Results are written to JSON named after the current commit, so runs can be compared across commits:
+
+    python benchmarks/run_benchmarks.py --sizes 1000 10000 100000 1000000
+    python benchmarks/run_benchmarks.py --sizes 1000 10000 --baseline benchmarks/results/<commit>.json
+"""
+from contextlib import contextmanager
+from datetime import datetime
+import argparse
+import json
+import logging
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+
+BENCHMARKS_DIR = os.path.dirname(os.path.abspath(__file__))
+REPO_DIR = os.path.dirname(BENCHMARKS_DIR)
+APP_DIR = os.path.join(REPO_DIR, "app")
+# the app imports its packages relative to app/, the same as when main.py is run
+sys.path.insert(0, APP_DIR)
+
+from import_report import import_report  # noqa: E402
+from synthetic_export import generate_export  # noqa: E402
+
+SIZES = (1_000, 10_000, 100_000, 1_000_000)
+RESULTS_DIR = os.path.join(BENCHMARKS_DIR, "results")
+
+MATCH_METHODS = ("get_message_count_last_12_months", "get_message_counts", "get_activity_counts",
+                 "get_response_latency", "get_match_durations", "get_match_rm_counts", "get_inter_message_gaps",
+                 "get_conversation_lengths", "get_last_message_to_block")
+USER_METHODS = ("build_user_location_dict", "build_user_summary_dict", "profile_preference_selections",
+                "count_stringeny_attributes", "count_displayed_attributes", "collect_location_from_ip")
+MATCH_CARDS = ("message_counts_boxplot", "activity_timeline", "response_latency_hist", "match_duration_hist",
+               "match_removal_count_scatter")
+USER_CARDS = ("stringency_vs_flexibility", "geolocation", "potential_misalignments", "disclosure_vs_privacy",
+              "user_photo_slideshow", "create_user_location_card", "create_user_summary_card")
+
+
+def measure(fn, repeat=3, trace_memory=True):
+    """
+    Times fn over repeat runs, then runs it once more under tracemalloc.
+    :return: dict with the median and fastest run in seconds and the peak memory allocated in bytes
+    """
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - start)
+
+    result = {"seconds": statistics.median(times), "min_seconds": min(times), "runs": repeat}
+    if trace_memory:
+        tracemalloc.start()
+        try:
+            fn()
+            result["peak_bytes"] = tracemalloc.get_traced_memory()[1]
+        finally:
+            tracemalloc.stop()
+    return result
+
+
+@contextmanager
+def environment(**values):
+    # the analytics read their configuration from the environment, so benchmarks set it per run
+    previous = {key: os.environ.get(key) for key in values}
+    os.environ.update({key: value for key, value in values.items() if value is not None})
+    for key in (key for key, value in values.items() if value is None):
+        os.environ.pop(key, None)
+    try:
+        yield
+    finally:
+        for key, value in previous.items():
+            if value is None:
+                os.environ.pop(key, None)
+            else:
+                os.environ[key] = value
+
+
+def benchmark_size(size, data_dir, work_dir, repeat, trace_memory, media_count):
+    from analytics.ExportRegistry import ExportRegistry, MATCH_FILE, USER_FILE, MEDIA_DIR
+    from analytics.MatchAnalytics import MatchAnalytics
+    from analytics.UserAnalytics import UserAnalytics
+    import pages.MatchPage as MatchPage
+    import pages.UserPage as UserPage
+    from utilities.FigureCache import figure_cache
+
+    export_id = str(size)
+    export_dir = os.path.join(data_dir, export_id)
+    if not os.path.exists(os.path.join(export_dir, MATCH_FILE)):
+        start = time.perf_counter()
+        generate_export(export_dir, interactions=size, media_count=media_count)
+        logging.info(f"Generated {size} interactions in {time.perf_counter() - start:.1f}s.")
+
+    match_file_path = os.path.join(export_dir, MATCH_FILE)
+    user_file_path = os.path.join(export_dir, USER_FILE)
+    media_path = os.path.join(export_dir, MEDIA_DIR)
+    assets_path = os.path.join(work_dir, "assets")
+    snapshot_path = os.path.join(work_dir, "snapshots", export_id)
+    results = []
+
+    def record(group, name, fn):
+        result = measure(fn, repeat=repeat, trace_memory=trace_memory)
+        results.append(dict(size=size, group=group, name=name, **result))
+        logging.info(f"{size:>9} {group:<8} {name:<36} {result['seconds'] * 1000:10.2f} ms")
+
+    with environment(SNAPSHOT_PATH=None, FIGURE_CACHE_PATH=None, GEOLITE_DB_PATH=None,
+                     GEO_CACHE_PATH=None, ASSETS_PATH=assets_path):
+        record("ingest", "MatchAnalytics(load)", lambda: MatchAnalytics(match_file_path, stream=False))
+        record("ingest", "MatchAnalytics(stream)", lambda: MatchAnalytics(match_file_path, stream=True))
+        with environment(SNAPSHOT_PATH=snapshot_path):
+            MatchAnalytics(match_file_path, stream=True)  # write the snapshot the timed runs load
+            record("ingest", "MatchAnalytics(snapshot)", lambda: MatchAnalytics(match_file_path))
+        record("ingest", "UserAnalytics", lambda: UserAnalytics(user_file_path, copy_media=False))
+        record("ingest", "UserAnalytics(media cold)",
+               lambda: UserAnalytics(user_file_path, media_path=media_path, assets_path=_fresh_dir(work_dir)))
+        UserAnalytics(user_file_path, media_path=media_path, assets_path=assets_path)  # sync the media once
+        record("ingest", "UserAnalytics(media synced)",
+               lambda: UserAnalytics(user_file_path, media_path=media_path, assets_path=assets_path))
+
+        match_analytics = MatchAnalytics(match_file_path, stream=False)
+        for method in MATCH_METHODS:
+            record("match", method, getattr(match_analytics, method))
+        user_analytics = UserAnalytics(user_file_path, copy_media=False)
+        for method in USER_METHODS:
+            record("user", method, getattr(user_analytics, method))
+
+        # the pages resolve exports through their registry, point them at the synthetic exports
+        registry = ExportRegistry(exports_path=data_dir, max_loaded=1)
+        MatchPage.export_registry = UserPage.export_registry = registry
+        for page, cards in ((MatchPage, MATCH_CARDS), (UserPage, USER_CARDS)):
+            for card in cards:
+                builder = getattr(page, card)
+                # clearing the figure cache times a cold build, as on the first visit to a page
+                record("cards", card, lambda: (figure_cache.clear(), builder(export_id)))
+    return results
+
+
+def _fresh_dir(work_dir):
+    return tempfile.mkdtemp(prefix="assets-", dir=work_dir)
+
+
+def compare(results, baseline_path):
+    with open(baseline_path, "r") as file:
+        baseline = {(row["size"], row["group"], row["name"]): row for row in json.load(file)["results"]}
+    for row in results:
+        previous = baseline.get((row["size"], row["group"], row["name"]))
+        if previous is None or not previous["seconds"]:
+            continue
+        ratio = row["seconds"] / previous["seconds"]
+        print(f"{row['size']:>9} {row['group']:<8} {row['name']:<36} {previous['seconds'] * 1000:10.2f} ms "
+              f"-> {row['seconds'] * 1000:10.2f} ms ({ratio:.2f}x)")
+
+
+def _commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=REPO_DIR, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the analytics and card builders on synthetic exports.")
+    parser.add_argument("--sizes", type=int, nargs="+", default=list(SIZES), help="numbers of interactions")
+    parser.add_argument("--repeat", type=int, default=3, help="timed runs per benchmark")
+    parser.add_argument("--media", type=int, default=6, help="photos in each synthetic export")
+    parser.add_argument("--data-dir", default=None, help="where synthetic exports are generated and reused from")
+    parser.add_argument("--no-memory", action="store_true", help="skip the tracemalloc run of each benchmark")
+    parser.add_argument("--output", default=None, help="results file, benchmarks/results/<commit>.json by default")
+    parser.add_argument("--baseline", default=None, help="earlier results file to compare against")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+    commit = _commit()
+    # measured before anything below imports the app into this process
+    imports = import_report("main")
+    logging.info(f"{'startup':>18} {'import main':<36} {imports['total_seconds'] * 1000:10.2f} ms")
+    with tempfile.TemporaryDirectory() as work_dir:
+        data_dir = args.data_dir or os.path.join(work_dir, "exports")
+        results = [{"size": 0, "group": "startup", "name": "import main", "seconds": imports["total_seconds"],
+                    "min_seconds": imports["total_seconds"], "runs": 1}]
+        for size in args.sizes:
+            results.extend(benchmark_size(size, data_dir, os.path.join(work_dir, str(size)), args.repeat,
+                                          not args.no_memory, args.media))
+
+    output = args.output or os.path.join(RESULTS_DIR, f"{commit or 'results'}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, "w") as file:
+        json.dump({
+            "commit": commit,
+            "created": datetime.now().isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "results": results,
+            "imports": imports
+        }, file, indent=2)
+    logging.info(f"Wrote {len(results)} results to '{output}'.")
+
+    if args.baseline:
+        compare(results, args.baseline)
+
+
+if __name__ == '__main__':
+    main()
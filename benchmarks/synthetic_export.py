@@ -0,0 +1,158 @@
+"""
+Generates synthetic Hinge exports of any size for the benchmarks.
+
+The export has the same layout as a real one (matches.json, user.json and a media directory), with
+interactions spread over the two years before END_TIME. Generation is seeded, so the same arguments
+always produce the same export.
+
+    python benchmarks/synthetic_export.py data/synthetic --interactions 100000 --media 20
+"""
+from datetime import datetime, timedelta
+import argparse
+import json
+import logging
+import os
+import random
+
+END_TIME = datetime(2025, 6, 1)
+SPAN_SECONDS = 2 * 365 * 24 * 3600
+TIMESTAMP_FORMAT = "%Y-%m-%d %H:%M:%S"
+BLOCK_TYPES = ("remove", "remove", "remove", "report", "unmatch")
+MESSAGES = ("Hey there!", "What's up?", "Hi!", "How was your weekend?", "Haha, same here",
+            "Want to grab a coffee sometime?", "I love that place!", "Sorry, just saw this")
+
+
+def generate_export(output_dir, interactions=1000, chats_per_match=5, match_ratio=0.4, like_ratio=0.6,
+                    block_ratio=0.5, media_count=6, devices=3, seed=0):
+    """
+    Writes a synthetic export to output_dir.
+    :param interactions: number of entries in matches.json
+    :param chats_per_match: average number of messages in a match, the actual count is exponentially distributed
+    :param match_ratio: share of the interactions that are matches
+    :param like_ratio: share of the interactions that start with an outgoing like
+    :param block_ratio: share of the matches that are later removed or reported
+    :param media_count: number of photos in the media directory
+    :param devices: number of devices, each with its own IP address, in user.json
+    """
+    rng = random.Random(seed)
+    os.makedirs(output_dir, exist_ok=True)
+    # the file is written an interaction at a time so exports far larger than memory can be generated
+    with open(os.path.join(output_dir, "matches.json"), "w") as file:
+        file.write("[")
+        for i in range(interactions):
+            if i:
+                file.write(",")
+            file.write(json.dumps(_interaction(rng, chats_per_match, match_ratio, like_ratio, block_ratio)))
+        file.write("]")
+
+    with open(os.path.join(output_dir, "user.json"), "w") as file:
+        json.dump(_user(rng, devices), file)
+
+    if media_count:
+        _write_media(os.path.join(output_dir, "media"), media_count, rng)
+    logging.info(f"Generated a synthetic export with {interactions} interactions in '{output_dir}'.")
+    return output_dir
+
+
+def _interaction(rng, chats_per_match, match_ratio, like_ratio, block_ratio):
+    start = END_TIME - timedelta(seconds=rng.randrange(SPAN_SECONDS))
+    entry = {}
+    if rng.random() < like_ratio:
+        like_time = _format(start)
+        entry["like"] = [{"timestamp": like_time, "like": [{"timestamp": like_time}]}]
+    if rng.random() >= match_ratio:
+        # likes that never became a match, and incoming likes that were removed
+        if "like" not in entry or rng.random() < 0.2:
+            entry["block"] = [{"block_type": "remove", "timestamp": _format(start + timedelta(hours=rng.random() * 48))}]
+        return entry
+
+    match_time = start + timedelta(hours=rng.random() * 72)
+    entry["match"] = [{"timestamp": _format(match_time)}]
+    chat_time = match_time
+    chats = []
+    for _ in range(int(rng.expovariate(1 / chats_per_match)) if chats_per_match else 0):
+        chat_time += timedelta(seconds=rng.expovariate(1 / 7200))
+        chats.append({"body": rng.choice(MESSAGES), "timestamp": _format(chat_time)})
+    if chats:
+        entry["chats"] = chats
+    if rng.random() < block_ratio:
+        block_time = chat_time + timedelta(days=rng.expovariate(1 / 5))
+        entry["block"] = [{"block_type": rng.choice(BLOCK_TYPES), "timestamp": _format(block_time)}]
+    return entry
+
+
+def _user(rng, devices):
+    signup_time = END_TIME - timedelta(seconds=SPAN_SECONDS)
+    profile = {
+        "first_name": "Synthetic User", "age": 30, "height_centimeters": 175, "gender": "female",
+        "ethnicities": "Prefer Not to Say", "religions": "Prefer Not to Say", "job_title": "Engineer",
+        "workplaces": "Somewhere", "education_attained": "Undergraduate", "hometowns": "Somewhere",
+        "languages_spoken": "English", "politics": "Prefer Not to Say", "pets": "Dog",
+        "relationship_types": "Prefer Not to Say", "dating_intention": "Prefer Not to Say"
+    }
+    for field in ("smoking", "drinking", "drugs", "marijuana", "children", "family_plans"):
+        profile[field] = "[Prefer Not to Say]"
+    for field in ("gender_identity", "ethnicities", "religions", "workplaces", "schools", "job_title", "hometowns",
+                  "smoking", "drinking", "marijuana", "drugs", "children", "family_plans", "politics",
+                  "vaccination_status", "dating_intention", "languages_spoken", "relationship_type", "pets"):
+        profile[f"{field}_displayed"] = rng.random() < 0.5
+
+    preferences = {"distance_miles_max": 50, "age_min": 25, "age_max": 35}
+    for field in ("age", "height", "ethnicity", "religion", "smoking", "drinking", "marijuana", "drugs", "children",
+                  "family_plans", "education_attained", "politics"):
+        preferences[f"{field}_dealbreaker"] = rng.random() < 0.3
+        if field not in ("age", "height"):
+            preferences[f"{field}_preference"] = "[Open to All]"
+
+    return {
+        "devices": [{"ip_address": f"203.0.113.{rng.randrange(1, 255)}", "device_model": "unknown",
+                     "device_platform": "ios", "device_os_versions": "17.0"} for _ in range(devices)],
+        "account": {
+            "signup_time": signup_time.strftime("%Y-%m-%d %H:%M:%S.%f")[:-3],
+            "last_pause_time": (signup_time + timedelta(days=100)).strftime("%Y-%m-%d %H:%M:%S.%f")[:-3],
+            "last_unpause_time": (signup_time + timedelta(days=110)).strftime("%Y-%m-%d %H:%M:%S.%f")[:-3],
+            "last_seen": END_TIME.strftime("%Y-%m-%d %H:%M:%S.%f")[:-3],
+            "device_platform": "ios", "device_os": "17.0", "device_model": "unknown", "app_version": "9.30.0",
+            "push_notifications_enabled": False
+        },
+        "profile": profile,
+        "preferences": preferences,
+        "location": {"latitude": 40.65, "longitude": -73.95, "country_short": "US", "admin_area_1_short": "NY",
+                     "cbsa": "Brooklyn", "neighborhood": "Flatbush"}
+    }
+
+
+def _write_media(media_dir, media_count, rng):
+    from PIL import Image
+
+    os.makedirs(media_dir, exist_ok=True)
+    for i in range(media_count):
+        color = (rng.randrange(256), rng.randrange(256), rng.randrange(256))
+        Image.new("RGB", (1200, 1600), color).save(os.path.join(media_dir, f"photo_{i}.jpg"), "JPEG")
+
+
+def _format(timestamp):
+    return timestamp.strftime(TIMESTAMP_FORMAT)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate a synthetic Hinge export.")
+    parser.add_argument("output_dir", help="directory the export is written to")
+    parser.add_argument("--interactions", type=int, default=1000, help="number of interactions in matches.json")
+    parser.add_argument("--chats-per-match", type=float, default=5, help="average number of messages per match")
+    parser.add_argument("--match-ratio", type=float, default=0.4, help="share of interactions that are matches")
+    parser.add_argument("--like-ratio", type=float, default=0.6, help="share of interactions with an outgoing like")
+    parser.add_argument("--block-ratio", type=float, default=0.5, help="share of matches that are later removed")
+    parser.add_argument("--media", type=int, default=6, help="number of photos in the media directory")
+    parser.add_argument("--devices", type=int, default=3, help="number of devices in user.json")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    generate_export(args.output_dir, interactions=args.interactions, chats_per_match=args.chats_per_match,
+                    match_ratio=args.match_ratio, like_ratio=args.like_ratio, block_ratio=args.block_ratio,
+                    media_count=args.media, devices=args.devices, seed=args.seed)
+
+
+if __name__ == '__main__':
+    main()
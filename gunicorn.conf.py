@@ -0,0 +1,37 @@
+# gunicorn settings for the production entry point, see app/wsgi.py
+import multiprocessing
+import os
+import tempfile
+
+# the app imports its packages relative to app/, the working directory stays the repo root so relative
+# paths in the environment (ASSETS_PATH, SNAPSHOT_PATH, ...) resolve the same as with python app/main.py
+pythonpath = os.path.join(os.path.dirname(os.path.abspath(__file__)), "app")
+wsgi_app = "wsgi:application"
+bind = f"{os.environ.get('HOST', '0.0.0.0')}:{os.environ.get('PORT', '8050')}"
+workers = int(os.environ.get("WEB_CONCURRENCY", multiprocessing.cpu_count()))
+threads = int(os.environ.get("GUNICORN_THREADS", 4))
+# import and warm up the app once in the master, the workers are forked with the exports already loaded
+preload_app = True
+# a cold card on a large export can take a while, don't let the master kill the worker building it
+timeout = int(os.environ.get("GUNICORN_TIMEOUT", 120))
+accesslog = "-"
+
+
+def on_starting(server):
+    # every worker writes its metrics to this directory and /metrics merges them, whichever worker answers
+    from analytics.Metrics import metrics
+    metrics_dir = os.environ.setdefault("METRICS_DIR", tempfile.mkdtemp(prefix="hinge-metrics-"))
+    os.makedirs(metrics_dir, exist_ok=True)
+    # the totals of a previous run would otherwise be added to this one's
+    for name in os.listdir(metrics_dir):
+        if name.endswith(".json"):
+            os.remove(os.path.join(metrics_dir, name))
+    metrics.share(metrics_dir)
+
+
+def post_fork(server, worker):
+    # threads aren't carried over by fork, so every worker watches the exports it serves for changes
+    from analytics.ExportRegistry import export_registry
+    from analytics.Metrics import metrics
+    export_registry.watch()
+    metrics.share(os.environ["METRICS_DIR"])
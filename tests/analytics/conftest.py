@@ -0,0 +1,84 @@
+from types import SimpleNamespace
+import json
+from unittest.mock import mock_open, patch
+# the app imports pandas lazily, import it before the fixtures mock open since it reads its timezone files
+import pandas  # noqa: F401
+import pytest
+
+from app.analytics.MatchAnalytics import MatchAnalytics
+from app.analytics.UserAnalytics import UserAnalytics
+from tests.analytics.data import ASSETS_PATH, GEOLITE_DB_PATH, MATCH_DATA, MATCH_FILE_PATH, MEDIA_PATH, USER_DATA, USER_FILE_PATH
+
+#########################################################################################
+# test values
+#########################################################################################
+CITIES = {
+    "174.234.168.00": ("Brooklyn", "New York", "United States"),
+    "130.279.438.00": ("Brooklyn", "New York", "United States"),
+    "81.2.69.142": ("London", "England", "United Kingdom"),
+}
+COORDINATES = {
+    "Brooklyn, New York, United States": (40.65, -73.95),
+    "London, England, United Kingdom": (51.51, -0.13),
+}
+
+class StubReader:
+    def __init__(self):
+        self.calls = []
+
+    def city(self, ip):
+        self.calls.append(ip)
+        if ip not in CITIES:
+            raise ValueError(f"{ip} is not in the database")
+        city, region, country = CITIES[ip]
+        return SimpleNamespace(city=SimpleNamespace(name=city),
+                               subdivisions=SimpleNamespace(most_specific=SimpleNamespace(name=region)),
+                               country=SimpleNamespace(name=country))
+
+class StubGeocoder:
+    def __init__(self):
+        self.calls = []
+
+    def geocode(self, query):
+        self.calls.append(query)
+        if query not in COORDINATES:
+            return None
+        latitude, longitude = COORDINATES[query]
+        return SimpleNamespace(latitude=latitude, longitude=longitude)
+
+#########################################################################################
+# pytest fixtures
+#########################################################################################
+@pytest.fixture
+def match_analytics(monkeypatch):
+    monkeypatch.setenv("MATCH_FILE_PATH", MATCH_FILE_PATH)
+
+    with patch("builtins.open", mock_open(read_data=MATCH_DATA)), \
+         patch("json.load", return_value=json.loads(MATCH_DATA)):
+
+        match_analytics = MatchAnalytics()
+    return match_analytics
+
+@pytest.fixture
+def user_analytics(monkeypatch):
+    monkeypatch.setenv("USER_FILE_PATH", USER_FILE_PATH)
+    monkeypatch.setenv("GEOLITE_DB_PATH", GEOLITE_DB_PATH)
+    monkeypatch.setenv("ASSETS_PATH", ASSETS_PATH)
+    monkeypatch.setenv("MEDIA_PATH", MEDIA_PATH)
+
+    with patch("builtins.open", mock_open(read_data=USER_DATA)), \
+         patch("json.load", return_value=json.loads(USER_DATA)), \
+         patch("os.makedirs"), \
+         patch("os.listdir", return_value=[]), \
+         patch("shutil.copy2"):
+
+        user_analytics = UserAnalytics()
+    return user_analytics
+
+@pytest.fixture
+def reader():
+    return StubReader()
+
+@pytest.fixture
+def geocoder():
+    return StubGeocoder()
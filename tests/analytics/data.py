@@ -0,0 +1,203 @@
+"""Sample export data shared by the analytics tests and their fixtures."""
+#########################################################################################
+# match export
+#########################################################################################
+MATCH_FILE_PATH = "fake/file/path/matches.json"
+MATCH_DATA = '''
+[
+    {
+        "match": [
+            {
+                "timestamp": "2025-04-23 14:53:01"
+            }
+        ],
+        "chats": [
+            {
+                "body": "Hey there!",
+                "timestamp": "2025-04-23 14:53:22"
+            }
+        ],
+        "block": [
+            {
+                "block_type": "remove",
+                "timestamp": "2025-04-23 16:32:53"
+            }
+        ]
+    },
+    {
+        "match": [
+            {
+                "timestamp": "2025-03-06 23:08:31"
+            }
+        ],
+        "chats": [
+            {
+                "body": "What's up?",
+                "timestamp": "2025-03-06 23:11:04"
+            }
+        ],
+        "block": [
+            {
+                "block_type": "remove",
+                "timestamp": "2025-03-15 16:32:49"
+            }
+        ]
+    },
+    {
+        "match": [
+            {
+                "timestamp": "2025-04-06 23:09:16"
+            }
+        ],
+        "chats": [
+            {
+                "body": "Hi!",
+                "timestamp": "2025-04-06 23:09:52"
+            },
+            {
+                "body": "Here's another message",
+                "timestamp": "2025-04-09 02:41:05"
+            },
+            {
+                "body": "And another message!",
+                "timestamp": "2025-04-10 12:27:21"
+            },
+            {
+                "body": "And one last message",
+                "timestamp": "2025-04-10 12:27:00"
+            }
+        ],
+        "block": [
+            {
+                "block_type": "remove",
+                "timestamp": "2025-04-15 16:32:45"
+            }
+        ],
+        "like": [
+            {
+                "timestamp": "2025-03-04 03:24:14",
+                "like": [
+                    {
+                        "timestamp": "2025-03-04 03:24:14"
+                    }
+                ]
+            }
+        ]
+    }
+]
+'''
+
+#########################################################################################
+# user export
+#########################################################################################
+USER_FILE_PATH = "fake/file/path/users.json"
+GEOLITE_DB_PATH = 'data/db_path.mmdb'
+ASSETS_PATH = 'fake/file/path/assets/'
+MEDIA_PATH = 'fake/file/path/media/'
+USER_DATA = '''
+{
+    "devices": [
+        {
+            "ip_address": "174.234.168.00",
+            "device_model": "unknown",
+            "device_platform": "ios",
+            "device_os_versions": "16.5.1"
+        },
+        {
+            "ip_address": "130.279.438.00",
+            "device_model": "unknown",
+            "device_platform": "ios",
+            "device_os_versions": "16.5.1"
+        }
+    ],
+    "account": {
+        "signup_time": "2024-01-01 03:27:17.539",
+        "last_pause_time": "2020-09-04 03:04:32.765",
+        "last_unpause_time": "2020-09-10 16:53:40.324",
+        "last_seen": "2024-01-17 04:07:39.234",
+        "device_platform": "ios",
+        "device_os": "16.6.1",
+        "device_model": "unknown",
+        "app_version": "9.30.0",
+        "push_notifications_enabled": false
+    },
+    "profile": {
+        "first_name": "Fake User",
+        "age": 99,
+        "height_centimeters": 213,
+        "gender": "female",
+        "gender_identity_displayed": false,
+        "ethnicities": "[Prefer Not to Say]",
+        "ethnicities_displayed": false,
+        "religions": "[Prefer Not to Say]",
+        "religions_displayed": true,
+        "workplaces_displayed": false,
+        "schools_displayed": true,
+        "job_title": "Astronaut",
+        "job_title_displayed": true,
+        "hometowns_displayed": false,
+        "smoking": "[Prefer Not to Say]",
+        "drinking": "[Prefer Not to Say]",
+        "drugs": "[Prefer Not to Say]",
+        "marijuana": "[Prefer Not to Say]",
+        "children": "[Prefer Not to Say]",
+        "family_plans": "[Prefer Not to Say]",
+        "smoking_displayed": false,
+        "drinking_displayed": true,
+        "marijuana_displayed": false,
+        "drugs_displayed": false,
+        "children_displayed": false,
+        "family_plans_displayed": true,
+        "politics_displayed": false,
+        "vaccination_status_displayed": true,
+        "dating_intention_displayed": false,
+        "languages_spoken_displayed": true,
+        "relationship_type_displayed": false,
+        "education_attained": "Undergraduate",
+        "languages_spoken": "English",
+        "ethnicities": "Prefer Not to Say",
+        "pets": "Dog",
+        "politics": "Prefer Not to Say",
+        "religions": "Prefer Not to Say",
+        "hometowns": "moon",
+        "relationship_types": "Prefer Not to Say",
+        "dating_intention": "Prefer Not to Say",
+        "workplaces": "Space"
+    },
+    "preferences": {
+        "distance_miles_max": 50,
+        "age_min": 98,
+        "age_max": 99,
+        "age_dealbreaker": true,
+        "height_dealbreaker": false,
+        "ethnicity_preference": "[Open to All]",
+        "ethnicity_dealbreaker": false,
+        "religion_preference": "[Open to All]",
+        "religion_dealbreaker": false,
+        "smoking_preference": "[Open to All]",
+        "smoking_dealbreaker": false,
+        "drinking_preference": "[Open to All]",
+        "drinking_dealbreaker": false,
+        "marijuana_preference": "[Open to All]",
+        "marijuana_dealbreaker": false,
+        "drugs_preference": "[Open to All]",
+        "drugs_dealbreaker": false,
+        "children_preference": "[Open to All]",
+        "children_dealbreaker": false,
+        "family_plans_preference": "[Open to All]",
+        "family_plans_dealbreaker": false,
+        "education_attained_preference": "[Open to All]",
+        "education_attained_dealbreaker": false,
+        "politics_preference": "[Open to All]",
+        "politics_dealbreaker": false
+    },
+    "location": {
+        "latitude": 65.00,
+        "longitude": 18.00,
+        "country_short": "US",
+        "admin_area_1_short": "NY",
+        "cbsa": "Brooklyn",
+        "neighborhood": "Flatbush"
+    }
+}
+'''
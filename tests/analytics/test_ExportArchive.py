@@ -0,0 +1,45 @@
+import json
+import zipfile
+
+from app.analytics.ExportArchive import (archive_member_path, export_file_size, iter_media_members,
+                                         locate_members, open_export_file, split_archive_path)
+from app.analytics.ExportStream import iter_json_array
+from tests.analytics.data import MATCH_DATA
+
+#########################################################################################
+# test values
+#########################################################################################
+MEMBERS = {
+    "export/matches.json": MATCH_DATA,
+    "export/user.json": "{}",
+    "export/media/a.jpg": "photo a",
+    "export/media/nested/b.jpg": "photo b",
+    "export/old/matches.json": "[]"
+}
+
+#########################################################################################
+# unit tests
+#########################################################################################
+def test_split_archive_path():
+    assert split_archive_path("data/export.zip!export/matches.json") == ("data/export.zip", "export/matches.json")
+    assert split_archive_path("data/matches.json") == ("data/matches.json", None)
+    # only paths into a .zip are split
+    assert split_archive_path("data/odd!name.json") == ("data/odd!name.json", None)
+
+def test_streams_members_without_extracting(tmp_path):
+    archive_path = str(tmp_path / "export.zip")
+    with zipfile.ZipFile(archive_path, "w", zipfile.ZIP_DEFLATED) as archive:
+        for name, data in MEMBERS.items():
+            archive.writestr(name, data)
+
+    members = locate_members(archive_path)
+    assert members == {"matches": "export/matches.json", "user": "export/user.json", "media": "export/media/"}
+
+    match_path = archive_member_path(archive_path, members["matches"])
+    with open_export_file(match_path) as file:
+        assert list(iter_json_array(file, chunk_size=16)) == json.loads(MATCH_DATA)
+    assert export_file_size(match_path) == len(MATCH_DATA.encode())
+    assert list(tmp_path.iterdir()) == [tmp_path / "export.zip"]
+
+    with zipfile.ZipFile(archive_path) as archive:
+        assert [info.filename for info in iter_media_members(archive, members["media"])] == ["export/media/a.jpg"]
@@ -0,0 +1,22 @@
+from app.analytics.ExportMetrics import summarize_match_analytics, summarize_user_analytics
+
+#########################################################################################
+# unit tests
+#########################################################################################
+def test_summarize_match_analytics(match_analytics):
+    metrics = summarize_match_analytics(match_analytics)
+    assert metrics["interactions"] == 3
+    assert metrics["matches"] == 3
+    assert metrics["likes"] == 1
+    assert metrics["messages"] == 6
+    assert metrics["latency_count"] == 3
+    assert metrics["duration_days_p50"] == 8
+    assert metrics["messages_per_match_max"] == 4
+    assert metrics["latency_days_p25"] <= metrics["latency_days_p50"] <= metrics["latency_days_p90"]
+
+def test_summarize_user_analytics(user_analytics):
+    metrics = summarize_user_analytics(user_analytics)
+    assert metrics["dealbreakers_physical_true"] == 1
+    assert metrics["dealbreakers_lifestyle_false"] == 4
+    assert metrics["displayed_identity_true"] == 2
+    assert metrics["on_app_duration_days"] == 16
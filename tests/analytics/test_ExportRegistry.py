@@ -0,0 +1,145 @@
+import io
+import json
+import time
+import zipfile
+
+import pytest
+
+from app.analytics.ExportRegistry import DEFAULT_EXPORT, ExportRegistry
+from tests.analytics.data import MATCH_DATA, USER_DATA
+
+#########################################################################################
+# pytest fixtures
+#########################################################################################
+@pytest.fixture
+def exports_path(tmp_path, monkeypatch):
+    monkeypatch.delenv("MATCH_FILE_PATH", raising=False)
+    monkeypatch.delenv("USER_FILE_PATH", raising=False)
+    monkeypatch.setenv("ASSETS_PATH", str(tmp_path / "assets"))
+
+    for export_id in ["alice", "bob", "carol"]:
+        export_dir = tmp_path / "exports" / export_id
+        (export_dir / "media").mkdir(parents=True)
+        (export_dir / "media" / "photo.jpg").write_bytes(b"jpg")
+        (export_dir / "matches.json").write_text(MATCH_DATA)
+        (export_dir / "user.json").write_text(USER_DATA)
+    return tmp_path / "exports"
+
+#########################################################################################
+# unit tests
+#########################################################################################
+def test_export_ids(exports_path):
+    registry = ExportRegistry(exports_path=str(exports_path))
+    assert registry.export_ids() == ["alice", "bob", "carol"]
+
+def test_default_export_listed_when_configured(exports_path, monkeypatch):
+    monkeypatch.setenv("MATCH_FILE_PATH", "fake/matches.json")
+    registry = ExportRegistry(exports_path=str(exports_path))
+    assert registry.export_ids()[0] == DEFAULT_EXPORT
+
+def test_loads_export_on_demand(exports_path):
+    registry = ExportRegistry(exports_path=str(exports_path))
+    export = registry.get("alice")
+
+    assert len(export.match_analytics().get_match_rm_counts()) == 3
+    assert export.match_analytics() is export.match_analytics()
+    assert export.user_analytics().get_media_file_paths() == ["photo.jpg"]
+    assert export.assets_url == "assets/exports/alice/"
+
+def test_bounded_lru(exports_path):
+    registry = ExportRegistry(exports_path=str(exports_path), max_loaded=2)
+    alice = registry.get("alice")
+    registry.get("bob")
+    # alice is the most recently used, so bob is evicted
+    assert registry.get("alice") is alice
+    registry.get("carol")
+    assert registry.loaded_ids() == ["alice", "carol"]
+
+def test_unknown_export(exports_path):
+    registry = ExportRegistry(exports_path=str(exports_path))
+    with pytest.raises(Exception, match="Unknown export '../alice'."):
+        registry.get("../alice")
+
+def test_refresh_swaps_changed_exports(exports_path):
+    registry = ExportRegistry(exports_path=str(exports_path))
+    export = registry.get("alice")
+    loaded = export.match_analytics()
+    assert registry.refresh() == []
+
+    entries = json.loads(MATCH_DATA)
+    (exports_path / "alice" / "matches.json").write_text(json.dumps(entries[:2]))
+    # the change is only picked up once the file stopped changing between two checks
+    assert registry.refresh() == []
+    assert registry.refresh() == ["alice"]
+    assert export.match_analytics() is not loaded
+    assert len(export.match_analytics().get_match_rm_counts()) == 2
+    assert len(loaded.get_match_rm_counts()) == 3
+
+def test_refresh_prunes_outdated_snapshots(exports_path, tmp_path, monkeypatch):
+    snapshot_path = tmp_path / "snapshots"
+    monkeypatch.setenv("SNAPSHOT_PATH", str(snapshot_path))
+    registry = ExportRegistry(exports_path=str(exports_path))
+    export = registry.get("alice")
+    export.match_analytics()
+
+    entries = json.loads(MATCH_DATA)
+    for count in (2, 1):
+        (exports_path / "alice" / "matches.json").write_text(json.dumps(entries[:count]))
+        registry.refresh()
+        assert registry.refresh() == ["alice"]
+
+    # only the snapshot of the version being served is left
+    assert len(list(snapshot_path.glob("matches-*.pack"))) == 1
+    assert [len(json.loads(path.read_text())) for path in snapshot_path.glob("matches-*.json")] == [1]
+    assert len(export.match_analytics().get_match_rm_counts()) == 1
+
+def test_refresh_keeps_serving_a_broken_export(exports_path):
+    registry = ExportRegistry(exports_path=str(exports_path))
+    export = registry.get("alice")
+    loaded = export.match_analytics()
+
+    (exports_path / "alice" / "matches.json").write_text('[{"match": ')
+    registry.refresh()
+    assert registry.refresh() == []
+    assert export.match_analytics() is loaded
+
+def test_watcher_reloads_in_the_background(exports_path):
+    registry = ExportRegistry(exports_path=str(exports_path))
+    export = registry.get("alice")
+    loaded = export.match_analytics()
+    (exports_path / "alice" / "matches.json").write_text("[]")
+
+    registry.watch(interval=0.01)
+    try:
+        deadline = time.monotonic() + 5
+        while export.match_analytics() is loaded and time.monotonic() < deadline:
+            time.sleep(0.01)
+    finally:
+        registry.stop_watching()
+    assert len(export.match_analytics().index) == 0
+
+def test_serves_uploaded_archives(exports_path, tmp_path):
+    upload = io.BytesIO()
+    with zipfile.ZipFile(upload, "w") as archive:
+        archive.writestr("export/matches.json", MATCH_DATA)
+        archive.writestr("export/user.json", USER_DATA)
+        archive.writestr("export/media/photo.jpg", b"jpg")
+    upload.seek(0)
+
+    registry = ExportRegistry(exports_path=str(exports_path))
+    registry.add_archive("dave", upload)
+    assert registry.export_ids() == ["alice", "bob", "carol", "dave"]
+
+    export = registry.get("dave")
+    assert len(export.match_analytics().get_match_rm_counts()) == 3
+    assert export.user_analytics().get_media_file_paths() == ["photo.jpg"]
+    # nothing but the archive itself is written to the exports path
+    assert not (exports_path / "dave").exists()
+
+def test_rejects_invalid_uploads(exports_path):
+    registry = ExportRegistry(exports_path=str(exports_path))
+    with pytest.raises(Exception, match="Invalid export name"):
+        registry.add_archive("../dave", io.BytesIO(b""))
+    with pytest.raises(Exception, match="not a zip archive"):
+        registry.add_archive("dave", io.BytesIO(b"not a zip"))
+    assert registry.export_ids() == ["alice", "bob", "carol"]
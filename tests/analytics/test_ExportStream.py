@@ -0,0 +1,42 @@
+import io
+import json
+import pytest
+
+from app.analytics.ExportStream import iter_json_array
+
+#########################################################################################
+# test values
+#########################################################################################
+ELEMENTS = [
+    {"match": [{"timestamp": "2025-04-23 14:53:01"}], "chats": [{"body": "Hey, [there]!", "timestamp": "2025-04-23 14:53:22"}]},
+    {"like": [{"timestamp": "2025-03-04 03:24:14"}]},
+    12345,
+    "a string with a \"quote\" and a , comma",
+    [],
+    {}
+]
+
+#########################################################################################
+# unit tests
+#########################################################################################
+@pytest.mark.parametrize("chunk_size", [1, 3, 16, 1 << 16])
+def test_yields_every_element(chunk_size):
+    text = json.dumps(ELEMENTS, indent=4)
+    assert list(iter_json_array(io.StringIO(text), chunk_size=chunk_size)) == ELEMENTS
+
+def test_empty_array():
+    assert list(iter_json_array(io.StringIO("  [ ]  "))) == []
+
+def test_not_an_array():
+    with pytest.raises(Exception, match="Expected the export to be a JSON array."):
+        list(iter_json_array(io.StringIO('{"match": []}')))
+
+def test_truncated_array():
+    with pytest.raises(Exception):
+        list(iter_json_array(io.StringIO('[{"match": []}, {"match"'), chunk_size=4))
+
+def test_yields_raw_text():
+    text = json.dumps(ELEMENTS, indent=4)
+    for (value, raw), element in zip(iter_json_array(io.StringIO(text), chunk_size=3, with_text=True), ELEMENTS):
+        assert value == element
+        assert json.loads(raw) == element
@@ -0,0 +1,74 @@
+import time
+
+from app.analytics.GeoLocation import GeoLocationService
+from tests.analytics.conftest import CITIES, StubGeocoder, StubReader
+
+#########################################################################################
+# test values
+#########################################################################################
+class FailingGeocoder:
+    def geocode(self, query):
+        raise TimeoutError("geocoder timed out")
+
+
+#########################################################################################
+# unit tests
+#########################################################################################
+def test_locate(reader, geocoder):
+    service = GeoLocationService(reader=reader, geocoder=geocoder, min_interval=0)
+    locations = service.locate(["174.234.168.00", "81.2.69.142", "10.0.0.1"])
+
+    assert [location["ip"] for location in locations] == ["174.234.168.00", "81.2.69.142"]
+    assert locations[0]["city"] == "Brooklyn"
+    assert (locations[1]["latitude"], locations[1]["longitude"]) == (51.51, -0.13)
+
+def test_deduplicates_ips_and_cities(reader, geocoder):
+    service = GeoLocationService(reader=reader, geocoder=geocoder, min_interval=0)
+    service.locate(["174.234.168.00", "174.234.168.00", "130.279.438.00"])
+
+    assert reader.calls == ["174.234.168.00", "130.279.438.00"]
+    # both IPs are in the same city, so it is only geocoded once
+    assert geocoder.calls == ["Brooklyn, New York, United States"]
+
+def test_cache_persists_across_instances(tmp_path, reader, geocoder):
+    cache_path = str(tmp_path / "geo_cache.sqlite")
+    GeoLocationService(cache_path=cache_path, reader=reader, geocoder=geocoder, min_interval=0).locate(list(CITIES))
+
+    cold_reader, cold_geocoder = StubReader(), StubGeocoder()
+    service = GeoLocationService(cache_path=cache_path, reader=cold_reader, geocoder=cold_geocoder, min_interval=0)
+    assert len(service.locate(list(CITIES))) == 3
+    assert cold_reader.calls == []
+    assert cold_geocoder.calls == []
+
+def test_failed_geocodes_are_not_cached(tmp_path, reader, geocoder):
+    cache_path = str(tmp_path / "geo_cache.sqlite")
+    failing = GeoLocationService(cache_path=cache_path, reader=reader, geocoder=FailingGeocoder(), min_interval=0)
+    assert failing.locate(list(CITIES)) == []
+
+    # the places are geocoded once the geocoder is reachable again
+    service = GeoLocationService(cache_path=cache_path, reader=reader, geocoder=geocoder, min_interval=0)
+    assert len(service.locate(list(CITIES))) == 3
+    assert len(geocoder.calls) == 2
+
+def test_reconnects_after_fork(tmp_path, reader, geocoder):
+    cache_path = str(tmp_path / "geo_cache.sqlite")
+    service = GeoLocationService(cache_path=cache_path, reader=reader, geocoder=geocoder, min_interval=0)
+    service.locate(list(CITIES))
+    parent_db = service._db
+
+    # a forked worker sees a different pid and opens its own connection to the same cache
+    service._db_pid = -1
+    assert len(service.locate(list(CITIES))) == 3
+    assert service._db is not parent_db
+    assert len(reader.calls) == 3
+
+def test_rate_limited_geocodes(reader, geocoder):
+    service = GeoLocationService(reader=reader, geocoder=geocoder, max_workers=4, min_interval=0.05)
+    start = time.monotonic()
+    service.locate(list(CITIES))
+    # two distinct cities, the second geocode waits for the interval
+    assert time.monotonic() - start >= 0.05
+
+def test_missing_database():
+    service = GeoLocationService(geolite_db_path="missing/GeoLite2-City.mmdb", geocoder=StubGeocoder(), min_interval=0)
+    assert service.locate(["174.234.168.00"]) == []
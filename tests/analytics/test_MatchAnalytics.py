@@ -1,114 +1,19 @@
 import pytest, os, json
-from unittest.mock import mock_open, patch
 from datetime import datetime
 
 from app.analytics.MatchAnalytics import MatchAnalytics
+from app.analytics.MatchIndex import MatchIndexBuilder
+from app.analytics.Timestamps import datetime_to_epoch
+from tests.analytics.data import MATCH_DATA
 
 #########################################################################################
 # test values
 #########################################################################################
-MATCH_FILE_PATH = "fake/file/path/matches.json"
 FIRST_MATCH_TIMESTAMP = '2025-04-23 14:53:01'
 FIRST_CHAT_TIMESTAMP = "2025-04-23 14:53:22"
 FIRST_BLOCK_TIMESTAMP = '2025-04-23 16:32:53'
 FIRST_LIKE_TIMESTAMP = "2025-03-04 03:24:14"
 FIRST_CHAT_MESSAGE = "Hey there!"
-MATCH_DATA = '''
-[
-    {
-        "match": [
-            {
-                "timestamp": "2025-04-23 14:53:01"
-            }
-        ],
-        "chats": [
-            {
-                "body": "Hey there!",
-                "timestamp": "2025-04-23 14:53:22"
-            }
-        ],
-        "block": [
-            {
-                "block_type": "remove",
-                "timestamp": "2025-04-23 16:32:53"
-            }
-        ]
-    },
-    {
-        "match": [
-            {
-                "timestamp": "2025-03-06 23:08:31"
-            }
-        ],
-        "chats": [
-            {
-                "body": "What's up?",
-                "timestamp": "2025-03-06 23:11:04"
-            }
-        ],
-        "block": [
-            {
-                "block_type": "remove",
-                "timestamp": "2025-03-15 16:32:49"
-            }
-        ]
-    },
-    {
-        "match": [
-            {
-                "timestamp": "2025-04-06 23:09:16"
-            }
-        ],
-        "chats": [
-            {
-                "body": "Hi!",
-                "timestamp": "2025-04-06 23:09:52"
-            },
-            {
-                "body": "Here's another message",
-                "timestamp": "2025-04-09 02:41:05"
-            },
-            {
-                "body": "And another message!",
-                "timestamp": "2025-04-10 12:27:21"
-            },
-            {
-                "body": "And one last message",
-                "timestamp": "2025-04-10 12:27:00"
-            }
-        ],
-        "block": [
-            {
-                "block_type": "remove",
-                "timestamp": "2025-04-15 16:32:45"
-            }
-        ],
-        "like": [
-            {
-                "timestamp": "2025-03-04 03:24:14",
-                "like": [
-                    {
-                        "timestamp": "2025-03-04 03:24:14"
-                    }
-                ]
-            }
-        ]
-    }
-]
-'''
-#########################################################################################
-# pytest fixtures
-#########################################################################################
-@pytest.fixture
-def match_analytics(monkeypatch):
-    monkeypatch.setenv("MATCH_FILE_PATH", MATCH_FILE_PATH)
-
-    with patch("builtins.open", mock_open(read_data=MATCH_DATA)) as mock_file, \
-         patch("json.load", return_value=json.loads(MATCH_DATA)) as mock_json_load:
-
-        match_analytics = MatchAnalytics()
-    return match_analytics
-
 #########################################################################################
 # unit tests
 #########################################################################################
@@ -181,4 +86,89 @@ def test_get_match_rm_counts(match_analytics):
 
     # print(match_rm_counts)
     assert match_rm_counts[2].get("message_count") == 4
-    assert match_rm_counts[2].get("duration_days") == 8
\ No newline at end of file
+    assert match_rm_counts[2].get("duration_days") == 8
+
+def test_stream_mode_matches_load_mode(tmp_path, monkeypatch, match_analytics):
+    match_file = tmp_path / "matches.json"
+    match_file.write_text(MATCH_DATA)
+    monkeypatch.setenv("MATCH_FILE_PATH", str(match_file))
+
+    streamed = MatchAnalytics(stream=True)
+    assert streamed.match_data is None
+    assert streamed.get_match_durations() == match_analytics.get_match_durations()
+    assert streamed.get_match_rm_counts() == match_analytics.get_match_rm_counts()
+    assert streamed.get_chat_data() == match_analytics.get_chat_data()
+
+def test_reload_reuses_unchanged_interactions(tmp_path, monkeypatch):
+    entries = json.loads(MATCH_DATA)
+    match_file = tmp_path / "matches.json"
+    match_file.write_text(json.dumps(entries))
+    monkeypatch.setenv("MATCH_FILE_PATH", str(match_file))
+    loaded = MatchAnalytics(stream=True)
+
+    # drop the first interaction and add a new one at the end
+    added = {"match": [{"timestamp": "2025-05-01 10:00:00"}], "chats": [{"body": "Hi!", "timestamp": "2025-05-01 11:00:00"}],
+             "block": [{"block_type": "unmatch", "timestamp": "2025-05-03 10:00:00"}]}
+    match_file.write_text(json.dumps(entries[1:] + [added]))
+    reloaded = loaded.reload()
+    parsed = MatchAnalytics(stream=True)
+
+    # the previous analytics are left as they were
+    assert len(loaded.get_match_rm_counts()) == 3
+    assert list(reloaded.entry_hashes[:2]) == list(loaded.entry_hashes[1:])
+    assert reloaded.get_match_rm_counts() == parsed.get_match_rm_counts()
+    assert reloaded.get_conversation_lengths() == parsed.get_conversation_lengths()
+    assert reloaded.get_last_message_to_block() == parsed.get_last_message_to_block()
+    assert reloaded.fingerprint() != loaded.fingerprint()
+
+@pytest.mark.parametrize("snapshot", [False, True])
+def test_first_reload_after_load_reuses_interactions(tmp_path, monkeypatch, snapshot):
+    entries = json.loads(MATCH_DATA)
+    match_file = tmp_path / "matches.json"
+    match_file.write_text(json.dumps(entries))
+    monkeypatch.setenv("MATCH_FILE_PATH", str(match_file))
+    if snapshot:
+        monkeypatch.setenv("SNAPSHOT_PATH", str(tmp_path / "snapshots"))
+        # builds the snapshot, the analytics reloaded below are mapped from it like in every other worker
+        MatchAnalytics()
+    loaded = MatchAnalytics()
+
+    parsed = []
+    add = MatchIndexBuilder.add
+    monkeypatch.setattr(MatchIndexBuilder, "add", lambda builder, entry: parsed.append(entry) or add(builder, entry))
+    added = {"match": [{"timestamp": "2025-05-01 10:00:00"}], "chats": [{"body": "Hi!", "timestamp": "2025-05-01 11:00:00"}]}
+    match_file.write_text(json.dumps(entries + [added]))
+    reloaded = loaded.reload()
+
+    # only the new interaction is parsed, the rest are copied over from the initial load
+    assert parsed == [added]
+    assert len(reloaded.index) == len(entries) + 1
+
+def test_get_inter_message_gaps(match_analytics):
+    gaps = match_analytics.get_inter_message_gaps()
+    # the last two messages of the third conversation are out of order in the export
+    assert [gap.get("interaction") for gap in gaps] == [2, 2, 2]
+    assert gaps[2].get("gap_hours") == 21 / 3600
+
+def test_get_conversation_lengths(match_analytics):
+    lengths = match_analytics.get_conversation_lengths()
+    assert [length.get("message_count") for length in lengths] == [1, 1, 4]
+    assert lengths[0].get("length_hours") == 0
+    assert lengths[2].get("length_hours") == (3 * 24 * 3600 + 13 * 3600 + 17 * 60 + 29) / 3600
+
+def test_get_last_message_to_block(match_analytics):
+    last_message_to_block = match_analytics.get_last_message_to_block()
+    assert len(last_message_to_block) == 3
+    assert last_message_to_block[2].get("last_message_time") == datetime.fromisoformat("2025-04-10 12:27:21")
+    assert last_message_to_block[2].get("days_to_block") == (5 * 24 * 3600 + 4 * 3600 + 5 * 60 + 24) / (3600 * 24)
+
+def test_get_message_counts_by_window(match_analytics):
+    message_counts = match_analytics.get_message_counts(start=datetime_to_epoch(datetime(2025, 4, 1)), granularity="week")
+    assert [count.get("period") for count in message_counts] == ["2025-04-21", "2025-03-31"]
+    assert [count.get("message_count") for count in message_counts] == [1, 4]
+
+def test_get_activity_counts(match_analytics):
+    activity = match_analytics.get_activity_counts(granularity="month", as_frame=True)
+    assert list(activity["period"]) == ["2025-03", "2025-04"]
+    assert list(activity["matches"]) == [1, 2]
+    assert list(activity["chats"]) == [1, 5]
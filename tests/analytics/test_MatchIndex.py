@@ -0,0 +1,84 @@
+import numpy as np
+
+from app.analytics.MatchIndex import MatchIndex, MatchIndexBuilder, MISSING
+
+#########################################################################################
+# test values
+#########################################################################################
+ENTRIES = [
+    {
+        "match": [{"timestamp": "2025-04-23 14:53:01"}],
+        "chats": [{"body": "Hey there!", "timestamp": "2025-04-23 14:53:22"}],
+        "block": [{"block_type": "remove", "timestamp": "2025-04-23 16:32:53"}]
+    },
+    {
+        "like": [{"timestamp": "2025-03-04 03:24:14", "like": [{"timestamp": "2025-03-04 03:24:14"}]}]
+    },
+    {
+        "match": [{"timestamp": "2025-03-06 23:08:31"}],
+        "block": [{"block_type": "report", "timestamp": "2025-03-15 16:32:49"}]
+    }
+]
+FIRST_MATCH_EPOCH = 1745419981
+
+#########################################################################################
+# unit tests
+#########################################################################################
+def test_one_row_per_entry():
+    index = MatchIndex.from_entries(ENTRIES)
+    assert len(index) == 3
+
+def test_timestamps_are_epoch_seconds():
+    index = MatchIndex.from_entries(ENTRIES)
+    assert index.match_ts.dtype == np.int64
+    assert index.match_ts[0] == FIRST_MATCH_EPOCH
+    assert index.first_chat_ts[0] - index.match_ts[0] == 21
+
+def test_missing_events():
+    index = MatchIndex.from_entries(ENTRIES)
+    assert index.match_ts[1] == MISSING
+    assert index.first_chat_ts[2] == MISSING
+    assert list(index.has("like_ts")) == [False, True, False]
+
+def test_chat_counts_and_block_types():
+    index = MatchIndex.from_entries(ENTRIES)
+    assert list(index.chat_count) == [1, 0, 0]
+    assert index.block_types == ["remove", "report"]
+    assert list(index.block_type) == [0, -1, 1]
+
+def test_empty_export():
+    index = MatchIndex.from_entries([])
+    assert len(index) == 0
+
+def test_chats_are_stored_flat_with_offsets():
+    index = MatchIndex.from_entries(ENTRIES)
+    assert list(index.chat_offsets) == [0, 1, 1, 1]
+    chat_ts, chat_len = index.chats(0)
+    assert list(chat_ts) == [index.first_chat_ts[0]]
+    assert list(chat_len) == [len("Hey there!")]
+    assert len(index.chats(1)[0]) == 0
+    assert list(index.chat_rows()) == [0]
+
+def test_chat_chunks_are_concatenated():
+    entries = [{"chats": [{"body": "a" * i, "timestamp": "2025-04-23 14:53:22"}] * 3} for i in range(5)]
+    builder = MatchIndexBuilder(chunk_rows=2)
+    for entry in entries:
+        builder.add(entry)
+    index = builder.build()
+    assert list(index.chat_offsets) == [0, 3, 6, 9, 12, 15]
+    assert list(index.chat_len) == [i for i in range(5) for _ in range(3)]
+    assert (index.chat_ts == index.chat_ts[0]).all()
+
+def test_concat_then_take_rebuilds_the_index():
+    whole = MatchIndex.from_entries(ENTRIES)
+    # the last entry indexed separately, with a block type vocabulary of its own
+    index = MatchIndex.from_entries(ENTRIES[:2]).concat(MatchIndex.from_entries(ENTRIES[2:]))
+    for column in MatchIndex.COLUMNS:
+        assert list(getattr(index, column)) == list(getattr(whole, column))
+    assert index.block_types == whole.block_types
+
+    reordered = whole.take([2, 0, 0])
+    assert list(reordered.match_ts) == [whole.match_ts[2], whole.match_ts[0], whole.match_ts[0]]
+    assert list(reordered.chat_offsets) == [0, 0, 1, 2]
+    assert list(reordered.chat_len) == [len("Hey there!")] * 2
+    assert [reordered.block_types[code] for code in reordered.block_type] == ["report", "remove", "remove"]
@@ -0,0 +1,79 @@
+import os
+from PIL import Image
+import pytest
+
+import app.analytics.MediaDerivatives as MediaDerivatives
+from app.analytics.MediaDerivatives import DERIVATIVES_DIR, VARIANTS, generate_derivatives
+
+#########################################################################################
+# test values
+#########################################################################################
+def write_image(path, size):
+    Image.new("RGB", size, color=(196, 85, 59)).save(path)
+
+#########################################################################################
+# unit tests
+#########################################################################################
+def test_generates_every_variant(tmp_path):
+    write_image(tmp_path / "photo.png", (2000, 1000))
+    derivatives = generate_derivatives(str(tmp_path))
+
+    assert set(derivatives["photo.png"]) == set(VARIANTS)
+    for variant, path in derivatives["photo.png"].items():
+        assert path.startswith(DERIVATIVES_DIR + "/")
+        with Image.open(tmp_path / path) as image:
+            assert max(image.size) == VARIANTS[variant]
+            assert image.format == "JPEG"
+
+def test_never_upscales(tmp_path):
+    write_image(tmp_path / "small.jpg", (100, 50))
+    derivatives = generate_derivatives(str(tmp_path))
+    with Image.open(tmp_path / derivatives["small.jpg"]["full"]) as image:
+        assert image.size == (100, 50)
+
+def test_cached_by_content_hash(tmp_path):
+    write_image(tmp_path / "a.png", (800, 600))
+    first = generate_derivatives(str(tmp_path))
+    card = tmp_path / first["a.png"]["card"]
+    os.utime(card, ns=(0, 0))
+
+    # a copy with the same bytes shares the derivatives, nothing is rendered again
+    (tmp_path / "b.png").write_bytes((tmp_path / "a.png").read_bytes())
+    second = generate_derivatives(str(tmp_path))
+    assert second["b.png"] == first["a.png"]
+    assert os.stat(card).st_mtime_ns == 0
+
+def test_unreadable_images_are_skipped(tmp_path):
+    (tmp_path / "broken.jpg").write_bytes(b"not an image")
+    write_image(tmp_path / "photo.png", (800, 600))
+    derivatives = generate_derivatives(str(tmp_path))
+    assert list(derivatives) == ["photo.png"]
+
+@pytest.mark.skipif(not hasattr(os, "fork"), reason="needs fork")
+def test_renders_in_forked_workers(tmp_path):
+    # the gunicorn master renders during warmup, the workers forked from it render uploaded exports
+    master_dir, worker_dir = tmp_path / "master", tmp_path / "worker"
+    for directory in (master_dir, worker_dir):
+        directory.mkdir()
+        write_image(directory / "a.png", (800, 600))
+        write_image(directory / "b.png", (600, 800))
+    assert len(generate_derivatives(str(master_dir))) == 2
+
+    pid = os.fork()
+    if pid == 0:
+        try:
+            os._exit(0 if len(generate_derivatives(str(worker_dir))) == 2 else 1)
+        except BaseException:
+            os._exit(2)
+    _, status = os.waitpid(pid, 0)
+    assert os.WIFEXITED(status) and os.WEXITSTATUS(status) == 0
+
+def test_serves_originals_when_rendering_fails(tmp_path, monkeypatch):
+    write_image(tmp_path / "a.png", (800, 600))
+    write_image(tmp_path / "b.png", (600, 800))
+
+    def fail(pending, max_workers=None):
+        raise ChildProcessError(10, "No child processes")
+
+    monkeypatch.setattr(MediaDerivatives, "_render_all", fail)
+    assert generate_derivatives(str(tmp_path)) == {}
@@ -0,0 +1,109 @@
+import os
+import threading
+import zipfile
+
+import pytest
+
+import app.analytics.MediaSync as MediaSync
+from app.analytics.MediaSync import MANIFEST_FILE, sync_media
+
+#########################################################################################
+# pytest fixtures
+#########################################################################################
+@pytest.fixture
+def media(tmp_path):
+    media_dir = tmp_path / "media"
+    media_dir.mkdir()
+    (media_dir / "a.jpg").write_bytes(b"photo a")
+    (media_dir / "b.jpg").write_bytes(b"photo b")
+    return media_dir
+
+@pytest.fixture
+def assets(tmp_path):
+    assets_dir = tmp_path / "assets"
+    assets_dir.mkdir()
+    # files the sync didn't create are never touched
+    (assets_dir / "style.css").write_text("body {}")
+    return assets_dir
+
+#########################################################################################
+# unit tests
+#########################################################################################
+def test_first_sync(media, assets):
+    summary = sync_media(str(media), str(assets))
+    assert summary == {"transferred": 2, "unchanged": 0, "removed": 0}
+    assert (assets / "a.jpg").read_bytes() == b"photo a"
+    assert (assets / MANIFEST_FILE).exists()
+
+def test_unchanged_files_are_skipped(media, assets):
+    sync_media(str(media), str(assets))
+    assert sync_media(str(media), str(assets)) == {"transferred": 0, "unchanged": 2, "removed": 0}
+
+def test_touched_file_is_not_transferred(media, assets):
+    sync_media(str(media), str(assets))
+    os.utime(media / "a.jpg", ns=(0, 0))
+    assert sync_media(str(media), str(assets))["transferred"] == 0
+
+def test_new_changed_and_removed_files(media, assets):
+    sync_media(str(media), str(assets))
+    (media / "c.jpg").write_bytes(b"photo c")
+    os.remove(media / "b.jpg")
+    # replace rather than rewrite, a hardlinked asset would otherwise change along with it
+    (media / "a.jpg.new").write_bytes(b"new photo a")
+    os.replace(media / "a.jpg.new", media / "a.jpg")
+
+    summary = sync_media(str(media), str(assets))
+    assert summary == {"transferred": 2, "unchanged": 0, "removed": 1}
+    assert (assets / "a.jpg").read_bytes() == b"new photo a"
+    assert not (assets / "b.jpg").exists()
+    assert (assets / "style.css").exists()
+
+def test_new_files_picked_up_in_non_empty_assets(media, assets):
+    (assets / "old.jpg").write_bytes(b"untracked")
+    sync_media(str(media), str(assets))
+    assert (assets / "a.jpg").exists()
+    assert (assets / "old.jpg").exists()
+
+def test_colliding_temp_file_leaves_the_source_intact(media, assets, monkeypatch):
+    link = os.link
+
+    def racing_link(src, dst):
+        # another worker links the same temp name to the source photo just before this one does
+        link(src, dst)
+        raise FileExistsError(17, "File exists", dst)
+
+    monkeypatch.setattr(MediaSync, "_tmp_path", lambda dest_path: f"{dest_path}.sync-tmp")
+    monkeypatch.setattr(os, "link", racing_link)
+    assert sync_media(str(media), str(assets))["transferred"] == 2
+    assert (media / "a.jpg").read_bytes() == b"photo a"
+    assert (assets / "a.jpg").read_bytes() == b"photo a"
+
+def test_concurrent_syncs(media, assets):
+    threads = [threading.Thread(target=sync_media, args=(str(media), str(assets))) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert (media / "a.jpg").read_bytes() == b"photo a"
+    assert (assets / "b.jpg").read_bytes() == b"photo b"
+    assert not [name for name in os.listdir(assets) if ".sync-tmp" in name]
+
+def test_missing_media_directory(tmp_path, assets):
+    assert sync_media(str(tmp_path / "missing"), str(assets))["transferred"] == 0
+
+def test_sync_from_archive(tmp_path, assets):
+    archive_path = tmp_path / "export.zip"
+    with zipfile.ZipFile(archive_path, "w") as archive:
+        archive.writestr("export/media/a.jpg", b"photo a")
+        archive.writestr("export/media/b.jpg", b"photo b")
+    media_path = f"{archive_path}!export/media/"
+
+    assert sync_media(media_path, str(assets)) == {"transferred": 2, "unchanged": 0, "removed": 0}
+    assert (assets / "b.jpg").read_bytes() == b"photo b"
+    assert sync_media(media_path, str(assets)) == {"transferred": 0, "unchanged": 2, "removed": 0}
+
+    with zipfile.ZipFile(archive_path, "w") as archive:
+        archive.writestr("export/media/a.jpg", b"photo a, edited")
+    assert sync_media(media_path, str(assets)) == {"transferred": 1, "unchanged": 0, "removed": 1}
+    assert (assets / "a.jpg").read_bytes() == b"photo a, edited"
+    assert not (assets / "b.jpg").exists()
@@ -0,0 +1,94 @@
+import json
+import os
+
+import pytest
+
+from app.analytics.Metrics import MetricsRegistry, timed
+
+#########################################################################################
+# pytest fixtures
+#########################################################################################
+@pytest.fixture
+def registry():
+    return MetricsRegistry()
+
+#########################################################################################
+# unit tests
+#########################################################################################
+def test_counter(registry):
+    counter = registry.counter("requests_total", "Requests.", ["route"])
+    counter.inc(route="/a")
+    counter.inc(2, route="/a")
+    assert 'requests_total{route="/a"} 3' in registry.render()
+
+def test_gauge_set_and_remove(registry):
+    gauge = registry.gauge("export_interactions", "Interactions.", ["export"])
+    gauge.set(10, export="alice")
+    assert 'export_interactions{export="alice"} 10' in registry.render()
+    gauge.remove(export="alice")
+    assert "alice" not in registry.render()
+
+def test_histogram_buckets_are_cumulative(registry):
+    histogram = registry.histogram("latency_seconds", "Latency.", ["card"], buckets=(0.1, 1.0))
+    for value in (0.05, 0.5, 0.5, 5.0):
+        histogram.observe(value, card="x")
+    text = registry.render()
+    assert '# TYPE latency_seconds histogram' in text
+    assert 'latency_seconds_bucket{card="x",le="0.1"} 1' in text
+    assert 'latency_seconds_bucket{card="x",le="1.0"} 3' in text
+    assert 'latency_seconds_bucket{card="x",le="+Inf"} 4' in text
+    assert 'latency_seconds_sum{card="x"} 6.05' in text
+    assert 'latency_seconds_count{card="x"} 4' in text
+
+def test_timed_labels_with_qualified_name(registry):
+    histogram = registry.histogram("method_seconds", "Methods.", ["method"])
+
+    class Analytics:
+        @timed(histogram)
+        def compute(self, value):
+            return value * 2
+
+    assert Analytics().compute(2) == 4
+    assert 'method_seconds_count{method="test_timed_labels_with_qualified_name.<locals>.Analytics.compute"} 1' in registry.render()
+
+def test_collector(registry):
+    registry.collector(lambda: [("cache_hits_total", "counter", "Cache hits.", [({"result": "hit"}, 7)])])
+    assert 'cache_hits_total{result="hit"} 7' in registry.render()
+
+def test_labels_are_checked_and_escaped(registry):
+    counter = registry.counter("errors_total", "Errors.", ["callback"])
+    with pytest.raises(Exception, match="expects the labels callback"):
+        counter.inc()
+    counter.inc(callback='a "quoted" name')
+    assert 'errors_total{callback="a \\"quoted\\" name"} 1' in registry.render()
+
+def test_duplicate_metric(registry):
+    registry.counter("requests_total", "Requests.")
+    with pytest.raises(Exception, match="already registered"):
+        registry.counter("requests_total", "Requests.")
+
+def test_shared_metrics_are_merged_across_processes(tmp_path):
+    # two registries stand in for two gunicorn workers sharing the directory
+    workers = [MetricsRegistry(), MetricsRegistry()]
+    for registry, count in zip(workers, (1, 2)):
+        registry.counter("requests_total", "Requests.", ["route"]).inc(count, route="/a")
+        registry.histogram("latency_seconds", "Latency.", ["card"], buckets=(0.1, 1.0)).observe(0.5, card="x")
+        registry.gauge("loaded", "Loaded exports.").set(count)
+        registry.share(str(tmp_path), interval=0)
+
+    text = workers[0].render()
+    assert text == workers[1].render()
+    assert 'requests_total{route="/a"} 3' in text
+    assert 'latency_seconds_bucket{card="x",le="1.0"} 2' in text
+    assert f'loaded{{worker="{os.getpid()}"}} 3' in text
+
+def test_exited_processes_keep_their_counters(tmp_path, registry):
+    registry.counter("requests_total", "Requests.").inc(2)
+    registry.share(str(tmp_path), interval=0)
+    # a worker that has exited, no process has this pid
+    exited = [["requests_total", "counter", "Requests.", None, [[{}, 5]]], ["loaded", "gauge", "Loaded.", None, [[{}, 1]]]]
+    (tmp_path / "999999999-1.json").write_text(json.dumps(exited))
+
+    text = registry.render()
+    assert "requests_total 7" in text
+    assert "loaded 1" not in text
@@ -0,0 +1,84 @@
+from datetime import datetime
+import numpy as np
+import pytest
+
+from app.analytics.MatchIndex import MatchIndex
+from app.analytics.Rollups import Rollups, bucket_edges, floor_period, period_labels
+from app.analytics.Timestamps import datetime_to_epoch
+
+#########################################################################################
+# test values
+#########################################################################################
+ENTRIES = [
+    {
+        "match": [{"timestamp": "2025-04-23 14:53:01"}],
+        "chats": [{"body": "Hey there!", "timestamp": "2025-04-23 14:53:22"},
+                  {"body": "Hi!", "timestamp": "2025-05-01 09:00:00"}],
+        "block": [{"block_type": "remove", "timestamp": "2025-05-02 16:32:53"}]
+    },
+    {
+        "like": [{"timestamp": "2025-03-04 03:24:14", "like": [{"timestamp": "2025-03-04 03:24:14"}]}]
+    },
+    {
+        "match": [{"timestamp": "2025-03-06 23:08:31"}],
+        "block": [{"block_type": "report", "timestamp": "2025-03-15 16:32:49"}]
+    }
+]
+APRIL = datetime_to_epoch(datetime(2025, 4, 1))
+MAY = datetime_to_epoch(datetime(2025, 5, 1))
+
+#########################################################################################
+# pytest fixtures
+#########################################################################################
+@pytest.fixture
+def rollups():
+    return Rollups.from_index(MatchIndex.from_entries(ENTRIES))
+
+#########################################################################################
+# unit tests
+#########################################################################################
+def test_count_in_window(rollups):
+    assert rollups.count("matches") == 2
+    assert rollups.count("matches", start=APRIL) == 1
+    assert rollups.count("chats", start=APRIL, end=MAY) == 1
+    assert rollups.count("likes", end=APRIL) == 1
+
+def test_monthly_counts(rollups):
+    df = rollups.counts(granularity="month")
+    assert list(df["period"]) == ["2025-03", "2025-04", "2025-05"]
+    assert list(df["matches"]) == [1, 1, 0]
+    assert list(df["chats"]) == [0, 1, 1]
+    assert list(df["blocks"]) == [1, 0, 1]
+    assert list(df["likes"]) == [1, 0, 0]
+
+def test_counts_are_clipped_to_the_window(rollups):
+    df = rollups.counts(start=APRIL + 22 * 86400, end=MAY + 86400, granularity="week")
+    assert df["chats"].sum() == 2
+    assert df["matches"].sum() == 1
+    assert df["blocks"].sum() == 0
+
+def test_match_rows_keep_export_order(rollups):
+    assert list(rollups.match_rows()) == [0, 2]
+    assert list(rollups.match_rows(start=APRIL)) == [0]
+
+def test_weeks_start_on_monday():
+    # 2025-04-23 was a Wednesday
+    wednesday = datetime_to_epoch(datetime(2025, 4, 23, 14, 53, 1))
+    assert period_labels(np.array([wednesday]), "week")[0] == "2025-04-21"
+    assert floor_period(wednesday, "day") == datetime_to_epoch(datetime(2025, 4, 23))
+
+def test_bucket_edges_cover_the_window():
+    edges = bucket_edges(APRIL + 10, MAY + 10, "month")
+    assert edges[0] == APRIL
+    assert edges[-1] > MAY + 10
+    assert len(edges) == 3
+
+def test_unknown_granularity(rollups):
+    with pytest.raises(Exception, match="Unknown granularity"):
+        rollups.counts(granularity="year")
+
+def test_empty_export():
+    rollups = Rollups.from_index(MatchIndex.from_entries([]))
+    assert rollups.count("matches") == 0
+    assert len(rollups.counts()) == 0
+    assert len(rollups.match_rows()) == 0
@@ -0,0 +1,143 @@
+import json
+import os
+import threading
+import numpy as np
+import pytest
+
+import app.analytics.Snapshot as Snapshot
+from app.analytics.ExportStream import iter_json_array
+from app.analytics.Snapshot import (SnapshotStore, content_digest, content_hash, hashed_export_file, read_pack,
+                                    stat_key, write_pack)
+from app.analytics.MatchAnalytics import MatchAnalytics
+from tests.analytics.data import MATCH_DATA
+
+#########################################################################################
+# test values
+#########################################################################################
+COLUMNS = {
+    "ints": np.arange(5, dtype=np.int64),
+    "small": np.array([1, -1, 2], dtype=np.int16),
+    "empty": np.empty(0, dtype=np.int32)
+}
+META = {"block_types": ["remove"]}
+
+#########################################################################################
+# unit tests
+#########################################################################################
+def test_pack_round_trip(tmp_path):
+    path = tmp_path / "columns.pack"
+    write_pack(str(path), COLUMNS, META)
+
+    columns, meta = read_pack(str(path))
+    assert meta == META
+    for name, values in COLUMNS.items():
+        assert columns[name].dtype == values.dtype
+        assert np.array_equal(columns[name], values)
+    # the columns are views onto the read-only mapping
+    assert not columns["ints"].flags.writeable
+
+def test_store_miss_then_hit(tmp_path):
+    source = tmp_path / "matches.json"
+    source.write_text("[]")
+    store = SnapshotStore(str(tmp_path / "snapshots"))
+
+    assert store.load(str(source), "matches") is None
+    store.save(str(source), "matches", COLUMNS, META, content_hash(str(source)), stat_key(str(source)))
+
+    columns, meta = store.load(str(source), "matches")
+    assert np.array_equal(columns["small"], COLUMNS["small"])
+    assert meta["block_types"] == ["remove"]
+
+def test_store_hit_after_touch(tmp_path):
+    source = tmp_path / "matches.json"
+    source.write_text("[]")
+    store = SnapshotStore(str(tmp_path / "snapshots"))
+    store.save(str(source), "matches", COLUMNS, META, content_hash(str(source)), stat_key(str(source)))
+
+    # same bytes with a new mtime is still matched through the content hash
+    os.utime(source, ns=(0, 0))
+    assert store.load(str(source), "matches") is not None
+
+def test_store_stale_after_change(tmp_path):
+    source = tmp_path / "matches.json"
+    source.write_text("[]")
+    store = SnapshotStore(str(tmp_path / "snapshots"))
+    store.save(str(source), "matches", COLUMNS, META, content_hash(str(source)), stat_key(str(source)))
+
+    source.write_text("[{}]")
+    assert store.load(str(source), "matches") is None
+
+def test_exports_keep_separate_indexes(tmp_path, monkeypatch):
+    store = SnapshotStore(str(tmp_path / "snapshots"))
+    sources = [tmp_path / "alice.json", tmp_path / "bob.json"]
+    for source, data in zip(sources, ("[]", "[{}]")):
+        source.write_text(data)
+        store.save(str(source), "matches", COLUMNS, META, content_hash(str(source)), stat_key(str(source)))
+
+    # each export has its own index, guarded by its own lock
+    assert len(list((tmp_path / "snapshots").glob("matches-*.json"))) == 2
+    monkeypatch.setattr(Snapshot, "content_hash", lambda path: pytest.fail(f"'{path}' was hashed"))
+    for source in sources:
+        assert store.load(str(source), "matches") is not None
+
+def test_match_analytics_loads_from_snapshot(tmp_path, monkeypatch):
+    source = tmp_path / "matches.json"
+    source.write_text(MATCH_DATA)
+    monkeypatch.setenv("MATCH_FILE_PATH", str(source))
+    monkeypatch.setenv("SNAPSHOT_PATH", str(tmp_path / "snapshots"))
+
+    parsed = MatchAnalytics()
+    # the process that builds the snapshot attaches to it like every other process
+    assert parsed.match_data is None
+    assert not parsed.index.match_ts.flags.writeable
+
+    cached = MatchAnalytics()
+    assert cached.match_data is None
+    assert not cached.rollups.events["chats"].flags.writeable
+    assert cached.get_match_rm_counts() == parsed.get_match_rm_counts()
+    assert cached.get_response_latency() == parsed.get_response_latency()
+    assert len(cached.get_match_data()) == 3
+
+def test_snapshot_named_by_the_parsed_bytes(tmp_path, monkeypatch):
+    source = tmp_path / "matches.json"
+    source.write_text(MATCH_DATA)
+    monkeypatch.setenv("MATCH_FILE_PATH", str(source))
+    monkeypatch.setenv("SNAPSHOT_PATH", str(tmp_path / "snapshots"))
+    parse = MatchAnalytics._parse
+
+    def parse_then_change(self, previous=None, digest=None):
+        parse(self, previous, digest)
+        # the export is replaced after it was parsed but before its snapshot is saved
+        source.write_text(json.dumps(json.loads(MATCH_DATA)[:1]))
+
+    monkeypatch.setattr(MatchAnalytics, "_parse", parse_then_change)
+    assert len(MatchAnalytics().get_match_rm_counts()) == 3
+    monkeypatch.setattr(MatchAnalytics, "_parse", parse)
+    assert len(MatchAnalytics().get_match_rm_counts()) == 1
+
+def test_hashed_export_file_matches_content_hash(tmp_path):
+    source = tmp_path / "matches.json"
+    source.write_text(MATCH_DATA + "\n\n")
+    digest = content_digest()
+    with hashed_export_file(str(source), digest) as file:
+        assert len(list(iter_json_array(file))) == 3
+    assert digest.hexdigest() == content_hash(str(source))
+
+def test_lock_serializes_builders(tmp_path):
+    store = SnapshotStore(str(tmp_path / "snapshots"))
+    source = str(tmp_path / "matches.json")
+    order = []
+
+    def builder():
+        with store.lock(source, "matches"):
+            order.append("second")
+
+    with store.lock(source, "matches"):
+        thread = threading.Thread(target=builder)
+        thread.start()
+        thread.join(timeout=0.2)
+        # the second builder waits for the first one to release the lock
+        assert thread.is_alive()
+        order.append("first")
+    thread.join()
+    assert order == ["first", "second"]
@@ -0,0 +1,42 @@
+from datetime import datetime
+import numpy as np
+
+from app.analytics.Timestamps import (
+    FRACTIONAL_FORMAT, MISSING, SECONDS_FORMAT, datetime_to_epoch, detect_format, to_datetime64, to_epoch)
+
+#########################################################################################
+# test values
+#########################################################################################
+MATCH_TIMESTAMP = "2025-04-23 14:53:01"
+MATCH_EPOCH = 1745419981
+ACCOUNT_TIMESTAMP = "2024-01-01 03:27:17.539"
+ACCOUNT_EPOCH_MS = 1704079637539
+
+#########################################################################################
+# unit tests
+#########################################################################################
+def test_detect_format():
+    assert detect_format([None, MATCH_TIMESTAMP]) == SECONDS_FORMAT
+    assert detect_format([ACCOUNT_TIMESTAMP]) == FRACTIONAL_FORMAT
+    assert detect_format([None, None]) is None
+
+def test_to_epoch_seconds():
+    epochs = to_epoch([MATCH_TIMESTAMP, None])
+    assert epochs.dtype == np.int64
+    assert list(epochs) == [MATCH_EPOCH, MISSING]
+
+def test_to_epoch_milliseconds():
+    assert to_epoch([ACCOUNT_TIMESTAMP], unit="ms")[0] == ACCOUNT_EPOCH_MS
+
+def test_to_epoch_mixed_formats():
+    epochs = to_epoch([MATCH_TIMESTAMP, ACCOUNT_TIMESTAMP], unit="ms")
+    assert list(epochs) == [MATCH_EPOCH * 1000, ACCOUNT_EPOCH_MS]
+
+def test_to_epoch_empty():
+    assert len(to_epoch([])) == 0
+
+def test_datetime_round_trip():
+    epoch = datetime_to_epoch(datetime.fromisoformat(MATCH_TIMESTAMP))
+    assert epoch == MATCH_EPOCH
+    assert to_datetime64(np.array([epoch, MISSING]))[0] == np.datetime64(MATCH_TIMESTAMP)
+    assert np.isnat(to_datetime64(np.array([MISSING]))[0])
@@ -1,146 +1,15 @@
 import pytest
 import os
-import json
-from unittest.mock import mock_open, patch
 
+from app.analytics.GeoLocation import GeoLocationService
 from app.analytics.UserAnalytics import UserAnalytics
 
 #########################################################################################
 # test values
 #########################################################################################
-USER_FILE_PATH = "fake/file/path/users.json"
-GEOLITE_DB_PATH = 'data/db_path.mmdb'
-ASSETS_PATH = 'fake/file/path/assets/'
-MEDIA_PATH = 'fake/file/path/media/'
-USER_DATA = '''
-{
-    "devices": [
-        {
-            "ip_address": "174.234.168.00",
-            "device_model": "unknown",
-            "device_platform": "ios",
-            "device_os_versions": "16.5.1"
-        },
-        {
-            "ip_address": "130.279.438.00",
-            "device_model": "unknown",
-            "device_platform": "ios",
-            "device_os_versions": "16.5.1"
-        }
-    ],
-    "account": {
-        "signup_time": "2024-01-01 03:27:17.539",
-        "last_pause_time": "2020-09-04 03:04:32.765",
-        "last_unpause_time": "2020-09-10 16:53:40.324",
-        "last_seen": "2024-01-17 04:07:39.234",
-        "device_platform": "ios",
-        "device_os": "16.6.1",
-        "device_model": "unknown",
-        "app_version": "9.30.0",
-        "push_notifications_enabled": false
-    },
-    "profile": {
-        "first_name": "Fake User",
-        "age": 99,
-        "height_centimeters": 213,
-        "gender": "female",
-        "gender_identity_displayed": false,
-        "ethnicities": "[Prefer Not to Say]",
-        "ethnicities_displayed": false,
-        "religions": "[Prefer Not to Say]",
-        "religions_displayed": true,
-        "workplaces_displayed": false,
-        "schools_displayed": true,
-        "job_title": "Astronaut",
-        "job_title_displayed": true,
-        "hometowns_displayed": false,
-        "smoking": "[Prefer Not to Say]",
-        "drinking": "[Prefer Not to Say]",
-        "drugs": "[Prefer Not to Say]",
-        "marijuana": "[Prefer Not to Say]",
-        "children": "[Prefer Not to Say]",
-        "family_plans": "[Prefer Not to Say]",
-        "smoking_displayed": false,
-        "drinking_displayed": true,
-        "marijuana_displayed": false,
-        "drugs_displayed": false,
-        "children_displayed": false,
-        "family_plans_displayed": true,
-        "politics_displayed": false,
-        "vaccination_status_displayed": true,
-        "dating_intention_displayed": false,
-        "languages_spoken_displayed": true,
-        "relationship_type_displayed": false,
-        "education_attained": "Undergraduate",
-        "languages_spoken": "English",
-        "ethnicities": "Prefer Not to Say",
-        "pets": "Dog",
-        "politics": "Prefer Not to Say",
-        "religions": "Prefer Not to Say",
-        "hometowns": "moon",
-        "relationship_types": "Prefer Not to Say",
-        "dating_intention": "Prefer Not to Say",
-        "workplaces": "Space"
-    },
-    "preferences": {
-        "distance_miles_max": 50,
-        "age_min": 98,
-        "age_max": 99,
-        "age_dealbreaker": true,
-        "height_dealbreaker": false,
-        "ethnicity_preference": "[Open to All]",
-        "ethnicity_dealbreaker": false,
-        "religion_preference": "[Open to All]",
-        "religion_dealbreaker": false,
-        "smoking_preference": "[Open to All]",
-        "smoking_dealbreaker": false,
-        "drinking_preference": "[Open to All]",
-        "drinking_dealbreaker": false,
-        "marijuana_preference": "[Open to All]",
-        "marijuana_dealbreaker": false,
-        "drugs_preference": "[Open to All]",
-        "drugs_dealbreaker": false,
-        "children_preference": "[Open to All]",
-        "children_dealbreaker": false,
-        "family_plans_preference": "[Open to All]",
-        "family_plans_dealbreaker": false,
-        "education_attained_preference": "[Open to All]",
-        "education_attained_dealbreaker": false,
-        "politics_preference": "[Open to All]",
-        "politics_dealbreaker": false
-    },
-    "location": {
-        "latitude": 65.00,
-        "longitude": 18.00,
-        "country_short": "US",
-        "admin_area_1_short": "NY",
-        "cbsa": "Brooklyn",
-        "neighborhood": "Flatbush"
-    }
-}
-'''
 COUNT_DISPLAYED_ATTRIB_OUTPUT = {'identity': {'true': 2, 'false': 4}, 'lifestyle': {'true': 2, 'false': 3}, 'career': {'true': 2, 'false': 1}, 'future_plans': {'true': 1, 'false': 3}}
 STRINGENCY_COUNTS = {'physical': {'true': 1, 'false': 1}, 'identity': {'true': 0, 'false': 3}, 'lifestyle': {'true': 0, 'false': 4}, 'career': {'true': 0, 'false': 1}, 'future_plans': {'true': 0, 'false': 2}}
 
-#########################################################################################
-# pytest fixtures
-#########################################################################################
-@pytest.fixture
-def user_analytics(monkeypatch):
-    monkeypatch.setenv("USER_FILE_PATH", USER_FILE_PATH)
-    monkeypatch.setenv("GEOLITE_DB_PATH", GEOLITE_DB_PATH)
-    monkeypatch.setenv("ASSETS_PATH", ASSETS_PATH)
-    monkeypatch.setenv("MEDIA_PATH", MEDIA_PATH)
-
-    with patch("builtins.open", mock_open(read_data=USER_DATA)), \
-         patch("json.load", return_value=json.loads(USER_DATA)), \
-         patch("os.makedirs"), \
-         patch("os.listdir", return_value=[]), \
-         patch("shutil.copy2"):
-
-        user_analytics = UserAnalytics()
-    return user_analytics
-
 #########################################################################################
 # unit tests
 #########################################################################################
@@ -228,10 +97,11 @@ def test_profile_preference_selections(user_analytics):
     assert len(profile) == len(prefs)
     assert len(profile) == 10
 
-# TODO: this needs to be mocked out and better tests added
-# def test_collect_location_from_ip(user_analytics):
-#     result = user_analytics.collect_location_from_ip() 
-#     assert result is not None
+def test_collect_location_from_ip(user_analytics, reader, geocoder):
+    user_analytics._geolocation_service = GeoLocationService(reader=reader, geocoder=geocoder, min_interval=0)
+    result = user_analytics.collect_location_from_ip()
+    assert list(result["ip"]) == ["174.234.168.00", "130.279.438.00"]
+    assert list(result["city"]) == ["Brooklyn", "Brooklyn"]
 
 def test_count_stringeny_attributes(user_analytics):
     results = user_analytics.count_stringeny_attributes()
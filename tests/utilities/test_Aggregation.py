@@ -0,0 +1,82 @@
+import numpy as np
+
+from app.utilities.Aggregation import bin_edges, box_stats, decimate, histogram, sample_rows
+
+#########################################################################################
+# test values
+#########################################################################################
+LATENCIES = np.array([0.01, 0.2, 0.35, 1.4, 2.0, 7.9])
+# two periods, the second with one message count far above the rest
+PERIODS = np.array(["2025-04", "2025-03", "2025-04", "2025-04", "2025-03", "2025-04", "2025-04"])
+MESSAGE_COUNTS = np.array([3, 1, 4, 5, 2, 4, 40])
+
+#########################################################################################
+# unit tests
+#########################################################################################
+def test_bin_edges_are_round():
+    edges = bin_edges(LATENCIES, nbins=20)
+    # 7.89 / 20 rounds up to a width of 0.5
+    assert np.allclose(np.diff(edges), 0.5)
+    assert edges[0] <= LATENCIES.min() and edges[-1] > LATENCIES.max()
+
+def test_integer_bins_are_centered():
+    edges = bin_edges(np.array([0, 1, 1, 3]), nbins=20, integer=True)
+    assert list(edges) == [-0.5, 0.5, 1.5, 2.5, 3.5]
+
+def test_histogram_counts_every_value():
+    edges, counts = histogram(LATENCIES, nbins=4)
+    assert counts.sum() == len(LATENCIES)
+    assert len(counts) == len(edges) - 1
+    assert histogram(np.array([]))[1].size == 0
+
+def test_box_stats_match_numpy():
+    stats = box_stats(PERIODS, MESSAGE_COUNTS)
+    assert list(stats["group"]) == ["2025-03", "2025-04"]
+    assert list(stats["count"]) == [2, 5]
+
+    april = np.sort(MESSAGE_COUNTS[PERIODS == "2025-04"])
+    q1, median, q3 = np.percentile(april, [25, 50, 75])
+    assert (stats["q1"][1], stats["median"][1], stats["q3"][1]) == (q1, median, q3)
+    # 40 is past 1.5 IQR of the box, the whisker stops at the largest value within it
+    assert stats["upperfence"][1] == 5
+    assert list(stats["outlier_groups"]) == ["2025-04"]
+    assert list(stats["outlier_values"]) == [40]
+
+def test_outliers_are_sampled():
+    groups = np.zeros(1000, dtype=np.int64)
+    values = np.concatenate([np.ones(900), np.arange(100) + 100.0])
+    stats = box_stats(groups, values, max_outliers=10)
+    assert len(stats["outlier_values"]) == 10
+    assert (stats["outlier_values"] >= 100).all()
+
+def test_sample_rows_is_deterministic():
+    assert list(sample_rows(5, 10)) == [0, 1, 2, 3, 4]
+    rows = sample_rows(1000, 50, seed=1)
+    assert len(set(rows)) == 50 and list(rows) == sorted(rows)
+    assert list(rows) == list(sample_rows(1000, 50, seed=1))
+
+def test_decimate_keeps_sparse_points():
+    rng = np.random.default_rng(0)
+    # a dense cluster near the origin and a handful of far away points
+    x = np.concatenate([rng.normal(0, 1, 100_000), [50, 60, 70]])
+    y = np.concatenate([rng.normal(0, 1, 100_000), [50, 60, 70]])
+    rows, density, visible = decimate(x, y, max_points=1000)
+
+    assert visible == len(x)
+    assert len(rows) <= 1000
+    assert list(rows) == sorted(rows)
+    assert {100_000, 100_001, 100_002} <= set(rows)
+    # the outliers each stand for themselves, the cluster's points for many
+    assert (density[-3:] == 1).all() and density.max() > 100
+
+def test_decimate_caps_points_below_the_grid_size():
+    rng = np.random.default_rng(0)
+    # uniform points occupy every cell of the default 128 x 128 grid
+    rows, _, _ = decimate(rng.uniform(size=100_000), rng.uniform(size=100_000), max_points=500)
+    assert 0 < len(rows) <= 500
+
+def test_decimate_visible_range():
+    x = np.arange(100.0)
+    rows, density, visible = decimate(x, x, max_points=1000, x_range=(10, 19), y_range=(0, 15))
+    assert list(rows) == list(range(10, 16))
+    assert visible == 6
@@ -0,0 +1,67 @@
+import gzip
+
+from flask import Flask, Response, request
+import pytest
+
+from app.utilities.Compression import ResponseCompressor
+
+#########################################################################################
+# test values
+#########################################################################################
+BODY = b'{"figure": {"data": [' + b", ".join(b"%d" % i for i in range(2000)) + b"]}}"
+
+#########################################################################################
+# pytest fixtures
+#########################################################################################
+@pytest.fixture
+def client():
+    server = Flask(__name__)
+    compressor = ResponseCompressor(min_bytes=1024)
+    compressor.encodings = ["gzip"]  # the same result whether brotli is installed or not
+
+    @server.route("/figure")
+    def figure():
+        return Response(BODY, mimetype="application/json")
+
+    @server.route("/small")
+    def small():
+        return Response(b"{}", mimetype="application/json")
+
+    @server.route("/photo")
+    def photo():
+        return Response(BODY, mimetype="image/jpeg")
+
+    @server.after_request
+    def compress(response):
+        compressor.compress(response, request.accept_encodings, request.path)
+        return response
+
+    return server.test_client()
+
+#########################################################################################
+# unit tests
+#########################################################################################
+def test_gzip_when_accepted(client):
+    response = client.get("/figure", headers={"Accept-Encoding": "gzip, deflate"})
+    assert response.headers["Content-Encoding"] == "gzip"
+    assert "Accept-Encoding" in response.headers["Vary"]
+    assert int(response.headers["Content-Length"]) < len(BODY)
+    assert gzip.decompress(response.data) == BODY
+
+def test_identity_without_accept_encoding(client):
+    response = client.get("/figure")
+    assert "Content-Encoding" not in response.headers
+    assert response.data == BODY
+
+def test_small_and_binary_responses_are_left_alone(client):
+    assert "Content-Encoding" not in client.get("/small", headers={"Accept-Encoding": "gzip"}).headers
+    assert "Content-Encoding" not in client.get("/photo", headers={"Accept-Encoding": "gzip"}).headers
+
+def test_brotli_preferred_when_installed():
+    brotli = pytest.importorskip("brotli")
+    server = Flask(__name__)
+    compressor = ResponseCompressor(min_bytes=0)
+    with server.test_request_context(headers={"Accept-Encoding": "gzip, br"}):
+        response = Response(BODY, mimetype="application/json")
+        assert compressor.compress(response, request.accept_encodings) == "br"
+        assert brotli.decompress(response.get_data()) == BODY
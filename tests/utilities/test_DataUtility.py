@@ -0,0 +1,93 @@
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import json
+import os
+import threading
+import pandas as pd
+import pytest
+
+from app.utilities.DataUtility import MANIFEST_FILE, liked_photo_urls, liked_photos
+
+#########################################################################################
+# test values
+#########################################################################################
+PHOTOS = {
+    "/a.jpg": b"photo a" * 1000,
+    "/b.jpg": b"photo b" * 1000,
+    "/copy-of-a.jpg": b"photo a" * 1000,
+}
+
+class PhotoHandler(BaseHTTPRequestHandler):
+    requests_seen = []
+    flaky = set()
+
+    def do_GET(self):
+        PhotoHandler.requests_seen.append(self.path)
+        # fail the first request for a flaky photo so the retry has to pick it up
+        if self.path in PhotoHandler.flaky:
+            PhotoHandler.flaky.discard(self.path)
+            self.send_response(503)
+            self.end_headers()
+            return
+        body = PHOTOS.get(self.path)
+        if body is None:
+            self.send_response(404)
+            self.end_headers()
+            return
+        self.send_response(200)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+def events(urls):
+    content = [json.dumps([{"photo": {"url": url}}]) for url in urls]
+    return pd.DataFrame({"content": content + [None, json.dumps([{"comment": "hi"}])]})
+
+#########################################################################################
+# pytest fixtures
+#########################################################################################
+@pytest.fixture
+def server():
+    PhotoHandler.requests_seen = []
+    PhotoHandler.flaky = set()
+    httpd = ThreadingHTTPServer(("127.0.0.1", 0), PhotoHandler)
+    thread = threading.Thread(target=httpd.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{httpd.server_address[1]}"
+    httpd.shutdown()
+
+#########################################################################################
+# unit tests
+#########################################################################################
+def test_liked_photo_urls():
+    assert liked_photo_urls(events(["http://x/a.jpg"])) == ["http://x/a.jpg"]
+
+def test_downloads_and_deduplicates(server, tmp_path):
+    urls = [server + path for path in PHOTOS]
+    summary = liked_photos(events(urls), output_dir=str(tmp_path), backoff=0)
+
+    assert summary == {"downloaded": 2, "skipped": 0, "duplicates": 1, "failed": 0}
+    photos = sorted(name for name in os.listdir(tmp_path) if name.endswith(".jpg"))
+    assert len(photos) == 2
+    assert sorted((tmp_path / name).read_bytes() for name in photos) == sorted({*PHOTOS.values()})
+
+def test_rerun_resumes_from_manifest(server, tmp_path):
+    urls = [server + path for path in PHOTOS]
+    liked_photos(events(urls[:1]), output_dir=str(tmp_path), backoff=0)
+    PhotoHandler.requests_seen = []
+
+    summary = liked_photos(events(urls), output_dir=str(tmp_path), backoff=0)
+    assert summary["skipped"] == 1
+    assert "/a.jpg" not in PhotoHandler.requests_seen
+    assert len((tmp_path / MANIFEST_FILE).read_text().splitlines()) == 3
+
+def test_retries_and_failures(server, tmp_path):
+    PhotoHandler.flaky = {"/b.jpg"}
+    summary = liked_photos(events([server + "/b.jpg", server + "/missing.jpg"]), output_dir=str(tmp_path), backoff=0)
+
+    assert summary["downloaded"] == 1
+    assert summary["failed"] == 1
+    assert PhotoHandler.requests_seen.count("/b.jpg") == 2
+    assert not [name for name in os.listdir(tmp_path) if name.endswith(".part")]
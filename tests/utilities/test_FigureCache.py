@@ -0,0 +1,61 @@
+import plotly.graph_objects as go
+
+from app.utilities.FigureCache import FigureCache
+
+#########################################################################################
+# test values
+#########################################################################################
+FINGERPRINT = "abc123"
+OTHER_FINGERPRINT = "def456"
+
+def build_figure(values=(1, 2, 3)):
+    return go.Figure(go.Bar(y=list(values)))
+
+#########################################################################################
+# unit tests
+#########################################################################################
+def test_miss_then_hit():
+    cache = FigureCache(max_bytes=1 << 20)
+    calls = []
+
+    def build():
+        calls.append(1)
+        return build_figure()
+
+    first = cache.get_or_build(FINGERPRINT, "chart", build)
+    second = cache.get_or_build(FINGERPRINT, "chart", build)
+    assert first == second
+    assert first["data"][0]["y"] == [1, 2, 3]
+    assert len(calls) == 1
+    assert (cache.hits, cache.misses) == (1, 1)
+
+def test_key_includes_fingerprint_and_params():
+    cache = FigureCache(max_bytes=1 << 20)
+    cache.get_or_build(FINGERPRINT, "chart", build_figure, window=12)
+    cache.get_or_build(FINGERPRINT, "chart", build_figure, window=6)
+    cache.get_or_build(OTHER_FINGERPRINT, "chart", build_figure, window=12)
+    assert cache.misses == 3
+    assert len(cache) == 3
+
+def test_lru_eviction():
+    size = len(build_figure().to_json())
+    cache = FigureCache(max_bytes=size * 2)
+    cache.get_or_build(FINGERPRINT, "a", build_figure)
+    cache.get_or_build(FINGERPRINT, "b", build_figure)
+    # touch a so b is the least recently used
+    cache.get_or_build(FINGERPRINT, "a", build_figure)
+    cache.get_or_build(FINGERPRINT, "c", build_figure)
+
+    assert len(cache) == 2
+    assert cache.size_bytes <= cache.max_bytes
+    cache.get_or_build(FINGERPRINT, "a", build_figure)
+    assert cache.misses == 3
+
+def test_disk_tier(tmp_path):
+    FigureCache(max_bytes=1 << 20, disk_path=str(tmp_path)).get_or_build(FINGERPRINT, "chart", build_figure)
+
+    # a fresh cache, e.g. after a restart or in another worker, is served from disk
+    cache = FigureCache(max_bytes=1 << 20, disk_path=str(tmp_path))
+    figure = cache.get_or_build(FINGERPRINT, "chart", lambda: build_figure((9,)))
+    assert figure["data"][0]["y"] == [1, 2, 3]
+    assert (cache.disk_hits, cache.misses) == (1, 0)